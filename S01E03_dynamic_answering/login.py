@@ -1,15 +1,19 @@
 import requests
 from bs4 import BeautifulSoup
-from openai import OpenAI
 import os
+import sys
 import time
+from pathlib import Path
 from dotenv import load_dotenv
 
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+from common.llm_gateway import SyncLLMGateway
+
 # Ładowanie zmiennych środowiskowych z pliku .env
 load_dotenv()
 
-# Konfiguracja OpenAI API (klucz pobierany automatycznie z env)
-client = OpenAI()
+# Wspólna brama do API OpenAI (klucz pobierany automatycznie z env)
+gateway = SyncLLMGateway()
 
 def get_question():
     """Pobiera stronę i wyciąga pytanie."""
@@ -25,14 +29,13 @@ def get_question():
 def get_llm_answer(question):
     """Pobiera odpowiedź od modelu LLM."""
     try:
-        response = client.chat.completions.create(
-            model="gpt-4",
-            messages=[
+        return gateway.chat_text({
+            "model": "gpt-4",
+            "messages": [
                 {"role": "system", "content": "Jesteś pomocnym asystentem. Odpowiadaj krótko i konkretnie, tylko liczbą."},
                 {"role": "user", "content": question}
             ]
-        )
-        return response.choices[0].message.content.strip()
+        })
     except Exception as e:
         print(f"Błąd podczas pobierania odpowiedzi z LLM: {e}")
         return None
@@ -1,43 +1,90 @@
 import os
-from openai import OpenAI
+import sys
 import json
+import asyncio
+from pathlib import Path
 from dotenv import load_dotenv
 
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+from common.llm_gateway import LLMGateway, LLMGatewayError
+from common.transcript_store import TranscriptStore, sha256_file
+from common.audio_chunking import transcribe_long_audio_api
+
 # Ładowanie zmiennych środowiskowych z pliku .env
 load_dotenv()
 
-# Inicjalizacja klienta OpenAI
-client = OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
+AUDIO_DIR = "."
+# Transkrypcje dopisywane na bieżąco (klucz: SHA-256 nagrania) i wynik końcowy {plik: tekst}
+STORE_FILE = "transcripts.jsonl"
+OUTPUT_FILE = "transcripts.json"
+# Liczba nagrań przetwarzanych jednocześnie
+MAX_CONCURRENCY = int(os.getenv("TRANSCRIBE_CONCURRENCY", "8"))
+# Większe pliki są dzielone w miejscach ciszy i transkrybowane fragmentami (wymaga ffmpeg)
+CHUNK_ABOVE_BYTES = int(float(os.getenv("TRANSCRIBE_CHUNK_ABOVE_MB", "5")) * 1024 * 1024)
 
-def transcribe_audio(file_path):
-    with open(file_path, "rb") as audio_file:
-        transcript = client.audio.transcriptions.create(
-            model="whisper-1",
-            file=audio_file,
-            language="pl"
-        )
-    return transcript.text
+async def transcribe_audio(gateway: LLMGateway, file_path: str) -> dict:
+    if os.path.getsize(file_path) > CHUNK_ABOVE_BYTES:
+        print(f"Dzielę {os.path.basename(file_path)} na fragmenty...")
+        return await transcribe_long_audio_api(gateway, file_path, model="whisper-1", language="pl")
+    audio = await asyncio.to_thread(Path(file_path).read_bytes)
+    return await gateway.transcribe(os.path.basename(file_path), audio, model="whisper-1", language="pl")
 
-def main():
-    # Katalog z plikami audio
-    audio_dir = "."
-    
-    # Słownik do przechowywania transkrypcji
-    transcripts = {}
-    
-    # Przetwarzanie każdego pliku audio
-    for filename in os.listdir(audio_dir):
-        if filename.endswith(".m4a"):
-            print(f"Transkrybuję {filename}...")
-            file_path = os.path.join(audio_dir, filename)
-            transcript = transcribe_audio(file_path)
-            transcripts[filename] = transcript
-    
-    # Zapisz transkrypcje do pliku JSON
-    with open("transcripts.json", "w", encoding="utf-8") as f:
+async def transcribe_file(gateway: LLMGateway, store: TranscriptStore, semaphore: asyncio.Semaphore, sha256: str, file_path: str):
+    async with semaphore:
+        print(f"Transkrybuję {os.path.basename(file_path)}...")
+        try:
+            transcript = await transcribe_audio(gateway, file_path)
+            metadata = {"file": os.path.basename(file_path), "model": "whisper-1", "language": "pl"}
+            if transcript.get("segments"):
+                metadata["segments"] = transcript["segments"]
+            await asyncio.to_thread(store.add, sha256, transcript["text"], **metadata)
+        except (LLMGatewayError, RuntimeError) as e:
+            print(f"Błąd transkrypcji {file_path}: {e}")
+        except Exception as e:
+            # Np. błąd odczytu pliku albo niepoprawna odpowiedź - pozostałe nagrania są przetwarzane dalej
+            print(f"Nieoczekiwany błąd transkrypcji {file_path}: {type(e).__name__}: {e}")
+
+async def main_async():
+    store = TranscriptStore(os.path.join(AUDIO_DIR, STORE_FILE))
+    filenames = sorted(f for f in os.listdir(AUDIO_DIR) if f.endswith(".m4a"))
+
+    # Skróty nagrań: pliki już przetworzone (także pod inną nazwą) i duplikaty są pomijane
+    hashes = await asyncio.gather(*(asyncio.to_thread(sha256_file, os.path.join(AUDIO_DIR, f)) for f in filenames))
+    file_hashes = dict(zip(filenames, hashes))
+
+    # Transkrypcje z poprzedniej wersji skryptu (transcripts.json) nie są robione drugi raz
+    output_path = os.path.join(AUDIO_DIR, OUTPUT_FILE)
+    if os.path.exists(output_path):
+        with open(output_path, 'r', encoding='utf-8') as f:
+            previous = json.load(f)
+        for filename, sha256 in file_hashes.items():
+            if sha256 not in store and filename in previous:
+                store.add(sha256, previous[filename], file=filename, model="whisper-1", language="pl")
+
+    pending = {}
+    for filename, sha256 in file_hashes.items():
+        if sha256 not in store and sha256 not in pending:
+            pending[sha256] = os.path.join(AUDIO_DIR, filename)
+    print(f"Pliki audio: {len(filenames)}, pominięte (gotowe lub duplikaty): {len(filenames) - len(pending)}, do transkrypcji: {len(pending)}")
+
+    semaphore = asyncio.Semaphore(MAX_CONCURRENCY)
+    async with LLMGateway(max_concurrency=MAX_CONCURRENCY) as gateway:
+        await asyncio.gather(*(
+            transcribe_file(gateway, store, semaphore, sha256, file_path)
+            for sha256, file_path in pending.items()
+        ))
+
+    transcripts = {filename: store.get(sha256) for filename, sha256 in file_hashes.items() if sha256 in store}
+    with open(output_path, "w", encoding="utf-8") as f:
         json.dump(transcripts, f, ensure_ascii=False, indent=2)
-    
-    print("Transkrypcje zostały zapisane do pliku transcripts.json")
+
+    missing = len(filenames) - len(transcripts)
+    if missing:
+        print(f"Nie udało się przetworzyć {missing} plików - uruchom skrypt ponownie, gotowe transkrypcje zostaną pominięte")
+    print(f"Transkrypcje zostały zapisane do pliku {OUTPUT_FILE}")
+
+def main():
+    asyncio.run(main_async())
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
@@ -1,45 +1,37 @@
 import os
-from PIL import Image
-import base64
-from io import BytesIO
-import requests
-import json
-from typing import Dict
+import re
+import sys
+import asyncio
+from collections import Counter
+from pathlib import Path
+from typing import AsyncIterator, Dict, Optional
 import logging
 from dotenv import load_dotenv
 
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+from common.llm_gateway import LLMGateway, SyncLLMGateway, LLMGatewayError
+from common.completion_cache import CompletionCache
+from common.vision_cache import VisionCache
+from common.image_prep import ImagePreprocessor, model_size
+from PIL import Image
+
 # Wczytaj zmienne środowiskowe z pliku .env
 load_dotenv()
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-class MapAnalyzer:
-    def __init__(self):
-        self.api_key = os.getenv("OPENAI_API_KEY")
-        if not self.api_key:
-            raise ValueError("Brak klucza API OpenAI w pliku .env")
-            
-        self.api_url = "https://api.openai.com/v1/chat/completions"
-        self.headers = {
-            "Content-Type": "application/json",
-            "Authorization": f"Bearer {self.api_key}"
-        }
-        logger.info("Inicjalizacja analizatora map z GPT-4o")
-
-    def encode_image(self, image_path: str) -> str:
-        """Koduje obraz do formatu base64."""
-        with Image.open(image_path) as image:
-            buffered = BytesIO()
-            image.save(buffered, format="JPEG")
-            return base64.b64encode(buffered.getvalue()).decode('utf-8')
+# Liczba fragmentów analizowanych jednocześnie i limit czasu analizy jednego fragmentu
+MAP_CONCURRENCY = int(os.getenv("MAP_CONCURRENCY", "4"))
+MAP_TIMEOUT = float(os.getenv("MAP_TIMEOUT", "90"))
+MAP_EXTENSIONS = ('.jpg', '.JPG', '.png', '.PNG')
+# Tryb wycinków: "auto" tnie tylko mapy, które model by zmniejszył; "on" - zawsze, "off" - nigdy
+MAP_TILING = os.getenv("MAP_TILING", "auto")
+# Wycinek nie większy niż 768 px model widzi w pełnej rozdzielczości
+MAP_TILE_SIZE = int(os.getenv("MAP_TILE_SIZE", "768"))
+MAP_TILE_OVERLAP = int(os.getenv("MAP_TILE_OVERLAP", "128"))
 
-    def analyze_image(self, image_path: str) -> str:
-        """Analizuje pojedynczy obraz mapy używając GPT-4o."""
-        try:
-            base64_image = self.encode_image(image_path)
-            
-            prompt = """Przeanalizuj dokładnie ten fragment mapy miasta. Zwróć szczególną uwagę na:
+PROMPT = """Przeanalizuj dokładnie ten fragment mapy miasta. Zwróć szczególną uwagę na:
             1. Nazwy ulic - przeczytaj dokładnie wszystkie widoczne nazwy
             2. Charakterystyczne budynki i obiekty (kościoły, szkoły, cmentarze, parki)
             3. Układ urbanistyczny (regularny/nieregularny, typ zabudowy)
@@ -51,67 +43,313 @@ class MapAnalyzer:
             UKŁAD: [dokładny opis układu urbanistycznego]
             MIASTO: [nazwa miasta, jeśli jesteś pewien, lub "niepewne" jeśli nie możesz określić]"""
 
-            payload = {
-                "model": "gpt-4o",
-                "messages": [
+TILE_PROMPT = (
+    "To jest wycinek większej mapy - nazwy przecięte na krawędzi wycinka podaj tak, jak je widać, "
+    "zakończone znakiem …\n" + PROMPT
+)
+
+# Końcówki nazwy przeciętej na krawędzi wycinka (split_names zamienia je na "…")
+TRUNCATION_MARKERS = ("…", "...", "-")
+
+# Odpowiedzi w polu MIASTO, które nie są głosem na żadne miasto
+UNCERTAIN_CITY = {"", "niepewne", "nieznane", "brak", "nie wiem"}
+
+def map_payload(image_url: str, prompt: str = PROMPT) -> dict:
+    """Zapytanie analizujące jeden fragment mapy."""
+    return {
+        "model": "gpt-4o",
+        "messages": [
+            {
+                "role": "user",
+                "content": [
+                    {"type": "text", "text": prompt},
                     {
-                        "role": "user",
-                        "content": [
-                            {"type": "text", "text": prompt},
-                            {
-                                "type": "image_url",
-                                "image_url": {
-                                    "url": f"data:image/jpeg;base64,{base64_image}"
-                                }
-                            }
-                        ]
+                        "type": "image_url",
+                        "image_url": {
+                            "url": image_url
+                        }
                     }
-                ],
-                "max_tokens": 1000
+                ]
             }
+        ],
+        "max_tokens": 1000
+    }
+
+def log_gateway_error(e: LLMGatewayError):
+    if e.status_code == 404:
+        logger.error("Model GPT-4o nie jest dostępny. Sprawdź, czy masz dostęp do tego modelu w swoim koncie OpenAI.")
+    elif e.status_code == 401:
+        logger.error("Nieprawidłowy klucz API. Sprawdź swój klucz API w pliku .env")
+    else:
+        logger.error(f"Błąd HTTP: {str(e)}")
+
+def parse_field(analysis: str, field: str) -> Optional[str]:
+    """Wartość pola (np. `ULICY:`, `**ULICY:**`) z odpowiedzi modelu; przy kilku wystąpieniach ostatnia."""
+    matches = re.findall(rf"^\W*{field}\W*?:[\s*_]*(.*)$", analysis, flags=re.MULTILINE | re.IGNORECASE)
+    return matches[-1].strip() if matches else None
+
+def parse_city(analysis: str) -> Optional[str]:
+    """Nazwa miasta z linii `MIASTO:` odpowiedzi albo None, jeśli model nie był pewien."""
+    city = parse_field(analysis, "MIASTO")
+    if city is None:
+        return None
+    city = city.strip("[]\"'*.,;").strip()
+    if city.lower() in UNCERTAIN_CITY or city.lower().startswith("niepewn"):
+        return None
+    return city
+
+def split_names(value: Optional[str]) -> list[str]:
+    """Lista nazw z pola `ULICY:` / `OBIEKTY:` ("[a, b]", "a; b").
+
+    Nazwa przecięta na krawędzi wycinka ("Kości...", "Kości-") dostaje na końcu "…".
+    """
+    if not value:
+        return []
+    names = []
+    for raw in re.split(r"[,;]", value.strip().strip("[]")):
+        raw = raw.strip().strip("[]\"'*").strip()
+        name = raw.strip("-.…").strip()
+        if name and raw.endswith(TRUNCATION_MARKERS):
+            name += "…"
+        names.append(name)
+    return [name for name in names if name and name.lower() not in UNCERTAIN_CITY and name.lower() != "brak widocznych"]
+
+def _name_key(name: str) -> str:
+    key = re.sub(r"^(ul\.|ulica)\s*", "", name.casefold().rstrip("….-"))
+    return re.sub(r"\s+", " ", key).strip()
+
+def _cut_off(short_name: str, short_key: str, long_key: str) -> bool:
+    """Czy krótsza nazwa to początek dłuższej ucięty na krawędzi wycinka.
+
+    Tak, gdy ma znacznik "…" albo kończy się w środku słowa ("Kości" / "Kościuszki"). Nazwa, po której
+    w dłuższej następuje nowe słowo ("Kościół" / "Kościół św. Anny"), to osobny obiekt.
+    """
+    if len(short_key) < 4 or len(long_key) <= len(short_key) or not long_key.startswith(short_key):
+        return False
+    return short_name.endswith(TRUNCATION_MARKERS) or long_key[len(short_key)].isalnum()
+
+def merge_names(lists: list[list[str]]) -> list[str]:
+    """Łączy listy nazw z wycinków bez powtórzeń, w kolejności pierwszego wystąpienia.
+
+    Nazwy są porównywane bez wielkości liter i przedrostka "ul.". Nazwa przecięta na krawędzi wycinka
+    (początek innej nazwy, co najmniej 4 znaki, ze znacznikiem "…" albo urwana w środku słowa) jest
+    łączona z pełną - zostaje dłuższa wersja. Pozostałe nazwy są zachowywane, także gdy jedna jest
+    początkiem drugiej.
+    """
+    merged: list[tuple[str, str]] = []
+    for names in lists:
+        for name in names:
+            key = _name_key(name)
+            for i, (seen_key, seen_name) in enumerate(merged):
+                if seen_key == key or _cut_off(name, key, seen_key) or _cut_off(seen_name, seen_key, key):
+                    # Zostaje dłuższa wersja, a przy równych - ta bez znacznika przecięcia
+                    if len(key) > len(seen_key) or (key == seen_key and seen_name.endswith(TRUNCATION_MARKERS)):
+                        merged[i] = (key, name)
+                    break
+            else:
+                merged.append((key, name))
+    return [name for _, name in merged]
+
+def merge_tile_analyses(analyses: list[str]) -> str:
+    """Składa odpowiedzi z wycinków jednej mapy w jedną odpowiedź w formacie PROMPT.
+
+    ULICY i OBIEKTY są łączone bez powtórzeń z zakładek, UKŁAD to najdokładniejszy (najdłuższy) opis,
+    a MIASTO - miasto wskazane przez najwięcej wycinków.
+    """
+    analyses = [analysis for analysis in analyses if analysis]
+    streets = merge_names([split_names(parse_field(a, "ULICY")) for a in analyses])
+    objects = merge_names([split_names(parse_field(a, "OBIEKTY")) for a in analyses])
+    layout = max((parse_field(a, "UKŁAD") or "" for a in analyses), key=len, default="")
+    ranking = aggregate_city_votes(dict(enumerate(analyses)))
+    city = ranking[0][0] if ranking else "niepewne"
+    return "\n".join([
+        f"ULICY: {', '.join(streets)}",
+        f"OBIEKTY: {', '.join(objects)}",
+        f"UKŁAD: {layout}",
+        f"MIASTO: {city}",
+    ])
+
+def aggregate_city_votes(results: Dict[str, str]) -> list[tuple[str, int]]:
+    """Ranking miast według liczby fragmentów, które je wskazały (bez dodatkowych zapytań).
+
+    Głosy są liczone bez względu na wielkość liter; wypisywana jest najczęstsza pisownia.
+    Przy remisie wyżej jest miasto wskazane wcześniej.
+    """
+    votes = Counter()
+    spellings = {}
+    for analysis in results.values():
+        city = parse_city(analysis or "")
+        if city is None:
+            continue
+        key = city.casefold()
+        votes[key] += 1
+        spellings.setdefault(key, Counter())[city] += 1
+    return [(spellings[key].most_common(1)[0][0], count) for key, count in votes.most_common()]
+
+class MapAnalyzer:
+    def __init__(self):
+        self.api_key = os.getenv("OPENAI_API_KEY")
+        if not self.api_key:
+            raise ValueError("Brak klucza API OpenAI w pliku .env")
+            
+        self._gateway = None
+        # Obrazy zmniejszane do rozdzielczości widzianej przez model, bez przycinania do kafelków
+        # (drobne nazwy ulic muszą zostać czytelne)
+        self.images = ImagePreprocessor(tile_slack=0)
+        logger.info("Inicjalizacja analizatora map z GPT-4o")
 
+    @property
+    def gateway(self) -> SyncLLMGateway:
+        """Synchroniczna brama dla analyze_image (tworzona dopiero przy pierwszym użyciu)."""
+        if self._gateway is None:
+            # Deterministyczne powtórne analizy tych samych map (także po ponownej kompresji
+            # lub zmianie rozmiaru pliku) są obsługiwane z cache, bez ruchu sieciowego
+            self._gateway = SyncLLMGateway(api_key=self.api_key, cache=CompletionCache(), vision_cache=VisionCache())
+        return self._gateway
+
+    def encode_image(self, image_path: str) -> str:
+        """Zwraca obraz przygotowany do wysłania (zmniejszony JPEG bez metadanych) jako data URL."""
+        return self.images.prepare(image_path).data_url()
+
+    def analyze_image(self, image_path: str, image_url: Optional[str] = None) -> str:
+        """Analizuje pojedynczy obraz mapy używając GPT-4o."""
+        try:
+            image_url = image_url or self.encode_image(image_path)
             try:
-                response = requests.post(self.api_url, headers=self.headers, json=payload)
-                response.raise_for_status()
-                return response.json()["choices"][0]["message"]["content"]
-            except requests.exceptions.HTTPError as e:
-                if e.response.status_code == 404:
-                    logger.error("Model GPT-4o nie jest dostępny. Sprawdź, czy masz dostęp do tego modelu w swoim koncie OpenAI.")
-                elif e.response.status_code == 401:
-                    logger.error("Nieprawidłowy klucz API. Sprawdź swój klucz API w pliku .env")
-                else:
-                    logger.error(f"Błąd HTTP: {str(e)}")
-                return ""
-            except json.JSONDecodeError:
-                logger.error("Nieprawidłowa odpowiedź z API")
+                return self.gateway.chat_text(map_payload(image_url))
+            except LLMGatewayError as e:
+                log_gateway_error(e)
                 return ""
             
         except Exception as e:
             logger.error(f"Błąd podczas analizy obrazu {image_path}: {str(e)}")
             return ""
 
+    async def analyze_image_async(self, gateway: LLMGateway, image_path: str) -> str:
+        """Asynchroniczna wersja analyze_image: obraz przygotowywany w puli procesów, zapytanie przez wspólną bramę."""
+        try:
+            image = await self.images.prepare_async(image_path)
+            try:
+                return await gateway.chat_text(map_payload(image.data_url()))
+            except LLMGatewayError as e:
+                log_gateway_error(e)
+                return ""
+        except Exception as e:
+            logger.error(f"Błąd podczas analizy obrazu {image_path}: {str(e)}")
+            return ""
+
+    def should_tile(self, image_path: str) -> bool:
+        """Czy mapę analizować wycinkami (MAP_TILING): w trybie auto - gdy model musiałby ją zmniejszyć."""
+        if MAP_TILING in ("on", "off"):
+            return MAP_TILING == "on"
+        with Image.open(image_path) as image:
+            return model_size(*image.size) != image.size
+
+    async def analyze_tiled_async(self, gateway: LLMGateway, image_path: str, timeout: float = MAP_TIMEOUT) -> str:
+        """Analizuje mapę wycinkami w pełnej rozdzielczości (równolegle) i łączy wyniki.
+
+        Prawie puste wycinki (jednolite tło, brak krawędzi) są pomijane bez zapytania. Wycinek,
+        którego analiza przekroczy `timeout`, jest pomijany, a reszta wyników zostaje.
+        """
+        tiles, skipped = await self.images.prepare_tiles_async(
+            image_path, tile_size=MAP_TILE_SIZE, overlap=MAP_TILE_OVERLAP
+        )
+        logger.info(f"{Path(image_path).name}: {len(tiles)} wycinków do analizy, {skipped} pustych pominiętych")
+
+        async def analyze_tile(tile) -> str:
+            try:
+                return await asyncio.wait_for(gateway.chat_text(map_payload(tile.image.data_url(), TILE_PROMPT)), timeout)
+            except asyncio.TimeoutError:
+                logger.error(f"Przekroczono limit czasu analizy wycinka {tile.box} mapy {image_path}")
+            except LLMGatewayError as e:
+                log_gateway_error(e)
+            return ""
+
+        return merge_tile_analyses(await asyncio.gather(*(analyze_tile(tile) for tile in tiles)))
+
     def analyze_all_maps(self, map_dir: str) -> Dict[str, str]:
         """Analizuje wszystkie fragmenty map w podanym katalogu."""
+        filenames = [f for f in os.listdir(map_dir) if f.endswith(('.jpg', '.JPG', '.png', '.PNG'))]
+        # Wszystkie obrazy są przygotowywane naraz w puli procesów
+        prepared = self.images.prepare_many([os.path.join(map_dir, f) for f in filenames])
         results = {}
-        for filename in os.listdir(map_dir):
-            if filename.endswith(('.jpg', '.JPG', '.png', '.PNG')):
-                image_path = os.path.join(map_dir, filename)
-                logger.info(f"Analizuję {filename}")
-                results[filename] = self.analyze_image(image_path)
+        for filename, image in zip(filenames, prepared):
+            logger.info(f"Analizuję {filename} ({image.width}x{image.height}, {len(image.data) // 1024} KB)")
+            results[filename] = self.analyze_image(os.path.join(map_dir, filename), image.data_url())
         return results
 
-def main():
+    async def analyze_all_maps_async(
+        self,
+        map_dir: str,
+        max_concurrency: int = MAP_CONCURRENCY,
+        timeout: float = MAP_TIMEOUT,
+    ) -> AsyncIterator[tuple[str, str]]:
+        """Analizuje fragmenty map równolegle i zwraca pary (plik, analiza) w kolejności ukończenia.
+
+        Jednocześnie analizowanych jest najwyżej `max_concurrency` fragmentów, wszystkie przez jedną
+        pulę połączeń. Fragment, którego analiza przekroczy `timeout` sekund, dostaje pustą analizę.
+        Duże mapy są analizowane wycinkami (`analyze_tiled_async`, limit czasu dotyczy wtedy wycinka).
+        """
+        filenames = sorted(f for f in os.listdir(map_dir) if f.endswith(MAP_EXTENSIONS))
+        semaphore = asyncio.Semaphore(max_concurrency)
+
+        async with LLMGateway(
+            api_key=self.api_key, max_concurrency=max_concurrency, cache=CompletionCache(), vision_cache=VisionCache()
+        ) as gateway:
+            async def analyze(filename: str) -> tuple[str, str]:
+                async with semaphore:
+                    logger.info(f"Analizuję {filename}")
+                    image_path = os.path.join(map_dir, filename)
+                    try:
+                        if await asyncio.to_thread(self.should_tile, image_path):
+                            return filename, await self.analyze_tiled_async(gateway, image_path, timeout)
+                        analysis = await asyncio.wait_for(self.analyze_image_async(gateway, image_path), timeout)
+                    except asyncio.TimeoutError:
+                        logger.error(f"Przekroczono limit czasu ({timeout:.0f}s) analizy {filename}")
+                        analysis = ""
+                    except Exception as e:
+                        logger.error(f"Błąd podczas analizy obrazu {image_path}: {str(e)}")
+                        analysis = ""
+                    return filename, analysis
+
+            tasks = [asyncio.create_task(analyze(filename)) for filename in filenames]
+            try:
+                for next_done in asyncio.as_completed(tasks):
+                    yield await next_done
+            finally:
+                # Przerwanie iteracji przez wywołującego anuluje pozostałe analizy; czekamy na ich
+                # zakończenie, zanim brama zamknie pulę połączeń
+                pending = [task for task in tasks if not task.done()]
+                for task in pending:
+                    task.cancel()
+                await asyncio.gather(*pending, return_exceptions=True)
+
+async def main_async():
+    analyzer = MapAnalyzer()
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    results = {}
     try:
-        analyzer = MapAnalyzer()
-        current_dir = os.path.dirname(os.path.abspath(__file__))
-        results = analyzer.analyze_all_maps(current_dir)
-        
         print("\nWyniki analizy map:")
         print("=" * 50)
-        for filename, analysis in results.items():
+        # Wyniki wypisywane od razu, w kolejności ukończenia
+        async for filename, analysis in analyzer.analyze_all_maps_async(current_dir):
+            results[filename] = analysis
             print(f"\nAnaliza {filename}:")
             print(analysis)
             print("-" * 50)
+    finally:
+        analyzer.images.close()
+
+    ranking = aggregate_city_votes(results)
+    print("\nGłosy na miasto (fragmenty map):")
+    if not ranking:
+        print("Żaden fragment nie wskazał miasta")
+    for place, (city, votes) in enumerate(ranking, start=1):
+        print(f"{place}. {city} - {votes}/{len(results)}")
+
+def main():
+    try:
+        asyncio.run(main_async())
     except Exception as e:
         logger.error(f"Wystąpił błąd: {str(e)}")
 
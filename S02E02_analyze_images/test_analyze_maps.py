@@ -0,0 +1,146 @@
+import asyncio
+import os
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import httpx
+from PIL import Image
+
+import analyze_maps
+from analyze_maps import MapAnalyzer, aggregate_city_votes, merge_names, merge_tile_analyses, parse_city, split_names
+
+
+class TestParseCity(unittest.TestCase):
+    def test_free_form_answers(self):
+        self.assertEqual(parse_city("ULICY: Kalinkowa\nMIASTO: Grudziądz"), "Grudziądz")
+        self.assertEqual(parse_city("**MIASTO:** [\"Grudziądz\"]."), "Grudziądz")
+        self.assertEqual(parse_city("- miasto : Toruń;"), "Toruń")
+        self.assertEqual(merge_tile_analyses(["**ULICY:** [Kalinkowa, Rynek]"]).splitlines()[0], "ULICY: Kalinkowa, Rynek")
+        # Przy kilku liniach MIASTO liczy się ostatnia (model poprawił się w trakcie odpowiedzi)
+        self.assertEqual(parse_city("MIASTO: niepewne\nPo namyśle:\nMIASTO: Bydgoszcz"), "Bydgoszcz")
+
+    def test_uncertain_or_missing_city(self):
+        for analysis in ("MIASTO: niepewne", "MIASTO: [Niepewne - może Toruń]", "MIASTO: brak", "MIASTO:", "Na mapie widać park."):
+            with self.subTest(analysis=analysis):
+                self.assertIsNone(parse_city(analysis))
+
+
+class TestMergeNames(unittest.TestCase):
+    def test_duplicates_and_street_prefix(self):
+        self.assertEqual(
+            merge_names([["ul. Kalinkowa", "Rynek"], ["kalinkowa", "ulica Rynek", "Parkowa"]]),
+            ["ul. Kalinkowa", "Rynek", "Parkowa"],
+        )
+
+    def test_name_cut_mid_word_is_merged(self):
+        self.assertEqual(merge_names([["Kalinko"], ["Kalinkowa", "Rynek"]]), ["Kalinkowa", "Rynek"])
+        self.assertEqual(merge_names([["Kalinkowa"], ["Kalinko"]]), ["Kalinkowa"])
+
+    def test_name_with_truncation_marker_is_merged(self):
+        names = split_names("[Kościół…, Mickiew..., Park-]")
+        self.assertEqual(names, ["Kościół…", "Mickiew…", "Park…"])
+        self.assertEqual(
+            merge_names([names, ["Kościół Mariacki", "ul. Mickiewicza"]]),
+            ["Kościół Mariacki", "ul. Mickiewicza", "Park…"],
+        )
+        self.assertEqual(merge_names([["Rynek…"], ["Rynek"]]), ["Rynek"])
+
+    def test_complete_prefix_is_a_separate_name(self):
+        self.assertEqual(merge_names([["Kościół"], ["Kościół św. Anny"]]), ["Kościół", "Kościół św. Anny"])
+        self.assertEqual(merge_names([["Park Miejski"], ["Park"]]), ["Park Miejski", "Park"])
+        # Krótkie nazwy (poniżej 4 znaków) nie są łączone z dłuższymi
+        self.assertEqual(merge_names([["Ale"], ["Aleja Róż"]]), ["Ale", "Aleja Róż"])
+
+
+class TestCityVotes(unittest.TestCase):
+    def test_counts_votes_case_insensitively(self):
+        results = {
+            "a.png": "MIASTO: Grudziądz",
+            "b.png": "MIASTO: grudziądz",
+            "c.png": "MIASTO: Toruń",
+            "d.png": "MIASTO: niepewne",
+            "e.png": "",
+            "f.png": "MIASTO: Grudziądz",
+        }
+        self.assertEqual(aggregate_city_votes(results), [("Grudziądz", 3), ("Toruń", 1)])
+
+    def test_tie_keeps_first_named_city(self):
+        results = {"a.png": "MIASTO: Toruń", "b.png": "MIASTO: Bydgoszcz", "c.png": "MIASTO: bydgoszcz", "d.png": "MIASTO: Toruń"}
+        self.assertEqual(aggregate_city_votes(results), [("Toruń", 2), ("Bydgoszcz", 2)])
+        self.assertEqual(
+            aggregate_city_votes({"a.png": "MIASTO: Bydgoszcz", "b.png": "MIASTO: Toruń"}),
+            [("Bydgoszcz", 1), ("Toruń", 1)],
+        )
+        # Przy remisie w pisowni wypisywana jest ta, która pojawiła się pierwsza
+        self.assertEqual(aggregate_city_votes({"a.png": "MIASTO: toruń", "b.png": "MIASTO: Toruń"}), [("toruń", 2)])
+
+    def test_no_votes(self):
+        self.assertEqual(aggregate_city_votes({"a.png": "MIASTO: niepewne", "b.png": None}), [])
+
+
+class TestMergeTileAnalyses(unittest.TestCase):
+    def test_merges_tiles_into_one_answer(self):
+        analyses = [
+            "ULICY: [Kalinko, Rynek]\nOBIEKTY: [Kościół]\nUKŁAD: regularny\nMIASTO: Grudziądz",
+            "ULICY: [Kalinkowa, Parkowa]\nOBIEKTY: [Kościół św. Anny]\nUKŁAD: regularny, zwarta zabudowa\nMIASTO: niepewne",
+            "",
+        ]
+        self.assertEqual(merge_tile_analyses(analyses), "\n".join([
+            "ULICY: Kalinkowa, Rynek, Parkowa",
+            "OBIEKTY: Kościół, Kościół św. Anny",
+            "UKŁAD: regularny, zwarta zabudowa",
+            "MIASTO: Grudziądz",
+        ]))
+        self.assertTrue(merge_tile_analyses([]).endswith("MIASTO: niepewne"))
+
+
+class TestAnalyzeAllMapsAsync(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        cwd = os.getcwd()
+        os.chdir(self.tmp.name)  # cache/images przygotowanych obrazów
+        self.addCleanup(os.chdir, cwd)
+        for i in range(3):
+            Image.new("RGB", (64, 64), (i * 80, 100, 100)).save(f"mapa{i}.png")
+
+        self.calls = 0
+        gateway_class = analyze_maps.LLMGateway
+        transport = httpx.MockTransport(self.handler)
+        patches = [
+            mock.patch.dict(os.environ, {"OPENAI_API_KEY": "test"}),
+            mock.patch.object(analyze_maps, "LLMGateway", lambda **kw: gateway_class(**{**kw, "transport": transport})),
+            mock.patch.object(analyze_maps, "CompletionCache", lambda: None),
+            mock.patch.object(analyze_maps, "VisionCache", lambda: None),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    async def handler(self, request):
+        # Pierwsza odpowiedź od razu, pozostałe dopiero po długiej chwili
+        self.calls += 1
+        if self.calls > 1:
+            await asyncio.sleep(30)
+        return httpx.Response(200, json={"choices": [{"message": {"content": "MIASTO: Grudziądz"}}]})
+
+    def test_stopping_early_cancels_and_awaits_remaining_analyses(self):
+        analyzer = MapAnalyzer()
+        self.addCleanup(analyzer.images.close)
+
+        async def run():
+            results = analyzer.analyze_all_maps_async(".", max_concurrency=3, timeout=60)
+            first = await anext(results)
+            await results.aclose()
+            # Pozostałe analizy są już zakończone (anulowane), a nie tylko oznaczone do anulowania
+            return first, asyncio.all_tasks() - {asyncio.current_task()}
+
+        first, left = asyncio.run(run())
+        self.assertEqual(first[1], "MIASTO: Grudziądz")
+        self.assertEqual(left, set())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,14 +1,22 @@
 import os
+import sys
 import json
+import time
+import asyncio
 import requests
 from pathlib import Path
 from dotenv import load_dotenv
-import whisper
-from PIL import Image
-import base64
-from io import BytesIO
 import logging
 
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+from common.llm_gateway import LLMGateway
+from common.completion_cache import CompletionCache
+from common.vision_cache import VisionCache
+from common.whisper_pool import WhisperPool
+from common.image_prep import ImagePreprocessor
+from common.run_manifest import RunManifest
+from common.prompt_packing import estimate_text_tokens, pack_items, parse_id_mapping, render_numbered
+
 # Konfiguracja logowania
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -20,18 +28,30 @@ API_KEY = os.getenv("OPENAI_API_KEY")
 if not API_KEY:
     raise ValueError("Brak klucza API OpenAI w pliku .env")
 
-api_url = "https://api.openai.com/v1/chat/completions"
-headers = {
-    "Content-Type": "application/json",
-    "Authorization": f"Bearer {API_KEY}"
-}
-
-def analyze_text_file(file_path):
-    """Analizuje plik tekstowy i zwraca kategorię."""
-    logger.info(f"Analizuję plik tekstowy: {file_path}")
-    with open(file_path, 'r', encoding='utf-8') as f:
-        content = f.read()
-    
+MODEL = "gpt-4o"
+# Zmień przy każdej zmianie treści promptów - pliki sklasyfikowane inną wersją zostaną przeanalizowane ponownie
+PROMPT_VERSION = 1
+# Manifest sklasyfikowanych plików (ścieżka, skrót treści, kategoria, model, wersja promptu)
+MANIFEST_FILE = "manifest.jsonl"
+
+# Pula procesów z wczytanym modelem Whisper (model wczytywany raz na proces, nie raz na plik)
+WHISPER_MODEL = os.getenv("WHISPER_MODEL", "base")
+WHISPER_WORKERS = int(os.getenv("WHISPER_WORKERS", str(os.cpu_count() or 1)))
+# Nagrania dłuższe niż tyle sekund są dzielone w miejscach ciszy i transkrybowane fragmentami przez wszystkie procesy
+WHISPER_LONG_SECONDS = float(os.getenv("WHISPER_LONG_SECONDS", "120"))
+# Liczba jednoczesnych zapytań klasyfikujących do API
+LLM_CONCURRENCY = int(os.getenv("LLM_CONCURRENCY", "8"))
+# Notatki tekstowe pakowane po kilka do jednego zapytania (budżet tokenów paczki; 0 wyłącza pakowanie)
+TEXT_BATCH_TOKENS = int(os.getenv("TEXT_BATCH_TOKENS", "4000"))
+TEXT_BATCH_MAX_ITEMS = int(os.getenv("TEXT_BATCH_MAX_ITEMS", "25"))
+CATEGORIES = {"people", "hardware", "none"}
+
+TEXT_EXTENSIONS = {'.txt'}
+IMAGE_EXTENSIONS = {'.png', '.jpg', '.jpeg'}
+AUDIO_EXTENSIONS = {'.mp3', '.wav'}
+
+def text_payload(content):
+    """Zapytanie klasyfikujące treść pliku tekstowego."""
     prompt = f"""Przeanalizuj poniższy tekst i zaklasyfikuj go do jednej z kategorii:
     - people: Uwzględniaj tylko notatki zawierające informacje o SCHWYTANYCH LUDZIACH lub o ŚLADACH ICH OBECNOŚCI.
     - hardware: Usterki hardwarowe (nie software) - tylko jeśli notatki zawierają informacje o USTERKACH w HARDWARE.
@@ -43,32 +63,39 @@ def analyze_text_file(file_path):
     Pamiętaj:
     - Kategoria "hardware" powinna być używana WYŁĄCZNIE dla USTEREK HARDWARE"""
     
-    payload = {
-        "model": "gpt-4o",
+    return {
+        "model": MODEL,
         "messages": [{"role": "user", "content": prompt}],
         "temperature": 0
     }
+
+def packed_text_payload(contents):
+    """Jedno zapytanie klasyfikujące kilka ponumerowanych notatek; odpowiedź to JSON {numer: kategoria}."""
+    prompt = f"""Poniżej znajduje się {len(contents)} ponumerowanych notatek. Zaklasyfikuj KAŻDĄ z nich osobno do jednej z kategorii:
+    - people: Uwzględniaj tylko notatki zawierające informacje o SCHWYTANYCH LUDZIACH lub o ŚLADACH ICH OBECNOŚCI.
+    - hardware: Usterki hardwarowe (nie software) - tylko jeśli notatki zawierają informacje o USTERKACH w HARDWARE.
+    - w przeciwnym razie zwróć none
     
-    try:
-        response = requests.post(api_url, headers=headers, json=payload)
-        response.raise_for_status()
-        category = response.json()["choices"][0]["message"]["content"].strip().lower()
-        logger.info(f"Kategoria dla {file_path}: {category}")
-        return category
-    except Exception as e:
-        logger.error(f"Błąd podczas analizy pliku {file_path}: {str(e)}")
-        return "none"
+    Pamiętaj:
+    - Kategoria "hardware" powinna być używana WYŁĄCZNIE dla USTEREK HARDWARE
+    
+    Odpowiedz wyłącznie obiektem JSON, w którym kluczem jest numer notatki, a wartością kategoria, np. {{"1": "people", "2": "none"}}.
+    
+    {render_numbered(contents)}"""
+    
+    return {
+        "model": MODEL,
+        "messages": [{"role": "user", "content": prompt}],
+        "response_format": {"type": "json_object"},
+        "temperature": 0
+    }
 
-def encode_image_to_base64(image_path):
-    """Konwertuje obraz do formatu base64."""
-    with open(image_path, "rb") as image_file:
-        return base64.b64encode(image_file.read()).decode('utf-8')
+def prompt_tokens(payload):
+    """Szacunkowa liczba tokenów tekstu zapytania (do porównania trybu paczek z pojedynczymi zapytaniami)."""
+    return sum(estimate_text_tokens(m["content"]) for m in payload["messages"] if isinstance(m["content"], str))
 
-def analyze_image_file(file_path):
-    """Analizuje plik obrazu i zwraca kategorię."""
-    logger.info(f"Analizuję plik obrazu: {file_path}")
-    base64_image = encode_image_to_base64(file_path)
-    
+def image_payload(image_url):
+    """Zapytanie klasyfikujące obraz."""
     prompt = """Przeanalizuj poniższy obraz i zaklasyfikuj go do jednej z kategorii:
     - people: Uwzględniaj tylko notatki zawierające informacje o SCHWYTANYCH LUDZIACH lub o ŚLADACH ICH OBECNOŚCI.
     - hardware: Usterki hardwarowe (nie software) - tylko jeśli notatki zawierają informacje o USTERKACH w HARDWARE.
@@ -76,8 +103,8 @@ def analyze_image_file(file_path):
     
     Odpowiedz tylko jedną kategorią: people, hardware lub none."""
     
-    payload = {
-        "model": "gpt-4o",
+    return {
+        "model": MODEL,
         "messages": [
             {
                 "role": "user",
@@ -86,7 +113,7 @@ def analyze_image_file(file_path):
                     {
                         "type": "image_url",
                         "image_url": {
-                            "url": f"data:image/png;base64,{base64_image}"
+                            "url": image_url
                         }
                     }
                 ]
@@ -94,37 +121,10 @@ def analyze_image_file(file_path):
         ],
         "max_tokens": 150
     }
-    
-    try:
-        response = requests.post(api_url, headers=headers, json=payload)
-        response.raise_for_status()
-        category = response.json()["choices"][0]["message"]["content"].strip().lower()
-        logger.info(f"Kategoria dla {file_path}: {category}")
-        return category
-    except Exception as e:
-        logger.error(f"Błąd podczas analizy pliku {file_path}: {str(e)}")
-        return "none"
 
-def analyze_audio_file(file_path):
-    """Analizuje plik audio i zwraca kategorię."""
-    logger.info(f"Analizuję plik audio: {file_path}")
-    try:
-        # Konwertujemy na obiekt Path jeśli nie jest
-        file_path = Path(file_path)
-        logger.info(f"Pełna ścieżka do pliku audio: {file_path.absolute()}")
-        
-        if not file_path.exists():
-            logger.error(f"Plik audio nie istnieje: {file_path}")
-            return "none"
-            
-        logger.info(f"Ładowanie modelu Whisper...")
-        model = whisper.load_model("base")
-        logger.info(f"Transkrybuję plik audio: {file_path}")
-        result = model.transcribe(str(file_path))
-        text = result["text"]
-        logger.info(f"Transkrypcja: {text}")
-        
-        prompt = f"""Przeanalizuj poniższy tekst z transkrypcji audio i zaklasyfikuj go do jednej z kategorii:
+def audio_payload(text):
+    """Zapytanie klasyfikujące transkrypcję nagrania."""
+    prompt = f"""Przeanalizuj poniższy tekst z transkrypcji audio i zaklasyfikuj go do jednej z kategorii:
         - people: Uwzględniaj tylko notatki zawierające informacje o SCHWYTANYCH LUDZIACH lub o ŚLADACH ICH OBECNOŚCI.
         - hardware: Usterki hardwarowe (nie software) - tylko jeśli notatki zawierają informacje o USTERKACH w HARDWARE.
         - w przeciwnym razie zwróć none
@@ -132,73 +132,270 @@ def analyze_audio_file(file_path):
         Tekst: {text}
         
         Odpowiedz tylko jedną kategorią: people, hardware lub none."""
-        
-        payload = {
-            "model": "gpt-4o",
-            "messages": [{"role": "user", "content": prompt}],
-            "temperature": 0
-        }
-        
-        response = requests.post(api_url, headers=headers, json=payload)
-        response.raise_for_status()
-        category = response.json()["choices"][0]["message"]["content"].strip().lower()
-        logger.info(f"Kategoria dla {file_path}: {category}")
-        return category
-    except Exception as e:
-        logger.error(f"Błąd podczas analizy pliku {file_path}: {str(e)}")
-        return "none"
+    
+    return {
+        "model": MODEL,
+        "messages": [{"role": "user", "content": prompt}],
+        "temperature": 0
+    }
+
+async def prepare_payload(file_path, images=None):
+    """Czyta plik tekstowy (w wątku) albo przygotowuje obraz (w puli procesów) i buduje zapytanie."""
+    if file_path.suffix.lower() in TEXT_EXTENSIONS:
+        logger.info(f"Analizuję plik tekstowy: {file_path}")
+        content = await asyncio.to_thread(file_path.read_text, encoding='utf-8')
+        return text_payload(content)
+    logger.info(f"Analizuję plik obrazu: {file_path}")
+    image = await images.prepare_async(file_path)
+    logger.info(f"Obraz {file_path.name}: {image.original_bytes // 1024} KB -> {len(image.data) // 1024} KB, tokeny {image.original_tokens} -> {image.tokens}")
+    return image_payload(image.data_url())
+
+class ReportPipeline:
+    """Klasyfikacja raportów jako potok etapów połączonych ograniczonymi kolejkami.
+
+    - obrazy trafiają od razu do kolejki klasyfikacji, a notatki tekstowe są pakowane po kilka
+      w jedno zapytanie (`text_batch_tokens`; notatki z niepoprawną odpowiedzią idą pojedynczo),
+    - nagrania trafiają do kolejki transkrypcji, obsługiwanej przez pulę procesów Whisper
+      (najwyżej dwa nagrania na proces w toku; długie nagrania są dzielone w miejscach ciszy na fragmenty
+      dla wszystkich procesów), a gotowe transkrypcje do kolejki klasyfikacji,
+    - `llm_workers` korutyn klasyfikuje wpisy przez LLMGateway i od razu dopisuje wynik do kategorii.
+
+    Etapy działają jednocześnie, więc czas całości wyznacza najwolniejszy etap, a nie suma plików.
+    Ograniczone kolejki pilnują, żeby szybszy etap nie wyprzedzał wolniejszego o więcej niż kilka plików.
+    """
+
+    def __init__(self, gateway, pool=None, images=None, llm_workers=LLM_CONCURRENCY, text_batch_tokens=TEXT_BATCH_TOKENS, manifest=None, fingerprints=None):
+        self.gateway = gateway
+        self.pool = pool
+        self.images = images
+        self.llm_workers = llm_workers
+        self.text_batch_tokens = text_batch_tokens
+        # Wyniki są od razu zapisywane w manifeście (błędy nie - te pliki zostaną przeanalizowane ponownie)
+        self.manifest = manifest
+        self.fingerprints = fingerprints or {}
+        self.categories = {"people": [], "hardware": [], "none": []}
+        self.stage_seconds = {"transcription": 0.0, "classification": 0.0}
+        # Notatki w paczkach: zapytania i tokeny w porównaniu z klasyfikacją każdej notatki osobno
+        self.packing = {"notes": 0, "requests": 0, "fallbacks": 0, "tokens": 0, "single_tokens": 0}
+
+    async def add_result(self, file_path, category, remember=True):
+        if category not in self.categories:
+            logger.warning(f"Nieznana kategoria: {category}, ustawiam jako 'none'")
+            category = "none"
+        self.categories[category].append(file_path.name)
+        logger.info(f"Dodano {file_path.name} do kategorii {category}")
+        if remember and self.manifest is not None and file_path in self.fingerprints:
+            await asyncio.to_thread(
+                self.manifest.record, file_path, self.fingerprints[file_path],
+                category=category, model=MODEL, prompt_version=PROMPT_VERSION,
+            )
+
+    async def route_files(self, file_paths, audio_queue, llm_queue):
+        """Etap 1: rozdziela pliki według typu; obrazy (i teksty bez pakowania) idą prosto do klasyfikacji."""
+        notes = []
+        for file_path in file_paths:
+            suffix = file_path.suffix.lower()
+            if suffix in AUDIO_EXTENSIONS:
+                await audio_queue.put(file_path)
+            elif suffix in TEXT_EXTENSIONS and self.text_batch_tokens > 0:
+                notes.append(file_path)
+            elif suffix in TEXT_EXTENSIONS or suffix in IMAGE_EXTENSIONS:
+                await llm_queue.put(("file", file_path, None))
+        await audio_queue.put(None)
+        if notes:
+            await self.pack_notes(notes, llm_queue)
+
+    async def pack_notes(self, file_paths, llm_queue):
+        """Czyta notatki i wkłada do kolejki klasyfikacji paczki mieszczące się w budżecie tokenów."""
+        contents = await asyncio.gather(*(asyncio.to_thread(p.read_text, encoding='utf-8') for p in file_paths))
+        overhead = prompt_tokens(packed_text_payload([]))
+        for pack in pack_items(zip(file_paths, contents), self.text_batch_tokens, TEXT_BATCH_MAX_ITEMS, overhead):
+            await llm_queue.put(("pack", pack, None))
+
+    async def classify_pack(self, pack):
+        """Klasyfikuje paczkę notatek jednym zapytaniem; notatki bez poprawnej kategorii - pojedynczo."""
+        file_paths = [file_path for file_path, _ in pack]
+        contents = [content for _, content in pack]
+        payload = packed_text_payload(contents)
+        self.packing["notes"] += len(pack)
+        self.packing["requests"] += 1
+        self.packing["tokens"] += prompt_tokens(payload)
+        self.packing["single_tokens"] += sum(prompt_tokens(text_payload(content)) for content in contents)
+        logger.info(f"Analizuję paczkę {len(pack)} notatek: {', '.join(p.name for p in file_paths)}")
+        try:
+            valid, retry = parse_id_mapping(await self.gateway.chat_text(payload), len(pack), CATEGORIES)
+        except Exception as e:
+            logger.error(f"Błąd podczas analizy paczki notatek: {str(e)}")
+            valid, retry = {}, list(range(1, len(pack) + 1))
+
+        for number, category in valid.items():
+            logger.info(f"Kategoria dla {file_paths[number - 1]}: {category}")
+            await self.add_result(file_paths[number - 1], category)
+        for number in retry:
+            file_path = file_paths[number - 1]
+            logger.warning(f"Brak poprawnej kategorii dla {file_path.name} w odpowiedzi paczki, pytam osobno")
+            single = text_payload(contents[number - 1])
+            self.packing["fallbacks"] += 1
+            self.packing["requests"] += 1
+            self.packing["tokens"] += prompt_tokens(single)
+            await self.classify_file(file_path, single)
+
+    async def classify_file(self, file_path, payload=None):
+        try:
+            if payload is None:
+                payload = await prepare_payload(file_path, self.images)
+            category = (await self.gateway.chat_text(payload)).lower()
+            logger.info(f"Kategoria dla {file_path}: {category}")
+        except Exception as e:
+            logger.error(f"Błąd podczas analizy pliku {file_path}: {str(e)}")
+            await self.add_result(file_path, "none", remember=False)
+            return
+        await self.add_result(file_path, category)
+
+    async def transcribe_audio(self, audio_queue, llm_queue):
+        """Etap 2: transkrypcja nagrań w puli procesów; w toku najwyżej dwa nagrania na proces."""
+        slots = asyncio.Semaphore(2 * self.pool.workers if self.pool else 1)
+        tasks = set()
+
+        async def transcribe(file_path):
+            started = time.perf_counter()
+            try:
+                logger.info(f"Transkrybuję plik audio: {file_path}")
+                # Krótkie nagranie w całości w jednym procesie, długie - fragmentami we wszystkich (WhisperPool.transcribe)
+                result = await asyncio.to_thread(self.pool.transcribe, file_path)
+                logger.info(f"Transkrypcja {file_path.name}: {result['text']}")
+                await llm_queue.put(("file", file_path, audio_payload(result["text"])))
+            except Exception as e:
+                logger.error(f"Błąd podczas transkrypcji pliku {file_path}: {str(e)}")
+                await self.add_result(file_path, "none", remember=False)
+            finally:
+                self.stage_seconds["transcription"] += time.perf_counter() - started
+                slots.release()
+
+        while (file_path := await audio_queue.get()) is not None:
+            await slots.acquire()
+            task = asyncio.create_task(transcribe(file_path))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+        await asyncio.gather(*tasks)
+
+    async def classify(self, llm_queue):
+        """Etap 3: klasyfikacja przez API; wynik trafia do kategorii zaraz po odpowiedzi."""
+        while (item := await llm_queue.get()) is not None:
+            kind, target, payload = item
+            started = time.perf_counter()
+            if kind == "pack":
+                await self.classify_pack(target)
+            else:
+                await self.classify_file(target, payload)
+            self.stage_seconds["classification"] += time.perf_counter() - started
+
+    def packing_summary(self):
+        """Oszczędność z pakowania notatek: zapytania i szacowane tokeny wobec jednego zapytania na notatkę."""
+        stats = self.packing
+        if not stats["notes"]:
+            return None
+        saved_requests = 1 - stats["requests"] / stats["notes"]
+        saved_tokens = 1 - stats["tokens"] / stats["single_tokens"]
+        return (
+            f"Pakowanie notatek: {stats['notes']} notatek w {stats['requests']} zapytaniach "
+            f"(w tym {stats['fallbacks']} pojedynczych ponowień) zamiast {stats['notes']} ({saved_requests:.0%} mniej), "
+            f"tokeny zapytań ~{stats['tokens']} zamiast ~{stats['single_tokens']} ({saved_tokens:.0%} mniej)"
+        )
+
+    async def run(self, file_paths):
+        audio_queue = asyncio.Queue(maxsize=2 * (self.pool.workers if self.pool else 1))
+        llm_queue = asyncio.Queue(maxsize=2 * self.llm_workers)
+        classifiers = [asyncio.create_task(self.classify(llm_queue)) for _ in range(self.llm_workers)]
+
+        await asyncio.gather(
+            self.route_files(file_paths, audio_queue, llm_queue),
+            self.transcribe_audio(audio_queue, llm_queue),
+        )
+        for _ in classifiers:
+            await llm_queue.put(None)
+        await asyncio.gather(*classifiers)
+        return self.categories
+
+def list_report_files(reports_dir, excluded):
+    """Pliki raportów do klasyfikacji (teksty, obrazy, nagrania) w kolejności alfabetycznej."""
+    supported = TEXT_EXTENSIONS | IMAGE_EXTENSIONS | AUDIO_EXTENSIONS
+    files = []
+    for file_path in sorted(reports_dir.glob("*")):
+        if file_path.name in excluded or file_path.is_dir() or file_path.suffix.lower() not in supported:
+            logger.info(f"Pomijam: {file_path.name}")
+            continue
+        logger.info(f"Znaleziono plik: {file_path.name}")
+        files.append(file_path)
+    return files
+
+async def classify_reports(file_paths, manifest):
+    """Klasyfikuje pliki nowe lub zmienione od poprzedniego uruchomienia, a resztę bierze z manifestu.
+
+    Nowe pliki idą przez potok ReportPipeline; pula Whisper powstaje tylko, gdy są wśród nich nagrania.
+    """
+    started = time.perf_counter()
+    fingerprints = dict(zip(file_paths, await asyncio.gather(
+        *(asyncio.to_thread(manifest.fingerprint, file_path) for file_path in file_paths)
+    )))
+    categories = {"people": [], "hardware": [], "none": []}
+    pending = []
+    for file_path in file_paths:
+        entry = manifest.get(file_path, fingerprints[file_path], model=MODEL, prompt_version=PROMPT_VERSION)
+        if entry is not None and entry["category"] in categories:
+            categories[entry["category"]].append(file_path.name)
+        else:
+            pending.append(file_path)
+    logger.info(f"Pliki: {len(file_paths)}, bez zmian (z manifestu): {len(file_paths) - len(pending)}, do analizy: {len(pending)}")
+    if not pending:
+        return categories
+
+    has_audio = any(p.suffix.lower() in AUDIO_EXTENSIONS for p in pending)
+    pool = None
+    if has_audio:
+        logger.info(f"Uruchamiam pulę Whisper: model {WHISPER_MODEL}, procesy: {WHISPER_WORKERS}")
+        pool = WhisperPool(workers=WHISPER_WORKERS, model_names=[WHISPER_MODEL], long_recording_seconds=WHISPER_LONG_SECONDS)
+    # Obrazy są zmniejszane i kompresowane w osobnej puli procesów (wynik trafia do cache/images)
+    images = ImagePreprocessor() if any(p.suffix.lower() in IMAGE_EXTENSIONS for p in pending) else None
+
+    try:
+        # Wspólna brama do API (pula połączeń, limity, ponowienia) z trwałym cache odpowiedzi;
+        # skany tego samego raportu w innym formacie lub rozdzielczości dostają odpowiedź z cache obrazów
+        vision_cache = VisionCache() if images is not None else None
+        async with LLMGateway(
+            api_key=API_KEY, max_concurrency=LLM_CONCURRENCY, cache=CompletionCache(), vision_cache=vision_cache
+        ) as gateway:
+            pipeline = ReportPipeline(gateway, pool, images, manifest=manifest, fingerprints=fingerprints)
+            for category, names in (await pipeline.run(pending)).items():
+                categories[category].extend(names)
+    finally:
+        if pool is not None:
+            pool.close()
+        if images is not None:
+            images.close()
+
+    if summary := pipeline.packing_summary():
+        logger.info(summary)
+    logger.info(
+        f"Przeanalizowano {len(pending)} plików w {time.perf_counter() - started:.1f}s "
+        f"(suma czasów: transkrypcja {pipeline.stage_seconds['transcription']:.1f}s, "
+        f"klasyfikacja {pipeline.stage_seconds['classification']:.1f}s)"
+    )
+    return categories
 
 def analyze_factory_reports():
     """Główna funkcja analizująca raporty z fabryki."""
     reports_dir = Path(".")
-    categories = {
-        "people": [],
-        "hardware": [],
-        "none": []  # Dodajemy kategorię "none"
-    }
-    
-    excluded = {"facts", "weapons_tests.zip", "report.json", "requirements.txt", "analyze_factory_reports.py", ".env", "venv", "send_report.py"}
+    excluded = {"facts", "weapons_tests.zip", "report.json", "requirements.txt", "analyze_factory_reports.py", ".env", "venv", "send_report.py", MANIFEST_FILE}
     
     logger.info(f"Szukam plików w katalogu: {reports_dir.absolute()}")
-    
-    # Analizujemy tylko pliki, które nie są w kategoriach "people" i "hardware"
-    for file_path in reports_dir.glob("*"):
-        if file_path.name in excluded or file_path.is_dir():
-            logger.info(f"Pomijam: {file_path.name}")
-            continue
-            
-        if file_path.name in categories["people"] or file_path.name in categories["hardware"]:
-            logger.info(f"Pomijam plik z kategorii 'people' lub 'hardware': {file_path.name}")
-            continue
-            
-        logger.info(f"Znaleziono plik: {file_path.name}")
-        
-        try:
-            if file_path.suffix.lower() == '.txt':
-                category = analyze_text_file(file_path)
-            elif file_path.suffix.lower() in ['.png', '.jpg', '.jpeg']:
-                category = analyze_image_file(file_path)
-            elif file_path.suffix.lower() in ['.mp3', '.wav']:
-                if not file_path.exists():
-                    logger.error(f"Plik audio nie istnieje: {file_path}")
-                    categories["none"].append(file_path.name)
-                    continue
-                category = analyze_audio_file(file_path)
-            else:
-                continue
-                
-            if category in categories:
-                categories[category].append(file_path.name)
-                logger.info(f"Dodano {file_path.name} do kategorii {category}")
-            else:
-                logger.warning(f"Nieznana kategoria: {category}, ustawiam jako 'none'")
-                categories["none"].append(file_path.name)
-                
-        except Exception as e:
-            logger.error(f"Błąd podczas analizy pliku {file_path.name}: {str(e)}")
-            categories["none"].append(file_path.name)
-            continue
-    
+    file_paths = list_report_files(reports_dir, excluded)
+    manifest = RunManifest(reports_dir / MANIFEST_FILE)
+    categories = asyncio.run(classify_reports(file_paths, manifest))
+    # Manifest rośnie o linię na każdy wynik - przepisujemy go, gdy nadpisane wpisy przeważają
+    if manifest.lines > 2 * max(1, len(manifest)):
+        manifest.compact(keep={str(p) for p in file_paths})
+
     # Usuwamy kategorię "none" z raportu przed wysłaniem
     if "none" in categories:
         del categories["none"]
@@ -1,14 +1,37 @@
-import json
-import openai
-from dotenv import load_dotenv
 import os
+import re
+import sys
+import json
+import time
+import asyncio
+import logging
 import requests
+from pathlib import Path
+from dotenv import load_dotenv
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+from common.llm_gateway import LLMGateway
+from common.completion_cache import CompletionCache
+from common.retrieval import Chunk, EmbeddingIndex, split_text
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
 
 # Załaduj zmienne środowiskowe
 load_dotenv()
 
-# Inicjalizacja OpenAI
-openai.api_key = os.getenv("OPENAI_API_KEY")
+MODEL = os.getenv("ANSWER_MODEL", "gpt-4")
+EMBEDDING_MODEL = "text-embedding-3-small"
+CENTRALA_API_KEY = os.getenv("CENTRALA_API_KEY", "8eed1983-ee32-479e-8c44-eb85077a62e8")
+REPORT_URL = "https://c3ntrala.ag3nts.org/report"
+NOT_AVAILABLE = "Informacja nie jest dostępna w tekście"
+
+# Fragmenty artykułu (znaki) i liczba fragmentów dołączanych do każdego pytania
+CHUNK_CHARS = int(os.getenv("CHUNK_CHARS", "1200"))
+CHUNK_OVERLAP = int(os.getenv("CHUNK_OVERLAP", "200"))
+TOP_K = int(os.getenv("TOP_K", "5"))
+# Liczba pytań, na które odpowiedzi są generowane jednocześnie
+LLM_CONCURRENCY = int(os.getenv("LLM_CONCURRENCY", "8"))
 
 def load_processed_content():
     """Ładuje przetworzone dane z pliku JSON"""
@@ -20,105 +43,122 @@ def load_questions():
     with open('data/questions.txt', 'r', encoding='utf-8') as f:
         return f.read()
 
-def summarize_content(content):
-    """Generuje skrócone podsumowanie artykułu"""
-    # Ogranicz długość tekstu do pierwszych 3000 znaków
-    text = content['text'][:3000]
-    
-    prompt = f"""
-    Stwórz bardzo krótkie podsumowanie (max 500 znaków) poniższego tekstu, zachowując tylko najważniejsze fakty, daty i nazwiska.
-    
-    Tekst:
-    {text}
-    """
-    
-    response = openai.ChatCompletion.create(
-        model="gpt-4",
-        messages=[
-            {"role": "system", "content": "Jesteś asystentem tworzącym bardzo zwięzłe podsumowania."},
-            {"role": "user", "content": prompt}
-        ],
-        temperature=0.3,
-        max_tokens=300
-    )
-    
-    return response.choices[0].message.content
+def parse_questions(questions):
+    """Pytania w formacie "01=treść pytania" (po jednym w linii) jako słownik numer -> pytanie."""
+    parsed = {}
+    for line in questions.splitlines():
+        match = re.match(r"\s*(\d+)\s*[=:.)]\s*(.+)", line)
+        if match:
+            parsed[match.group(1)] = match.group(2).strip()
+    return parsed
 
-def generate_answers(content, questions):
-    """Generuje odpowiedzi na pytania używając GPT-4"""
-    # Wygeneruj skrócone podsumowanie
-    summarized_text = summarize_content(content)
-    
-    # Ogranicz liczbę obrazów do 1 najważniejszego
-    images = content['images'][:1]
-    
-    # Przygotuj kontekst
-    context = f"""
-    Tekst: {summarized_text}
-    Obrazy: {json.dumps(images, ensure_ascii=False)}
-    """
-    
+def build_chunks(content):
+    """Fragmenty całego artykułu: tekst, opisy obrazów i transkrypcje nagrań, każdy ze źródłem."""
+    chunks = [Chunk(text, "tekst") for text in split_text(content['text'], CHUNK_CHARS, CHUNK_OVERLAP)]
+    for image in content.get('images', []):
+        description = f"Podpis: {image.get('alt', '')}\nOpis obrazu: {image['description']}"
+        chunks.extend(Chunk(text, f"obraz {image['src']}") for text in split_text(description, CHUNK_CHARS, CHUNK_OVERLAP))
+    for audio in content.get('audio_transcriptions', []):
+        chunks.extend(
+            Chunk(text, f"nagranie {audio['file']}")
+            for text in split_text(audio['transcription'], CHUNK_CHARS, CHUNK_OVERLAP)
+        )
+    return chunks
+
+def answer_payload(question, fragments):
+    """Zapytanie o odpowiedź na jedno pytanie na podstawie wybranych fragmentów artykułu."""
+    context = "\n\n".join(f"[{chunk.source}]\n{chunk.text}" for chunk, _ in fragments)
     prompt = f"""
-    Odpowiedz na pytania na podstawie tekstu. Odpowiedzi powinny być krótkie (1 zdanie).
-    Jeśli informacja nie jest dostępna, napisz "Informacja nie jest dostępna w tekście".
-    
-    Kontekst: {context}
-    Pytania: {questions}
-    
-    Format odpowiedzi (JSON):
-    {{
-        "task": "arxiv",
-        "apikey": "8eed1983-ee32-479e-8c44-eb85077a62e8",
-        "answer": {{
-            "01": "odpowiedź",
-            "02": "odpowiedź",
-            "03": "odpowiedź",
-            "04": "odpowiedź",
-            "05": "odpowiedź"
-        }}
-    }}
+    Odpowiedz na pytanie na podstawie fragmentów artykułu (tekstu, opisów obrazów i transkrypcji nagrań). Odpowiedź powinna być krótka (1 zdanie).
+    Jeśli informacja nie jest dostępna we fragmentach, napisz "{NOT_AVAILABLE}".
+
+    Fragmenty:
+    {context}
+
+    Pytanie: {question}
     """
-    
-    # Wygeneruj odpowiedzi
-    response = openai.ChatCompletion.create(
-        model="gpt-4",
-        messages=[
+    return {
+        "model": MODEL,
+        "messages": [
             {"role": "system", "content": "Jesteś asystentem analizującym tekst i odpowiadającym na pytania w zwięzły sposób."},
             {"role": "user", "content": prompt}
         ],
-        temperature=0.3,
-        max_tokens=500
-    )
-    
-    return response.choices[0].message.content
+        # Temperatura 0: odpowiedź powtarzalna, więc może trafić do cache odpowiedzi
+        "temperature": 0,
+        "max_tokens": 150
+    }
+
+async def generate_answers_async(content, questions):
+    """Odpowiada na wszystkie pytania jednocześnie; każde dostaje `TOP_K` najbliższych mu fragmentów."""
+    questions = parse_questions(questions)
+    chunks = build_chunks(content)
+    start = time.perf_counter()
+
+    # Embeddingi fragmentów i pytań są w trwałym cache - ponowne uruchomienie ich nie przelicza
+    async with LLMGateway(max_concurrency=LLM_CONCURRENCY, cache=CompletionCache()) as gateway:
+        index = await EmbeddingIndex.build(gateway, chunks, EMBEDDING_MODEL)
+        question_vectors = await gateway.embeddings_many(list(questions.values()), EMBEDDING_MODEL)
+        logger.info(f"Indeks: {len(index)} fragmentów, {time.perf_counter() - start:.2f} s")
+
+        async def answer(number, question, vector):
+            fragments = index.search(vector, TOP_K)
+            payload = answer_payload(question, fragments)
+            try:
+                return number, await gateway.chat_text(payload), len(payload["messages"][1]["content"])
+            except Exception as e:
+                logger.error(f"Błąd podczas odpowiadania na pytanie {number}: {str(e)}")
+                return number, NOT_AVAILABLE, 0
+
+        results = await asyncio.gather(*(
+            answer(number, question, vector) for (number, question), vector in zip(questions.items(), question_vectors)
+        ))
+        stats = gateway.stats
+
+    prompt_chars = [size for _, _, size in results if size]
+    document_chars = sum(len(chunk.text) for chunk in chunks)
+    if prompt_chars:
+        logger.info(
+            f"Odpowiedzi na {len(results)} pytań w {time.perf_counter() - start:.2f} s; "
+            f"średnio {sum(prompt_chars) // len(prompt_chars)} znaków promptu (cały artykuł: {document_chars}), "
+            f"tokeny: {stats['prompt_tokens']} wejścia, {stats['completion_tokens']} wyjścia"
+        )
+    return {
+        "task": "arxiv",
+        "apikey": CENTRALA_API_KEY,
+        "answer": {number: text for number, text, _ in results}
+    }
+
+def generate_answers(content, questions):
+    """Generuje odpowiedzi na pytania (JSON gotowy do wysłania do centrali)"""
+    return json.dumps(asyncio.run(generate_answers_async(content, questions)), ensure_ascii=False, indent=2)
 
 def main():
     try:
         # Załaduj dane
         content = load_processed_content()
         questions = load_questions()
-        
+
         # Wygeneruj odpowiedzi
         answers = generate_answers(content, questions)
-        
+
         # Zapisz odpowiedzi do pliku
         with open('data/answers.json', 'w', encoding='utf-8') as f:
             f.write(answers)
-            
+
         # Wyślij odpowiedzi na endpoint
         response = requests.post(
-            "https://c3ntrala.ag3nts.org/report",
+            REPORT_URL,
             json=json.loads(answers)
         )
-        
+
         if response.status_code == 200:
             print("Odpowiedzi zostały wygenerowane, zapisane i wysłane pomyślnie")
         else:
             print(f"Błąd podczas wysyłania odpowiedzi: {response.status_code}")
             print(f"Treść odpowiedzi: {response.text}")
-        
+
     except Exception as e:
         print(f"Wystąpił błąd: {str(e)}")
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
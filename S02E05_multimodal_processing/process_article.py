@@ -1,15 +1,24 @@
-import requests
-from bs4 import BeautifulSoup
 import os
+import sys
 import json
-from PIL import Image
-import whisper
-import openai
-from dotenv import load_dotenv
-import base64
-from io import BytesIO
-import torch
+import time
+import asyncio
 import logging
+from pathlib import Path
+from typing import NamedTuple, Optional
+
+import httpx
+import requests
+from bs4 import BeautifulSoup
+from dotenv import load_dotenv
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+from common.llm_gateway import LLMGateway
+from common.completion_cache import CompletionCache
+from common.vision_cache import VisionCache
+from common.image_prep import ImagePreprocessor
+from common.whisper_pool import WhisperPool
+from common.blob_store import BlobStore
 
 # Konfiguracja logowania
 logging.basicConfig(level=logging.INFO)
@@ -22,250 +31,237 @@ load_dotenv()
 API_KEY = "xxx" ## API do platformy AI devs
 ARTICLE_URL = "https://c3ntrala.ag3nts.org/dane/arxiv-draft.html"
 QUESTIONS_URL = f"https://c3ntrala.ag3nts.org/data/{API_KEY}/arxiv.txt"
+ASSETS_BASE_URL = "https://c3ntrala.ag3nts.org/dane/"
+CACHE_DIR = "cache"
 
-# Inicjalizacja OpenAI
-openai.api_key = os.getenv("OPENAI_API_KEY")
+# Ile plików pobieramy naraz (przez jedną pulę połączeń) i ile zapytań do modelu jest w toku
+FETCH_CONCURRENCY = int(os.getenv("FETCH_CONCURRENCY", "8"))
+LLM_CONCURRENCY = int(os.getenv("LLM_CONCURRENCY", "8"))
+# Lokalny Whisper: model i liczba procesów (każdy proces trzyma własną kopię modelu)
+WHISPER_MODEL = os.getenv("WHISPER_MODEL", "base")
+WHISPER_WORKERS = int(os.getenv("WHISPER_WORKERS", "2"))
+# Nagrania dłuższe niż tyle sekund są dzielone w miejscach ciszy i transkrybowane fragmentami przez wszystkie procesy
+WHISPER_LONG_SECONDS = float(os.getenv("WHISPER_LONG_SECONDS", "120"))
 
-# Inicjalizacja modelu Whisper
-whisper_model = None ## zainicjowanie zmiennej globalnej whisper_model jako None - będzie potem użyta w funkcji load_whisper_model
+IMAGE_PROMPT = "Opisz dokładnie co widzisz na tym obrazku."
+IMAGE_ERROR = "Błąd podczas analizy obrazu"
 
-def load_whisper_model():
-    """Ładuje model Whisper"""
-    global whisper_model ## deklaracja użycia zmiennej globalnej - została stworzona poza funkcją, a chcemy się do niej odnieść oraz ją zmodyfikować
-    if whisper_model is None:
-        try:
-            logger.info("Ładowanie modelu Whisper base") ## Zanim rozpocznie się właściwe ładowanie, funkcja zapisuje informację w logach (konsoli lub pliku, w zależności od konfiguracji logging)
-            whisper_model = whisper.load_model("base") ## ładowanie modelu Whisper - w tym przypadku "base" - najmniejszy model
-            logger.info("Model Whisper został pomyślnie załadowany") ## po pomyślnym załadowaniu modelu, funkcja zapisuje informację w logach
-        except Exception as e:
-            logger.error(f"Błąd podczas ładowania modelu Whisper: {str(e)}")
-            raise
-    return whisper_model
 
+class Asset(NamedTuple):
+    """Obraz albo nagranie z artykułu: adres względny ze strony i tekst alternatywny."""
+    src: str
+    alt: str = ''
 
+    @property
+    def url(self) -> str:
+        return f"{ASSETS_BASE_URL}{self.src}"
 
-def transcribe_audio(audio_file):
-    """Transkrybuje plik audio na tekst używając Whisper
-    
-    Args:
-        audio_file (str): Ścieżka do pliku audio (MP3 lub innego obsługiwanego przez Whisper/FFmpeg)
-        
-    Returns:
-        str: Transkrybowany tekst
-    """
-    try:
-        
-        audio_file = os.path.abspath(audio_file) ## pobranie ścieżki absolutnej do pliku audio
-        
-        if not os.path.exists(audio_file): ## jeżeli nie istnieje plik audio, zwróci błąd
-            logger.error(f"Plik audio nie istnieje: {audio_file}")
-            raise
-            
-        logger.info(f"Rozpoczynam transkrypcję pliku: {audio_file}")
-        
-        # Załaduj model jeśli nie jest załadowany
-        model = load_whisper_model()
-        
-        # Wykonaj transkrypcję bezpośrednio na pliku
-        logger.info("Wykonuję transkrypcję...")
-        result = model.transcribe(str(audio_file)) ## funkcja używa FFmpeg do transkrypcji 
-        ## zwróci wynik w postaci słownika zawierającego tekst oraz metadane
-        
-        
-        logger.info("Transkrypcja zakończona pomyślnie")
-        return result["text"] ## zwrócenie tekstu z wyniku transkrypcji
-        
-    except Exception as e:
-        logger.error(f"Błąd podczas transkrypcji audio {audio_file}: {str(e)}")
-        raise
+    @property
+    def name(self) -> str:
+        return os.path.basename(self.src)
 
-def download_file(url, filename):
-    """Pobiera plik z podanego URL i zapisuje go lokalnie"""
-    try:
-        response = requests.get(url)
-        ## używa biblioteki requests do wysłania żądania HTTP typu GET na podany adres URL. Serwer powinien
-        ## odpowiedzieć, przesyłająć zawartość pliku. Cała odpowiedź jest przechowywana w zmiennej "response"
-        response.raise_for_status()  # sprawdza kod statusu HTTP
-        ## jeżeli jest 2xx, to jest ok, nic nie robi
-        ## jeżeli jest 4xx lub 5xx to rzuci wyjątek (HTTPError), pójdzie do bloku except
-        
-        # Upewnij się, że katalog istnieje
-        os.makedirs(os.path.dirname(filename), exist_ok=True)
-        #os.path.dirname(filename) - wyciąga samą ścieżkę do katalogu z pełnej ścieżki pliku, np. z cache\plik.png robi cache
-        ## os.makedirs - tworzy ten katalog, jeśli nie istnieje, exist_ok=True - jeśli istnieje, to nic nie robi
-        
-        with open(filename, 'wb') as f: ## otwiera plik o podanej nazwie w trybie zapisu binarnego; 'w' oznacza write, 'b' oznacza tryb binarny
-            ## to jest ważne jak przetwarzamy obrazy, audio, PDF-y, żeby przetwarzać binarnie
-            ## with ... as f - gwarantuje, że plik zostanie zamknięty po zakończeniu bloku with
-            f.write(response.content) ## zapisuje do otwartego pliku 'f' całą zawartość pobraną z serwera (response.content zawiera surowe bajty odpowiedzi)
-        logger.info(f"Pomyślnie pobrano plik: {filename}")
-        return True
-    except Exception as e:
-        logger.error(f"Błąd podczas pobierania pliku {url}: {str(e)}")
-        return False
 
-def get_image_description(image_path):
-    """Generuje opis obrazu używając OpenAI Vision API"""
-    try:
-        with open(image_path, "rb") as image_file: ## rb - read binary
-            ## with ... as image_file - używa menadżera kontekstu, który automatycznie zamknie plik image_file po zakończeniu bloku
-            response = openai.ChatCompletion.create( ## wysyła żądanie do API OpenAI używając punktu końcowego ChatCompletion, który obsługuje zadania multimodalne
-                model="gpt-4o",
-                messages=[
-                    {
-                        "role": "user",
-                        "content": [
-                            {"type": "text", 
-                             "text": "Opisz dokładnie co widzisz na tym obrazku."},
-                            {
-                                "type": "image_url",
-                                "image_url": {
-                                    "url": f"data:image/png;base64,{base64.b64encode(image_file.read()).decode()}"
-                                    ## najpierw trzeba zakodować obrazek do postaci base64, potem decode() - przekonwertować na standardowy ciąg znaków
-                                    ## ostatecznie: Oto dane (data:), są to dane typu obraz JPEG (image/jpeg;), zakodowane w Base64 (base64,), a oto one: ...".
-                                }
-                            } ## w tym przypadku "messages" jest listą, bo dajemy i polecenie, io brazek
-                        ]
-                    }
-                ],
-                max_tokens=150
-            )
-        
-        return response.choices[0].message.content ## zwrócenie pierwszego trafnego wyboru, obiekt wiadomości, wyciągamy jej treść
-    except Exception as e:
-        logger.error(f"Błąd podczas analizy obrazu: {str(e)}")
-        return "Błąd podczas analizy obrazu"
+def find_images(soup: BeautifulSoup) -> list[Asset]:
+    """Obrazy (<img>) w kolejności występowania w dokumencie."""
+    return [
+        Asset(img['src'], img.get('alt', ''))
+        for img in soup.find_all('img')
+        if img.get('src')
+    ]
 
-def process_html(html_content):
-    """Przetwarza HTML na tekst z zachowaniem struktury"""
-    soup = BeautifulSoup(html_content, 'html.parser')
-    ## parsowanie HTML - parser HTML rozpoznaje słowa kluczowe (po znacznikach), ich znaczenie (np. <h1> to nagłówek)
-    ## wynik parsowania to drzewo obiektów (DOM - Document Object Model)
-    ## BeautifulSoup - biblioteka do parsowania HTML i XML
-    ## soup - obiekt, który jest strukturą przypominającą drzewo, po której można się poruszać za pomocą metod BeautifulSoup
-    
-    
-    for script in soup(["script", "style"]):
-        script.decompose()
-    ## wyszukiwanie wszystkich znaczników <script> i <style> i usuwanie ich z drzewa DOM
-    ## aby pozbyć się kodu JavaScript i CSS, który nie jest potrzebny do analizy tekstu
-    
-    # Pobierz tekst
-    text = soup.get_text()
-    
-    # Pobierz obrazy i ich opisy
-    images = []
-    for img in soup.find_all('img'):
-        ## pętla poruszająca się po wszystkich znacznikach <img> w drzewie DOM
-        src = img.get('src')
-        ## pobranie atrybutu src, który zawiera URL obrazu
-        alt = img.get('alt', '')
-        ## pobranie atrybutu alt, który zawiera tekst alternatywny dla obrazu
-        
-        # Pobierz obraz
-        if src:
-            image_url = f"https://c3ntrala.ag3nts.org/dane/{src}"\
-            ## jeżeli istnieje src, to pobieramy obraz z URL, zakładając, że jest to ścieżka względna
-            image_path = os.path.join('cache', os.path.basename(src))
-            ## tworzenie ścieżki do pliku obrazu w katalogu cache, używając os.path.basename(src) do uzyskania nazwy pliku z URL
-            if download_file(image_url, image_path):
-                ## wywołuje wcześniej zdefiniowanąfunkcję download_file, aby pobrać obraz z image_url i zapisać go pod image_path. Jeżeli się powiedzie, zwróci True
-                # Generuj opis obrazu
-                try:
-                    description = get_image_description(image_path)
-                    images.append({
-                        'src': src,
-                        'alt': alt,
-                        'description': description ## to jest to, co zwraca funkcja get_image_description
-                    })
-                except Exception as e:
-                    logger.error(f"Błąd podczas analizy obrazu {src}: {str(e)}")
-                    images.append({
-                        'src': src,
-                        'alt': alt,
-                        'description': 'Błąd podczas analizy obrazu'
-                    })
-    
-    # Pobierz pliki audio
-    audio_files = []
-    audio_transcriptions = []
-    
-    # Szukaj wszystkich elementów audio
+
+def find_audio(soup: BeautifulSoup) -> list[Asset]:
+    """Nagrania (<audio src> albo <audio><source src>) w kolejności występowania w dokumencie."""
     audio_elements = soup.find_all('audio')
-    ## znajduje wszystkie znaczniki <audio> w drzewie DOM
     logger.info(f"Znaleziono {len(audio_elements)} elementów audio na stronie")
-    
+    assets = []
     for audio in audio_elements:
-        # Sprawdź atrybut src
         src = audio.get('src')
         if not src:
             # Jeśli nie ma atrybutu src, sprawdź czy jest źródło w elemencie source
             source = audio.find('source')
             if source:
                 src = source.get('src')
-        
         if src:
             logger.info(f"Znaleziono plik audio: {src}")
-            audio_url = f"https://c3ntrala.ag3nts.org/dane/{src}"
-            # Zachowaj strukturę katalogów z URL
-            audio_path = os.path.join('cache', os.path.basename(src))
-            ## tworzy ścieżkę do pliku audio w katalogu cache, używając os.path.basename(src) do uzyskania nazwy pliku z URL
-            # Upewnij się, że katalog istnieje
-            os.makedirs(os.path.dirname(audio_path), exist_ok=True)
-            
-            logger.info(f"Próba pobrania pliku audio z: {audio_url}")
-            if download_file(audio_url, audio_path):
-                logger.info(f"Pomyślnie pobrano plik audio do: {audio_path}")
-                try:
-                    # Używamy audio_path do transkrypcji
-                    transcription = transcribe_audio(audio_path)
-                    
-                    audio_files.append(os.path.basename(src))  # Zachowujemy pełną ścieżkę
-                    audio_transcriptions.append({
-                        'file': os.path.basename(src),  # Zachowujemy pełną ścieżkę
-                        'transcription': transcription
-                    })
-                    logger.info(f"Pomyślnie wykonano transkrypcję pliku: {os.path.basename(src)}")
-                except Exception as e:
-                    logger.error(f"Błąd podczas transkrypcji audio {os.path.basename(src)}: {str(e)}")
-                    audio_transcriptions.append({
-                        'file': src,  # Zachowujemy pełną ścieżkę
-                        'transcription': f"Błąd transkrypcji: {str(e)}"
-                    })
-            else:
-                logger.error(f"Nie udało się pobrać pliku audio: {audio_url}")
+            assets.append(Asset(src))
         else:
             logger.warning("Znaleziono element audio bez źródła")
-    
+    return assets
+
+
+class ArticleProcessor:
+    """Pobieranie i analiza obrazów oraz nagrań z artykułu.
+
+    Każdy plik jest pobierany przez wspólnego klienta HTTP/2 (jedna pula połączeń z keep-alive)
+    do magazynu plików adresowanych treścią (common/blob_store.py) i od razu po pobraniu trafia do opisu (model z wizją) albo transkrypcji (pula procesów
+    Whisper). Wszystkie pliki są przetwarzane naraz, więc czas całości to mniej więcej czas
+    najwolniejszego pliku; wyniki zachowują kolejność z dokumentu.
+    """
+
+    def __init__(
+        self,
+        client: httpx.AsyncClient,
+        gateway: LLMGateway,
+        images: Optional[ImagePreprocessor] = None,
+        pool=None,
+        store: Optional[BlobStore] = None,
+    ):
+        self.client = client
+        self.store = store or BlobStore(os.path.join(CACHE_DIR, "blobs"))
+        self.gateway = gateway
+        self.images = images
+        self.pool = pool
+        self.fetch_semaphore = asyncio.Semaphore(FETCH_CONCURRENCY)
+        # Plik użyty w artykule kilka razy jest pobierany raz
+        self._downloads: dict[str, asyncio.Task] = {}
+
+    async def download_file(self, url: str) -> Optional[Path]:
+        """Pobiera plik do magazynu (strumieniowo, ze wznawianiem); plik znany z poprzedniego
+        uruchomienia jest tylko sprawdzany zapytaniem warunkowym. Zwraca ścieżkę albo None."""
+        try:
+            async with self.fetch_semaphore:
+                start = time.perf_counter()
+                blob = await self.store.fetch_async(self.client, url)
+            state = "bez zmian" if blob.cached else f"{blob.size / 1024:.0f} KB"
+            logger.info(f"Pomyślnie pobrano plik: {url} ({state}, {time.perf_counter() - start:.2f} s)")
+            return blob.path
+        except Exception as e:
+            logger.error(f"Błąd podczas pobierania pliku {url}: {str(e)}")
+            return None
+
+    async def describe_image(self, image_path: Path) -> str:
+        """Generuje opis obrazu; obraz jest wcześniej zmniejszany i kompresowany (common/image_prep.py)."""
+        try:
+            image = await self.images.prepare_async(image_path)
+            return await self.gateway.chat_text({
+                "model": "gpt-4o",
+                "messages": [{
+                    "role": "user",
+                    "content": [
+                        {"type": "text", "text": IMAGE_PROMPT},
+                        {"type": "image_url", "image_url": {"url": image.data_url()}},
+                    ],
+                }],
+                "max_tokens": 150,
+            })
+        except Exception as e:
+            logger.error(f"Błąd podczas analizy obrazu {image_path}: {str(e)}")
+            return IMAGE_ERROR
+
+    async def transcribe_audio(self, asset: Asset, audio_path: Path) -> str:
+        """Transkrybuje nagranie w puli procesów Whisper (model wczytany raz na proces)."""
+        logger.info(f"Rozpoczynam transkrypcję pliku: {asset.name}")
+        # Krótkie nagranie w całości w jednym procesie, długie - fragmentami we wszystkich (WhisperPool.transcribe)
+        result = await asyncio.to_thread(self.pool.transcribe, audio_path.resolve())
+        logger.info(f"Pomyślnie wykonano transkrypcję pliku: {asset.name}")
+        return result["text"]
+
+    def fetch(self, asset: Asset) -> asyncio.Task:
+        if asset.url not in self._downloads:
+            self._downloads[asset.url] = asyncio.create_task(self.download_file(asset.url))
+        return self._downloads[asset.url]
+
+    async def process_image(self, asset: Asset):
+        image_path = await self.fetch(asset)
+        if image_path is None:
+            return None
+        return {'src': asset.src, 'alt': asset.alt, 'description': await self.describe_image(image_path)}
+
+    async def process_audio(self, asset: Asset):
+        """Zwraca (wpis transkrypcji, czy się udała) albo None, jeśli pliku nie udało się pobrać."""
+        logger.info(f"Próba pobrania pliku audio z: {asset.url}")
+        audio_path = await self.fetch(asset)
+        if audio_path is None:
+            logger.error(f"Nie udało się pobrać pliku audio: {asset.url}")
+            return None
+        try:
+            return {'file': asset.name, 'transcription': await self.transcribe_audio(asset, audio_path)}, True
+        except Exception as e:
+            logger.error(f"Błąd podczas transkrypcji audio {asset.name}: {str(e)}")
+            return {'file': asset.src, 'transcription': f"Błąd transkrypcji: {str(e)}"}, False
+
+    async def run(self, image_assets: list[Asset], audio_assets: list[Asset]) -> tuple[list, list, list]:
+        """Przetwarza wszystkie pliki naraz i zwraca opisy obrazów, nazwy przetranskrybowanych nagrań
+        i transkrypcje. Pliki, których nie udało się pobrać, są pomijane."""
+        results = await asyncio.gather(
+            *(self.process_image(asset) for asset in image_assets),
+            *(self.process_audio(asset) for asset in audio_assets),
+        )
+        images = [result for result in results[:len(image_assets)] if result is not None]
+        audio = [result for result in results[len(image_assets):] if result is not None]
+        audio_files = [entry['file'] for entry, transcribed in audio if transcribed]
+        return images, audio_files, [entry for entry, _ in audio]
+
+
+async def process_html_async(html_content: str) -> dict:
+    """Przetwarza HTML na tekst z zachowaniem struktury, z opisami obrazów i transkrypcjami nagrań"""
+    soup = BeautifulSoup(html_content, 'html.parser')
+    # Kod JavaScript i CSS nie jest potrzebny do analizy tekstu
+    for script in soup(["script", "style"]):
+        script.decompose()
+    text = soup.get_text()
+
+    image_assets = find_images(soup)
+    audio_assets = find_audio(soup)
+
+    # Pula Whisper tylko wtedy, gdy artykuł ma nagrania (wczytanie modelu trwa)
+    pool = WhisperPool(
+        workers=min(WHISPER_WORKERS, len(audio_assets)), model_names=[WHISPER_MODEL], long_recording_seconds=WHISPER_LONG_SECONDS
+    ) if audio_assets else None
+    # Pula przygotowania obrazów (i import Pillow) tylko wtedy, gdy artykuł ma obrazy
+    images = ImagePreprocessor() if image_assets else None
+    start = time.perf_counter()
+    try:
+        limits = httpx.Limits(max_connections=FETCH_CONCURRENCY, max_keepalive_connections=FETCH_CONCURRENCY)
+        async with httpx.AsyncClient(http2=True, limits=limits, timeout=60, follow_redirects=True) as client, \
+                LLMGateway(max_concurrency=LLM_CONCURRENCY, cache=CompletionCache(), vision_cache=VisionCache()) as gateway:
+            processor = ArticleProcessor(client, gateway, images, pool)
+            image_results, audio_files, audio_transcriptions = await processor.run(image_assets, audio_assets)
+    finally:
+        if images is not None:
+            images.close()
+        if pool is not None:
+            pool.close()
+    logger.info(
+        f"Przetworzono {len(image_assets)} obrazów i {len(audio_assets)} nagrań w {time.perf_counter() - start:.2f} s"
+    )
+
     return {
         'text': text,
-        'images': images,
+        'images': image_results,
         'audio_files': audio_files,
         'audio_transcriptions': audio_transcriptions
     }
 
+
+def process_html(html_content):
+    """Przetwarza HTML na tekst z zachowaniem struktury"""
+    return asyncio.run(process_html_async(html_content))
+
+
 def main():
     # Utwórz katalog cache jeśli nie istnieje
-    os.makedirs('cache', exist_ok=True)
+    os.makedirs(CACHE_DIR, exist_ok=True)
     # Utwórz katalog data jeśli nie istnieje (na plik JSON)
     os.makedirs('data', exist_ok=True)
-    
+
     # Pobierz zawartość strony
     try:
         response = requests.get(ARTICLE_URL)
         response.raise_for_status()
         html_content = response.text
-        
+
         # Przetwórz HTML
         processed_content = process_html(html_content)
         ## wywołuje kluczową funkcję - wykonuje całą analizę; pobieranie i przetwarzanie mediów
-        
+
         # Zapisz wyniki
         with open('data/processed_content.json', 'w', encoding='utf-8') as f:
             json.dump(processed_content, f, ensure_ascii=False, indent=2)
-            
+
         logger.info("Przetwarzanie zakończone pomyślnie")
-        
+
     except Exception as e:
         logger.error(f"Błąd podczas przetwarzania: {str(e)}")
         raise
@@ -1,11 +1,16 @@
 import os
+import sys
 import json
-import requests
 import time
+import asyncio
+import requests
 from pathlib import Path
 from dotenv import load_dotenv
 import logging
-import random
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+from common.llm_gateway import LLMGateway, SyncLLMGateway, LLMGatewayError
+from common.run_manifest import RunManifest
 
 # --- Konfiguracja ---
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -19,15 +24,22 @@ if not API_KEY:
 
 REPORT_API_KEY = "xxx" ## API do platformy AI devs
 
-API_URL = "https://api.openai.com/v1/chat/completions"
 REPORT_URL = "https://c3ntrala.ag3nts.org/report"
-HEADERS = {
-    "Content-Type": "application/json",
-    "Authorization": f"Bearer {API_KEY}"
-}
 MODEL = "gpt-4o"  # Możesz spróbować "gpt-4o-mini" lub "gpt-3.5-turbo"
 CACHE_DIR = Path("cache")
 KEYWORDS_DIR = CACHE_DIR / "keywords"
+FACTS_DIR = Path("fakty")
+# Osoby wyciągnięte z każdego pliku faktów, zapisywane zaraz po odpowiedzi (przerwany skrypt ich nie traci)
+PERSONS_MANIFEST = CACHE_DIR / "persons.jsonl"
+# Zmień przy każdej zmianie promptu ekstrakcji osób - fakty przeanalizowane inną wersją zostaną przeanalizowane ponownie
+PROMPT_VERSION = 1
+# Liczba jednoczesnych zapytań o osoby z faktów
+LLM_CONCURRENCY = int(os.getenv("LLM_CONCURRENCY", "8"))
+
+# Wspólna brama do API (pula połączeń, limity, ponowienia z losowym opóźnieniem). Zamiast stałych
+# pauz między zapytaniami brama wysyła kolejne, gdy tylko pozwala na to limit konta (x-ratelimit-*).
+# Ekstrakcja osób i generowanie słów kluczowych idą przez tę samą bramę, więc dzielą jeden limit
+gateway = SyncLLMGateway(api_key=API_KEY, max_concurrency=LLM_CONCURRENCY)
 
 # Utwórz foldery cache, jeśli nie istnieją
 CACHE_DIR.mkdir(exist_ok=True)
@@ -53,74 +65,38 @@ def read_files(directory: Path, pattern: str) -> dict[str, str]:
     return data
 
 def make_api_call(payload, step_name, expect_json=False):
-    """Wykonuje wywołanie API OpenAI z obsługą błędów i ponowieniami."""
-    max_retries = 5
-    base_delay = 15
-
-    for attempt in range(max_retries):
-        try:
-            logger.debug(f"Próba {attempt + 1}/{max_retries} dla kroku '{step_name}'...")
-            if expect_json:
-                payload["response_format"] = { "type": "json_object" }
+    """Wykonuje wywołanie API OpenAI przez wspólną bramę (limity i ponowienia są po jej stronie)."""
+    if expect_json:
+        payload["response_format"] = { "type": "json_object" }
 
-            response = requests.post(API_URL, headers=HEADERS, json=payload, timeout=120)
-            response.raise_for_status()
-            
-            data = response.json()
-            if "choices" in data and data["choices"]:
-                content = data["choices"][0]["message"]["content"].strip()
-                logger.debug(f"Otrzymano odpowiedź dla '{step_name}'.")
-                
-                if expect_json:
-                    try:
-                        # Czasem AI otacza JSON w ```json ... ```, usuwamy to
-                        if content.startswith("```json"):
-                            content = content.strip("```json").strip("`").strip()
-                        return json.loads(content)
-                    except json.JSONDecodeError as json_err:
-                        logger.error(f"Błąd parsowania JSON w kroku '{step_name}'. Odpowiedź: {content}. Błąd: {json_err}")
-                        return None
-                else:
-                    return content # Zwróć string
-            else:
-                logger.error(f"Nieprawidłowa odpowiedź API dla '{step_name}': {data}")
-                return None
-
-        except requests.exceptions.HTTPError as e:
-            if e.response.status_code == 429:
-                if attempt < max_retries - 1:
-                    retry_after = e.response.headers.get('retry-after')
-                    wait_time = base_delay * (2 ** attempt) + random.uniform(1, 5)
-                    if retry_after and retry_after.isdigit():
-                       wait_time = int(retry_after) + 2
-                    logger.warning(f"Błąd 429 ({step_name}). Czekam {wait_time:.2f}s...")
-                    time.sleep(wait_time)
-                    continue
-            logger.error(f"Błąd HTTP w kroku '{step_name}': {e.response.status_code} - {e.response.text}")
-            return None
-        except requests.exceptions.RequestException as e:
-            logger.error(f"Błąd sieciowy w kroku '{step_name}': {e}")
-            if attempt < max_retries - 1:
-                 wait_time = base_delay * (2 ** attempt) + random.uniform(1, 5)
-                 logger.warning(f"Czekam {wait_time:.2f}s przed ponowieniem...")
-                 time.sleep(wait_time)
-                 continue
-            return None
-        except Exception as e:
-            logger.error(f"Nieoczekiwany błąd w kroku '{step_name}': {e}")
-            return None
-
-    logger.error(f"Nie udało się wykonać zapytania w kroku '{step_name}' po {max_retries} próbach.")
-    return None
+    try:
+        content = gateway.chat_text(payload)
+    except LLMGatewayError as e:
+        logger.error(f"Błąd API w kroku '{step_name}': {e.status_code} - {e.body or e}")
+        return None
+    except Exception as e:
+        logger.error(f"Nieoczekiwany błąd w kroku '{step_name}': {e}")
+        return None
 
-def extract_person_facts(facts: dict[str, str]) -> dict[str, list[str]]:
-    """Wyciąga osoby i ich atrybuty z faktów używając AI."""
-    person_map = {}
-    wait_between_calls = 5 # Pauza między analizą faktów
+    logger.debug(f"Otrzymano odpowiedź dla '{step_name}'.")
+    if not expect_json:
+        return content # Zwróć string
+    return parse_json_content(content, step_name)
 
-    logger.info("Rozpoczynam ekstrakcję osób z faktów...")
-    for fact_name, fact_content in facts.items():
-        prompt = f"""Przeanalizuj poniższy tekst i znajdź wszystkie wymienione osoby. Dla każdej osoby, wypisz jej imię i nazwisko oraz wszystkie powiązane z nią fakty, cechy lub role (np. zawód, umiejętność, status).
+def parse_json_content(content, step_name):
+    """Odpowiedź modelu jako JSON (None, jeśli nie da się jej sparsować)."""
+    try:
+        # Czasem AI otacza JSON w ```json ... ```, usuwamy to
+        if content.startswith("```json"):
+            content = content.strip("```json").strip("`").strip()
+        return json.loads(content)
+    except json.JSONDecodeError as json_err:
+        logger.error(f"Błąd parsowania JSON w kroku '{step_name}'. Odpowiedź: {content}. Błąd: {json_err}")
+        return None
+
+def person_facts_payload(fact_content: str) -> dict:
+    """Zapytanie o osoby wymienione w jednym pliku faktów i ich atrybuty."""
+    prompt = f"""Przeanalizuj poniższy tekst i znajdź wszystkie wymienione osoby. Dla każdej osoby, wypisz jej imię i nazwisko oraz wszystkie powiązane z nią fakty, cechy lub role (np. zawód, umiejętność, status).
 
 Tekst:
 {fact_content}
@@ -134,31 +110,76 @@ Przykład:
   ]
 }}
 """
-        payload = {
-            "model": MODEL,
-            "messages": [{"role": "user", "content": prompt}],
-            "temperature": 0.0,
-        }
-        
-        analysis = make_api_call(payload, f"extract_person_facts ({fact_name})", expect_json=True)
-        
-        if analysis and "osoby" in analysis and isinstance(analysis["osoby"], list):
-            for person_data in analysis["osoby"]:
-                name = person_data.get("imie_nazwisko")
-                attributes = person_data.get("atrybuty", [])
-                if name:
-                    name_lower = name.lower()
-                    if name_lower not in person_map:
-                        person_map[name_lower] = []
-                    person_map[name_lower].extend(attributes)
-                    person_map[name_lower] = list(set(person_map[name_lower])) # Usuń duplikaty
-            logger.info(f"Wyciągnięto osoby z faktu: {fact_name}")
+    return {
+        "model": MODEL,
+        "messages": [{"role": "user", "content": prompt}],
+        "temperature": 0.0,
+        "response_format": {"type": "json_object"},
+    }
+
+def add_persons(person_sets: dict[str, set[str]], persons: list[dict]):
+    """Dopisuje osoby z jednego pliku faktów do zbiorów atrybutów (imię małymi literami -> atrybuty)."""
+    for person_data in persons:
+        name = person_data.get("imie_nazwisko")
+        if name:
+            person_sets.setdefault(name.lower(), set()).update(person_data.get("atrybuty", []))
+
+async def extract_person_facts(
+    llm: LLMGateway, facts: dict[str, str], manifest: RunManifest
+) -> tuple[dict[str, list[str]], int]:
+    """Wyciąga osoby ze wszystkich plików faktów jednocześnie (najwyżej `LLM_CONCURRENCY` zapytań naraz).
+
+    Wynik każdego pliku trafia do manifestu zaraz po odpowiedzi, a pliki już w nim zapisane (ta sama
+    treść, model i wersja promptu) nie są wysyłane ponownie. Zwraca mapę osób (imię -> posortowane
+    atrybuty) i liczbę plików, których nie udało się przeanalizować.
+    """
+    started = time.perf_counter()
+    person_sets: dict[str, set[str]] = {}
+    pending = []
+    for fact_name in facts:
+        fact_path = FACTS_DIR / fact_name
+        fingerprint = manifest.fingerprint(fact_path)
+        entry = manifest.get(fact_path, fingerprint, model=MODEL, prompt_version=PROMPT_VERSION)
+        if entry is not None:
+            add_persons(person_sets, entry["persons"])
         else:
+            pending.append((fact_name, fact_path, fingerprint))
+    logger.info(f"Pliki faktów: {len(facts)}, z manifestu: {len(facts) - len(pending)}, do analizy: {len(pending)}")
+    if not pending:
+        return {name: sorted(attributes) for name, attributes in person_sets.items()}, 0
+
+    async def extract(fact_name, fact_path, fingerprint):
+        step_name = f"extract_person_facts ({fact_name})"
+        # Liczbę zapytań naraz (LLM_CONCURRENCY) ogranicza brama
+        try:
+            content = await llm.chat_text(person_facts_payload(facts[fact_name]))
+        except LLMGatewayError as e:
+            logger.error(f"Błąd API w kroku '{step_name}': {e.status_code} - {e.body or e}")
+            return None
+        except Exception as e:
+            logger.error(f"Nieoczekiwany błąd w kroku '{step_name}': {e}")
+            return None
+        analysis = parse_json_content(content, step_name)
+        if not analysis or not isinstance(analysis.get("osoby"), list):
             logger.warning(f"Nie udało się wyciągnąć osób z faktu {fact_name}.")
-            
-        time.sleep(wait_between_calls)
-
-    return person_map
+            return None
+        await asyncio.to_thread(
+            manifest.record, fact_path, fingerprint,
+            persons=analysis["osoby"], model=MODEL, prompt_version=PROMPT_VERSION,
+        )
+        logger.info(f"Wyciągnięto osoby z faktu: {fact_name}")
+        return analysis["osoby"]
+
+    failed = 0
+    # Wyniki dołączane do mapy w kolejności odpowiedzi, a nie plików
+    for done in asyncio.as_completed([extract(*item) for item in pending]):
+        persons = await done
+        if persons is None:
+            failed += 1
+        else:
+            add_persons(person_sets, persons)
+    logger.info(f"Przeanalizowano {len(pending)} plików faktów w {time.perf_counter() - started:.1f}s")
+    return {name: sorted(attributes) for name, attributes in person_sets.items()}, failed
 
 def load_or_create_person_map(facts: dict[str, str]) -> dict[str, list[str]]:
     """Wczytuje mapę osób z cache lub tworzy ją."""
@@ -170,8 +191,19 @@ def load_or_create_person_map(facts: dict[str, str]) -> dict[str, list[str]]:
                 return json.load(f)
         except Exception as e:
             logger.error(f"Błąd wczytywania cache osób: {e}. Tworzę na nowo.")
-            
-    person_map = extract_person_facts(facts)
+
+    logger.info("Rozpoczynam ekstrakcję osób z faktów...")
+    manifest = RunManifest(PERSONS_MANIFEST)
+    # W pętli wspólnej bramy (te same limity co przy generowaniu słów kluczowych)
+    person_map, failed = gateway.run(extract_person_facts(gateway.gateway, facts, manifest))
+    # Manifest rośnie o linię na każdy wynik - przepisujemy go, gdy nadpisane wpisy przeważają
+    if manifest.lines > 2 * max(1, len(manifest)):
+        manifest.compact(keep={str(FACTS_DIR / name) for name in facts})
+    if failed:
+        # Bez zapisu mapy: kolejne uruchomienie ponowi tylko nieudane pliki (reszta jest w manifeście)
+        logger.warning(f"Nie udało się przeanalizować {failed} plików faktów - mapa osób nie trafi do cache.")
+        return person_map
+
     try:
         with open(cache_file, 'w', encoding='utf-8') as f:
             json.dump(person_map, f, ensure_ascii=False, indent=2)
@@ -271,10 +303,9 @@ def replace_underscores_with_spaces(keywords_dict):
 def analyze_factory_reports():
     """Główna funkcja analizująca raporty z fabryki."""
     reports_dir = Path(".")
-    facts_dir = Path("fakty")
     
     reports = read_files(reports_dir, "2024-11-12_report-*.txt")
-    facts = read_files(facts_dir, "*.txt")
+    facts = read_files(FACTS_DIR, "*.txt")
     
     if not reports:
         logger.error("Nie znaleziono plików raportów. Zakończono.")
@@ -287,7 +318,6 @@ def analyze_factory_reports():
     answer = {}
 
     expected_count = 10 # Lub len(reports) jeśli ma być dynamicznie
-    wait_between_reports = 15 # Zmniejszamy, bo mniej wywołań na raport
 
     for i, (filename, content) in enumerate(sorted(reports.items())):
         cache_file = KEYWORDS_DIR / f"{filename}.json"
@@ -320,10 +350,6 @@ def analyze_factory_reports():
         else:
             logger.error(f"Nie udało się wygenerować słów kluczowych dla {filename}. PRZERYWAM PRACĘ.")
             return 
-        
-        if i + 1 < len(reports):
-             logger.info(f"Oczekiwanie {wait_between_reports} sekund przed następnym raportem...")
-             time.sleep(wait_between_reports)
 
     if len(answer) != expected_count:
         logger.error(f"Wygenerowano słowa kluczowe tylko dla {len(answer)} raportów, oczekiwano {expected_count}. Sprawdź logi.")
@@ -0,0 +1,117 @@
+import importlib.util
+import json
+import os
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import httpx
+
+from common.llm_gateway import SyncLLMGateway
+
+
+def load_module():
+    """Wczytuje skrypt w katalogu tymczasowym: przy imporcie tworzy katalogi cache w bieżącym katalogu."""
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp, mock.patch.dict(os.environ, {"OPENAI_API_KEY": "test"}):
+        os.chdir(tmp)
+        try:
+            spec = importlib.util.spec_from_file_location("analyze_keywords", Path(__file__).resolve().parent / "analyze_keywords.py")
+            module = importlib.util.module_from_spec(spec)
+            spec.loader.exec_module(module)
+        finally:
+            os.chdir(cwd)
+    module.gateway.close()
+    return module
+
+
+analyze_keywords = load_module()
+
+
+class TestAddPersons(unittest.TestCase):
+    def test_merges_attributes_by_lowercase_name(self):
+        person_sets = {}
+        analyze_keywords.add_persons(person_sets, [
+            {"imie_nazwisko": "Jan Kowalski", "atrybuty": ["nauczyciel", "Kraków"]},
+            {"imie_nazwisko": "", "atrybuty": ["bez imienia"]},
+            {"atrybuty": ["bez klucza"]},
+        ])
+        analyze_keywords.add_persons(person_sets, [
+            {"imie_nazwisko": "JAN KOWALSKI", "atrybuty": ["nauczyciel", "ruch oporu"]},
+            {"imie_nazwisko": "Anna Nowak"},
+        ])
+        self.assertEqual(person_sets, {
+            "jan kowalski": {"nauczyciel", "Kraków", "ruch oporu"},
+            "anna nowak": set(),
+        })
+
+
+class TestPersonMap(unittest.TestCase):
+    """Ekstrakcja osób przez wspólną bramę z odpowiedziami z MockTransport i wznowienie z manifestu."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        cwd = os.getcwd()
+        os.chdir(self.tmp.name)
+        self.addCleanup(os.chdir, cwd)
+        analyze_keywords.CACHE_DIR.mkdir()
+        analyze_keywords.FACTS_DIR.mkdir()
+
+        self.requested = []
+        self.failing = set()
+        gateway = SyncLLMGateway(api_key="test", transport=httpx.MockTransport(self.handler))
+        self.addCleanup(gateway.close)
+        patch = mock.patch.object(analyze_keywords, "gateway", gateway)
+        patch.start()
+        self.addCleanup(patch.stop)
+
+        self.facts = {f"f{i}.txt": f"fakt{i}" for i in range(4)}
+        for name, content in self.facts.items():
+            (analyze_keywords.FACTS_DIR / name).write_text(content, encoding="utf-8")
+
+    def handler(self, request):
+        prompt = json.loads(request.read())["messages"][0]["content"]
+        fact = next(line for line in prompt.splitlines() if line.startswith("fakt"))
+        self.requested.append(fact)
+        if fact in self.failing:
+            return httpx.Response(400, text="bad request")
+        content = json.dumps({"osoby": [{"imie_nazwisko": "Jan Kowalski", "atrybuty": [fact]}]})
+        return httpx.Response(200, json={"choices": [{"message": {"content": content}}]})
+
+    def test_resume_skips_completed_and_retries_failed(self):
+        self.failing = {"fakt1"}
+        person_map = analyze_keywords.load_or_create_person_map(self.facts)
+        self.assertEqual(person_map, {"jan kowalski": ["fakt0", "fakt2", "fakt3"]})
+        self.assertEqual(sorted(self.requested), ["fakt0", "fakt1", "fakt2", "fakt3"])
+        # Nieudany plik: mapa nie trafia do cache, więc kolejne uruchomienie ją uzupełni
+        self.assertFalse((analyze_keywords.CACHE_DIR / "persons.json").exists())
+
+        self.failing = set()
+        self.requested.clear()
+        person_map = analyze_keywords.load_or_create_person_map(self.facts)
+        self.assertEqual(self.requested, ["fakt1"])
+        self.assertEqual(person_map, {"jan kowalski": ["fakt0", "fakt1", "fakt2", "fakt3"]})
+        self.assertTrue((analyze_keywords.CACHE_DIR / "persons.json").exists())
+
+    def test_changed_fact_is_analyzed_again(self):
+        analyze_keywords.load_or_create_person_map(self.facts)
+        (analyze_keywords.CACHE_DIR / "persons.json").unlink()
+        self.facts["f2.txt"] = "fakt2 poprawiony"
+        (analyze_keywords.FACTS_DIR / "f2.txt").write_text(self.facts["f2.txt"], encoding="utf-8")
+
+        self.requested.clear()
+        person_map = analyze_keywords.load_or_create_person_map(self.facts)
+        self.assertEqual(self.requested, ["fakt2 poprawiony"])
+        self.assertIn("fakt2 poprawiony", person_map["jan kowalski"])
+        self.assertNotIn("fakt2", person_map["jan kowalski"])
+
+    def test_extraction_and_keywords_share_one_gateway(self):
+        analyze_keywords.load_or_create_person_map(self.facts)
+        analyze_keywords.make_api_call({"model": analyze_keywords.MODEL, "messages": [{"role": "user", "content": "fakt9"}]}, "test")
+        self.assertEqual(analyze_keywords.gateway.stats["requests"], 5)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -16,7 +16,7 @@ API_KEY = os.getenv("OPENAI_API_KEY")
 if not API_KEY:
     raise ValueError("Brak klucza API OpenAI w pliku .env")
 
-API_URL = "https://api.openai.com/v1/embeddings"
+API_URL = f"{os.getenv('OPENAI_BASE_URL', 'https://api.openai.com/v1')}/embeddings"
 HEADERS = {
     "Content-Type": "application/json",
     "Authorization": f"Bearer {API_KEY}"
@@ -1,42 +1,60 @@
 import os
+import sys
 import json
+import httpx
 import requests
+from pathlib import Path
 from dotenv import load_dotenv
-from openai import OpenAI
-import base64
 import re
 import time
 
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+from common.image_prep import prepare_image
+from common.llm_gateway import SyncLLMGateway
+from common.completion_cache import CompletionCache
+from common.blob_store import BlobStore
+
 # Ładowanie zmiennych środowiskowych
 load_dotenv()
 
-# Inicjalizacja klienta OpenAI
-client = OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
+# Brama do API OpenAI z cache odpowiedzi tylko dla identycznych zapytań. Cache obrazów
+# (common/vision_cache.py) nie jest tu używany: wersja po REPAIR, BRIGHTEN czy DARKEN różni się
+# od oryginału często tylko wąskim pasem i dostałaby z cache opis uszkodzonego zdjęcia
+gateway = SyncLLMGateway(api_key=os.getenv('OPENAI_API_KEY'), cache=CompletionCache())
 
 # Konfiguracja
 CENTRALA_URL = os.getenv('CENTRALA_URL')
 CENTRALA_API_KEY = os.getenv('CENTRALA_API_KEY')
 IMAGES_DIR = "images"
+IMAGES_URL = "https://centrala.ag3nts.org/dane/barbara/"
+
+# Zdjęcia zapisywane pod skrótem treści (images/objects/...), z indeksem adres -> plik;
+# pobieranie strumieniowe przez jedno połączenie keep-alive, przerwane jest wznawiane
+image_store = BlobStore(IMAGES_DIR)
+http_client = httpx.Client(timeout=60, follow_redirects=True)
+
+def image_url(filename):
+    return f"{IMAGES_URL}{filename}"
 
-# Tworzenie katalogu na zdjęcia jeśli nie istnieje
-os.makedirs(IMAGES_DIR, exist_ok=True)
+def image_path(filename):
+    """Ścieżka pobranego wcześniej zdjęcia albo None."""
+    return image_store.path_for(image_url(filename))
 
 def download_image(url, filename):
-    """Pobiera zdjęcie i zapisuje je lokalnie."""
-    local_path = os.path.join(IMAGES_DIR, filename)
-    if os.path.exists(local_path):
+    """Pobiera zdjęcie do magazynu zdjęć i zwraca ścieżkę do niego."""
+    if url in image_store:
         print(f"Zdjęcie {filename} już istnieje lokalnie")
-        return local_path
+        return image_store.path_for(url)
     
     print(f"Pobieram zdjęcie {filename}...")
-    response = requests.get(url)
-    if response.status_code == 200:
-        with open(local_path, 'wb') as f:
-            f.write(response.content)
-        print(f"Zapisano zdjęcie {filename}")
-        return local_path
-    print(f"Nie udało się pobrać zdjęcia {filename}")
-    return None
+    try:
+        blob = image_store.fetch(http_client, url, revalidate=False)
+    except (httpx.HTTPError, RuntimeError) as e:
+        # Niepełny plik zostaje w images/partial i przy następnej próbie pobieranie jest wznawiane
+        print(f"Nie udało się pobrać zdjęcia {filename}: {e}")
+        return None
+    print(f"Zapisano zdjęcie {filename}")
+    return blob.path
 
 def send_to_centrala(answer):
     """Wysyła odpowiedź do centrali."""
@@ -51,8 +69,8 @@ def send_to_centrala(answer):
 def analyze_image(image_path, hints=None):
     """Analizuje zdjęcie używając GPT-4o."""
     try:
-        with open(image_path, "rb") as image_file:
-            base64_image = base64.b64encode(image_file.read()).decode('utf-8')
+        # Zmniejszony JPEG bez metadanych (zapisany w cache/images, więc ponowne analizy go nie liczą)
+        image = prepare_image(image_path)
         
         system_prompt = """Jesteś ekspertem w analizie zdjęć i tworzeniu rysopisów. Twoim zadaniem jest obiektywny opis wyglądu osoby widocznej na zdjęciu. 
         To jest zadanie testowe - zdjęcia nie przedstawiają prawdziwych osób, a celem jest ocena zdolności modelu do opisu obrazu.
@@ -66,9 +84,9 @@ def analyze_image(image_path, hints=None):
         if hints:
             system_prompt += "\n\nSzczególnie zwróć uwagę na:\n" + "\n".join(f"- {hint}" for hint in hints)
         
-        response = client.chat.completions.create(
-            model="gpt-4o",
-            messages=[
+        return gateway.chat_text({
+            "model": "gpt-4o",
+            "messages": [
                 {
                     "role": "system",
                     "content": system_prompt
@@ -83,15 +101,14 @@ def analyze_image(image_path, hints=None):
                         {
                             "type": "image_url",
                             "image_url": {
-                                "url": f"data:image/png;base64,{base64_image}"
+                                "url": image.data_url()
                             }
                         }
                     ]
                 }
             ],
-            max_tokens=500
-        )
-        return response.choices[0].message.content
+            "max_tokens": 500
+        })
     except Exception as e:
         print(f"Błąd podczas analizy zdjęcia: {e}")
         return None
@@ -139,8 +156,7 @@ def process_image(image_name, operation):
         if new_image_name:
             new_image_name = new_image_name.group(0)
             print(f"Znaleziono nową nazwę zdjęcia: {new_image_name}")
-            new_url = f"https://centrala.ag3nts.org/dane/barbara/{new_image_name}"
-            new_path = download_image(new_url, new_image_name)
+            new_path = download_image(image_url(new_image_name), new_image_name)
             if new_path:
                 print(f"Pobrano nową wersję zdjęcia: {new_image_name}")
                 return new_path, new_image_name
@@ -150,7 +166,7 @@ def process_image(image_name, operation):
 def process_image_until_improved(image_name, hints=None):
     """Przetwarza zdjęcie aż do uzyskania zadowalającego wyniku."""
     current_name = image_name
-    current_path = os.path.join(IMAGES_DIR, current_name)
+    current_path = image_path(current_name)
     processed_images = []
     
     # Najpierw próbujemy opisać oryginalne zdjęcie
@@ -205,11 +221,8 @@ def main():
     # Przetwarzamy każde zdjęcie
     for image_name in image_names:
         print(f"\nPrzetwarzanie zdjęcia {image_name}...")
-        url = f"https://centrala.ag3nts.org/dane/barbara/{image_name}"
-        
         # Pobieramy zdjęcie jeśli nie istnieje
-        image_path = download_image(url, image_name)
-        if not image_path:
+        if not download_image(image_url(image_name), image_name):
             print(f"Nie udało się pobrać zdjęcia {image_name}")
             continue
         
@@ -239,9 +252,9 @@ def main():
         
         final_description = "Rysopis Barbary:\n\n"
         for image_name, _ in all_processed_images:
-            image_path = os.path.join(IMAGES_DIR, image_name)
-            if os.path.exists(image_path):
-                description = analyze_image(image_path, hints)
+            path = image_path(image_name)
+            if path is not None:
+                description = analyze_image(path, hints)
                 if description:
                     final_description += f"Zdjęcie {image_name}:\n{description}\n\n"
         
@@ -1,14 +1,19 @@
 import os
+import sys
 import json
 import requests
+from pathlib import Path
 from dotenv import load_dotenv
-from openai import OpenAI
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+from common.llm_gateway import SyncLLMGateway
+from common.completion_cache import CompletionCache
 
 # Ładowanie zmiennych środowiskowych
 load_dotenv()
 
-# Inicjalizacja klienta OpenAI
-client = OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
+# Wspólna brama do API; przy temperature=0 ponowna weryfikacja tych samych linii idzie z cache
+gateway = SyncLLMGateway(api_key=os.getenv('OPENAI_API_KEY'), cache=CompletionCache())
 
 # Pobieranie konfiguracji z .env
 CENTRAL_API_KEY = os.getenv('CENTRAL_API_KEY')
@@ -35,14 +40,13 @@ def verify_data():
         ]
         
         # Wysłanie zapytania do modelu
-        response = client.chat.completions.create(
-            model=FINE_TUNED_MODEL,
-            messages=messages,
-            temperature=0
-        )
+        result = gateway.chat_text({
+            "model": FINE_TUNED_MODEL,
+            "messages": messages,
+            "temperature": 0
+        })
         
         # Sprawdzenie odpowiedzi
-        result = response.choices[0].message.content.strip()
         print(f"Linia: {line} -> Odpowiedź modelu: {result}")
         
         if result == "1":
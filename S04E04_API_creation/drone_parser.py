@@ -0,0 +1,151 @@
+import re
+from functools import lru_cache
+from typing import NamedTuple, Optional
+
+# Parser instrukcji drona: instrukcja -> frazy -> ruchy (AST) -> pozycja na mapie.
+# Wszystkie wzorce są kompilowane raz, przy imporcie modułu.
+
+LICZEBNIKI = {
+    "jeden": 1, "jedno": 1, "pierwsze": 1, "pierwszy": 1, "pierwsza": 1,
+    "dwa": 2, "dwie": 2, "drugie": 2, "drugi": 2, "druga": 2,
+    "trzy": 3, "trzecie": 3, "trzeci": 3, "trzecia": 3,
+    "cztery": 4, "czwarte": 4, "czwarty": 4, "czwarta": 4,
+    "pięć": 5, "piąte": 5, "piąty": 5, "piąta": 5,
+    "sześć": 6, "szóste": 6, "szósty": 6, "szósta": 6,
+    "siedem": 7, "siódme": 7, "siódmy": 7, "siódma": 7,
+    "osiem": 8, "ósme": 8, "ósmy": 8, "ósma": 8,
+    "dziewięć": 9, "dziewiąte": 9, "dziewiąty": 9, "dziewiąta": 9,
+    "dziesięć": 10, "dziesiąte": 10, "dziesiąty": 10, "dziesiąta": 10
+}
+
+DIRECTION_EFFECTS = {
+    "prawo": (1, 0), "w prawo": (1, 0), "w prawej": (1, 0),
+    "lewo": (-1, 0), "w lewo": (-1, 0), "w lewej": (-1, 0),
+    "dół": (0, 1), "dolu": (0, 1), "w dół": (0, 1), "w dolnej": (0, 1),
+    "góra": (0, -1), "górę": (0, -1), "gora": (0, -1), "gore": (0, -1), "gory": (0, -1), "w górę": (0, -1), "w górnej": (0, -1)
+}
+
+# Frazy, które nie są instrukcjami ruchu
+IGNORED_WORDS = ["słuchaj", "widzisz", "co tam", "kolego"]
+
+# Ruchy do krawędzi mapy, w kolejności pierwszeństwa (gdy fraza pasuje do kilku)
+EDGE_MOVES = {
+    "dol": (0, 1, r"na sam dół|do samego dołu|(?:na )?dół do końca|maksymalnie w dół|w dół maksymalnie|ile tylko możemy (?:polecieć |iść )?w dół|w dół ile tylko możemy|do oporu w dół|w dół do oporu|na dolną krawędź|do dolnej krawędzi|ile wlezie w dół"),
+    "prawo": (1, 0, r"na sam prawo|do końca w prawo|w prawo do końca|maksymalnie w prawo|w prawo maksymalnie|ile tylko możemy (?:polecieć |iść )?w prawo|w prawo ile tylko możemy|do oporu w prawo|w prawo do oporu|na prawą krawędź|do prawej krawędzi|na maksa w prawo"),
+    "lewo": (-1, 0, r"na sam lewo|do końca w lewo|w lewo do końca|maksymalnie w lewo|w lewo maksymalnie|ile tylko możemy (?:polecieć |iść )?w lewo|w lewo ile tylko możemy|do oporu w lewo|w lewo do oporu|na lewą krawędź|do lewej krawędzi"),
+    "gora": (0, -1, r"na samą górę|do końca w górę|w górę do końca|maksymalnie w górę|w górę maksymalnie|ile tylko możemy (?:polecieć |iść )?w górę|w górę ile tylko możemy|do oporu w górę|w górę do oporu|na górną krawędź|do górnej krawędzi"),
+}
+
+number_capture_regex = r"(?P<liczba>\d+|" + "|".join(LICZEBNIKI.keys()) + r")"
+units_regex_part = r"(?: pola| pól| kroki| kroków| krok| kratki| kratek| pole| kratkę| pól)?"
+preposition_regex_part = r"(?: ?(?:w |we |na |do |po |przez ))?"
+direction_regex_group = r"(?P<kierunek>prawo|lewo|dół|dolu|górę|gora|gore|gory|w prawo|w lewo|w dół|w górę|w prawej|w lewej|w dolnej|w górnej)"
+
+# Separatory fraz w instrukcji
+SPLIT_PATTERN = re.compile(r",| a potem | a następnie | następnie | i oraz | i potem | i następnie | i | oraz | potem | później |\.|;|!|\n")
+
+# Jeden wzorzec dla całej frazy. Alternatywy są w lookahead, więc finditer sprawdza każdą pozycję
+# (także nakładające się dopasowania), a na danej pozycji wygrywa pierwsza pasująca alternatywa:
+# słowo ignorowane > ruch do krawędzi (wg kolejności EDGE_MOVES) > ruch względny "[liczba] [jednostka] [przyimek] kierunek".
+PHRASE_PATTERN = re.compile(
+    "(?=(?:"
+    + "(?P<ignoruj>" + "|".join(map(re.escape, IGNORED_WORDS)) + ")"
+    + "".join(f"|(?P<krawedz_{name}>{pattern})" for name, (_, _, pattern) in EDGE_MOVES.items())
+    + f"|(?P<ruch>{number_capture_regex}?{units_regex_part}{preposition_regex_part} ?{direction_regex_group})"
+    + "))"
+)
+
+EDGE_PRIORITY = [f"krawedz_{name}" for name in EDGE_MOVES]
+
+# Liczba zapamiętanych fraz (te same frazy powtarzają się w wielu instrukcjach)
+PHRASE_CACHE_SIZE = 4096
+
+
+class Ruch(NamedTuple):
+    """Pojedynczy ruch drona.
+
+    Dla ruchu względnego (dx, dy) to przesunięcie w polach. Dla ruchu do krawędzi (absolute=True)
+    znak dx/dy wskazuje krawędź, do której dron leci.
+    """
+    dx: int
+    dy: int
+    absolute: bool = False
+
+
+def _liczba(num_str: Optional[str]) -> int:
+    if not num_str:
+        return 1
+    if num_str.isdigit():
+        return int(num_str)
+    return LICZEBNIKI[num_str]
+
+
+@lru_cache(maxsize=PHRASE_CACHE_SIZE)
+def parsuj_fraze(fraza: str) -> Optional[Ruch]:
+    """Zamienia pojedynczą frazę (małe litery, bez spacji na brzegach) na ruch albo None.
+
+    Wyniki są zapamiętywane (LRU), statystyki: parsuj_fraze.cache_info().
+    """
+    ruch_wzgledny = None
+    krawedzie = set()
+    for match in PHRASE_PATTERN.finditer(fraza):
+        kind = match.lastgroup
+        if kind is None:
+            continue
+        if kind == "ignoruj":
+            return None
+        if kind.startswith("krawedz_"):
+            krawedzie.add(kind)
+        elif ruch_wzgledny is None and not krawedzie:
+            # Pierwsze (najbardziej na lewo) dopasowanie ruchu względnego
+            ruch_wzgledny = match
+
+    for kind in EDGE_PRIORITY:
+        if kind in krawedzie:
+            dx, dy, _ = EDGE_MOVES[kind.removeprefix("krawedz_")]
+            return Ruch(dx, dy, absolute=True)
+
+    if ruch_wzgledny is not None:
+        liczba = _liczba(ruch_wzgledny.group("liczba"))
+        dx, dy = DIRECTION_EFFECTS[ruch_wzgledny.group("kierunek")]
+        return Ruch(dx * liczba, dy * liczba)
+    return None
+
+
+def podziel_instrukcje(instrukcja: str) -> list[str]:
+    """Dzieli instrukcję na frazy; komenda "od nowa" kasuje wszystkie wcześniejsze frazy."""
+    frazy = []
+    for fraza_raw in SPLIT_PATTERN.split(instrukcja.lower()):
+        fraza = fraza_raw.strip()
+        if not fraza:
+            continue
+        if "zaczynamy od nowa" in fraza or fraza == "od nowa":
+            frazy = []
+            continue
+        frazy.append(fraza)
+    return frazy
+
+
+def parsuj_instrukcje(instrukcja: str) -> list[Ruch]:
+    """Zamienia całą instrukcję na listę ruchów (pomija frazy bez ruchu)."""
+    return [ruch for ruch in map(parsuj_fraze, podziel_instrukcje(instrukcja)) if ruch is not None]
+
+
+def zastosuj_ruch(x: int, y: int, ruch: Ruch, szerokosc: int, wysokosc: int) -> tuple[int, int]:
+    """Wykonuje ruch na siatce szerokosc x wysokosc, ograniczając pozycję do granic mapy."""
+    if ruch.absolute:
+        if ruch.dx:
+            x = szerokosc - 1 if ruch.dx > 0 else 0
+        if ruch.dy:
+            y = wysokosc - 1 if ruch.dy > 0 else 0
+        return x, y
+    x = max(0, min(szerokosc - 1, x + ruch.dx))
+    y = max(0, min(wysokosc - 1, y + ruch.dy))
+    return x, y
+
+
+def wykonaj_ruchy(ruchy: list[Ruch], szerokosc: int, wysokosc: int, x: int = 0, y: int = 0) -> tuple[int, int]:
+    """Wykonuje listę ruchów od pozycji (x, y) i zwraca pozycję końcową."""
+    for ruch in ruchy:
+        x, y = zastosuj_ruch(x, y, ruch, szerokosc, wysokosc)
+    return x, y
@@ -0,0 +1,65 @@
+import csv
+import json
+from pathlib import Path
+
+import numpy as np
+
+from drone_parser import Ruch
+
+
+def wczytaj_mape(sciezka: str | Path) -> np.ndarray:
+    """Wczytuje mapę N×M z pliku .json (lista wierszy) albo .csv (wiersz mapy = wiersz pliku).
+
+    Zwraca tablicę NumPy o kształcie (wysokość, szerokość) indeksowaną [y, x].
+    """
+    sciezka = Path(sciezka)
+    with open(sciezka, 'r', encoding='utf-8', newline='') as f:
+        if sciezka.suffix.lower() == ".csv":
+            wiersze = [[pole.strip() for pole in wiersz] for wiersz in csv.reader(f) if wiersz]
+        else:
+            wiersze = json.load(f)
+
+    if not wiersze or not wiersze[0]:
+        raise ValueError(f"Mapa w pliku {sciezka} jest pusta")
+    if any(len(wiersz) != len(wiersze[0]) for wiersz in wiersze):
+        raise ValueError(f"Wiersze mapy w pliku {sciezka} mają różne długości")
+
+    mapa = np.empty((len(wiersze), len(wiersze[0])), dtype=object)
+    mapa[:, :] = wiersze
+    return mapa
+
+
+def pozycje_koncowe(programy: list[list[Ruch]], szerokosc: int, wysokosc: int) -> tuple[np.ndarray, np.ndarray]:
+    """Wylicza pozycje końcowe dla wielu list ruchów naraz (start w (0, 0)).
+
+    Ruchy są pakowane w macierze (program × krok). Pozycja jest ograniczana do mapy po każdym
+    kroku, tak jak w zastosuj_ruch, więc zamiast jednego cumsum + clip na końcu liczymy
+    clip(x + dx) dla wszystkich programów naraz, krok po kroku. Ruch do krawędzi ustawia
+    współrzędną wprost (wartość >= 0 w macierzy `ustaw`).
+    """
+    liczba = len(programy)
+    kroki = max((len(program) for program in programy), default=0)
+    dx = np.zeros((liczba, kroki), dtype=np.int64)
+    dy = np.zeros((liczba, kroki), dtype=np.int64)
+    ustaw_x = np.full((liczba, kroki), -1, dtype=np.int64)
+    ustaw_y = np.full((liczba, kroki), -1, dtype=np.int64)
+
+    for i, program in enumerate(programy):
+        for j, ruch in enumerate(program):
+            if ruch.absolute:
+                if ruch.dx:
+                    ustaw_x[i, j] = szerokosc - 1 if ruch.dx > 0 else 0
+                if ruch.dy:
+                    ustaw_y[i, j] = wysokosc - 1 if ruch.dy > 0 else 0
+            else:
+                # Przesunięcie dłuższe niż mapa daje ten sam wynik co przesunięcie o jej wymiar, a ogromna
+                # liczba z instrukcji (np. 30 cyfr) nie zmieściłaby się w int64
+                dx[i, j] = max(-szerokosc, min(szerokosc, ruch.dx))
+                dy[i, j] = max(-wysokosc, min(wysokosc, ruch.dy))
+
+    x = np.zeros(liczba, dtype=np.int64)
+    y = np.zeros(liczba, dtype=np.int64)
+    for j in range(kroki):
+        x = np.where(ustaw_x[:, j] >= 0, ustaw_x[:, j], np.clip(x + dx[:, j], 0, szerokosc - 1))
+        y = np.where(ustaw_y[:, j] >= 0, ustaw_y[:, j], np.clip(y + dy[:, j], 0, wysokosc - 1))
+    return x, y
@@ -0,0 +1,40 @@
+import unittest
+
+from drone_parser import Ruch, parsuj_fraze, parsuj_instrukcje, podziel_instrukcje, wykonaj_ruchy
+
+
+def pozycja(instrukcja: str) -> tuple[int, int]:
+    return wykonaj_ruchy(parsuj_instrukcje(instrukcja), 4, 4)
+
+
+class TestDroneParser(unittest.TestCase):
+    def test_ruchy_wzgledne(self):
+        self.assertEqual(parsuj_fraze("dwa kroki w prawo"), Ruch(2, 0))
+        self.assertEqual(parsuj_fraze("trzy pola w dół"), Ruch(0, 3))
+        self.assertEqual(parsuj_fraze("w lewo o jedno pole"), Ruch(-1, 0))
+        self.assertEqual(parsuj_fraze("10 na górę"), Ruch(0, -10))
+
+    def test_ruchy_do_krawedzi(self):
+        self.assertEqual(parsuj_fraze("lecimy na maksa w prawo"), Ruch(1, 0, absolute=True))
+        # Ruch do krawędzi ma pierwszeństwo przed ruchem względnym w tej samej frazie
+        self.assertEqual(parsuj_fraze("jedno pole w prawo do końca"), Ruch(1, 0, absolute=True))
+        # Przy kilku krawędziach wygrywa dolna (kolejność jak w EDGE_MOVES)
+        self.assertEqual(parsuj_fraze("do oporu w prawo ile wlezie w dół"), Ruch(0, 1, absolute=True))
+
+    def test_frazy_ignorowane(self):
+        self.assertIsNone(parsuj_fraze("słuchaj, dwa w prawo"))
+        self.assertIsNone(parsuj_fraze("co tam widzisz"))
+        self.assertIsNone(parsuj_fraze("lecimy"))
+
+    def test_reset(self):
+        self.assertEqual(podziel_instrukcje("trzy pola w dół, zaczynamy od nowa, dwa w prawo"), ["dwa w prawo"])
+
+    def test_pozycja_koncowa(self):
+        self.assertEqual(pozycja("dwa kroki w prawo, potem na dół"), (2, 1))
+        self.assertEqual(pozycja("poleciałem jedno pole w prawo, a później na sam dół"), (1, 3))
+        self.assertEqual(pozycja("do końca w prawo następnie w lewo o jedno pole oraz dwa kroki w dół"), (2, 2))
+        self.assertEqual(pozycja("100 w prawo i 100 w dół"), (3, 3))
+
+
+if __name__ == "__main__":
+    unittest.main()
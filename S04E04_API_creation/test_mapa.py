@@ -0,0 +1,50 @@
+import json
+import random
+import tempfile
+import unittest
+from pathlib import Path
+
+from drone_parser import Ruch, parsuj_instrukcje, wykonaj_ruchy
+from mapa import pozycje_koncowe, wczytaj_mape
+
+
+class TestMapa(unittest.TestCase):
+    def test_wczytuje_json_i_csv(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            sciezka_json = Path(tmp) / "mapa.json"
+            sciezka_json.write_text(json.dumps([["start", "trawa", "dom"], ["góry", "skały", "jaskinia"]]), encoding="utf-8")
+            sciezka_csv = Path(tmp) / "mapa.csv"
+            sciezka_csv.write_text("start, trawa, dom\ngóry, skały, jaskinia\n", encoding="utf-8")
+            for sciezka in (sciezka_json, sciezka_csv):
+                mapa = wczytaj_mape(sciezka)
+                self.assertEqual(mapa.shape, (2, 3))
+                self.assertEqual(mapa[1][2], "jaskinia")
+
+    def test_odrzuca_nierowne_wiersze(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            sciezka = Path(tmp) / "mapa.json"
+            sciezka.write_text(json.dumps([["a", "b"], ["c"]]), encoding="utf-8")
+            with self.assertRaises(ValueError):
+                wczytaj_mape(sciezka)
+
+    def test_pozycje_koncowe_jak_ruchy_po_kolei(self):
+        rng = random.Random(0)
+        mozliwe = [Ruch(dx, 0) for dx in (-3, -1, 1, 2, 7)] + [Ruch(0, dy) for dy in (-2, -1, 1, 4)]
+        mozliwe += [Ruch(1, 0, True), Ruch(-1, 0, True), Ruch(0, 1, True), Ruch(0, -1, True)]
+        programy = [[rng.choice(mozliwe) for _ in range(rng.randint(0, 12))] for _ in range(500)]
+        # Liczby spoza zakresu int64 (np. "999…9 w prawo") - ruch ograniczony do granicy mapy
+        ogromna = int("9" * 30)
+        programy += [parsuj_instrukcje(f"{ogromna} w prawo"), parsuj_instrukcje(f"{ogromna} w dół, 2 w lewo")]
+        programy += [[rng.choice(mozliwe + [Ruch(ogromna, 0), Ruch(0, -ogromna)]) for _ in range(6)] for _ in range(50)]
+        xs, ys = pozycje_koncowe(programy, 5, 3)
+        for program, x, y in zip(programy, xs, ys):
+            self.assertEqual((int(x), int(y)), wykonaj_ruchy(program, 5, 3))
+
+    def test_pusta_paczka_programow(self):
+        xs, ys = pozycje_koncowe([[], []], 4, 4)
+        self.assertEqual(xs.tolist(), [0, 0])
+        self.assertEqual(ys.tolist(), [0, 0])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -2,8 +2,8 @@ import json
 import time
 from typing import Dict, Any, List
 import os
+import sys
 from dotenv import load_dotenv
-from openai import AsyncOpenAI
 import asyncio
 import aiohttp
 import logging
@@ -13,6 +13,9 @@ import ast
 from functools import lru_cache
 import hashlib
 
+sys.path.append(str(pathlib.Path(__file__).resolve().parent.parent))
+from common.llm_gateway import LLMGateway
+
 # --- Konfiguracja ---
 log_dir = pathlib.Path(__file__).parent / "logs"
 results_dir = pathlib.Path(__file__).parent / "results"
@@ -42,9 +45,6 @@ OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
 if not all([API_KEY, BASE_URL, PASSWORD, OPENAI_API_KEY]):
     raise ValueError("Brak wymaganych zmiennych środowiskowych w pliku .env")
 
-# --- Konfiguracja klientów ---
-client_openai = AsyncOpenAI(api_key=OPENAI_API_KEY)
-
 # Cache dla danych źródłowych
 source_cache = {}
 
@@ -82,7 +82,7 @@ async def fetch_source_data(session: aiohttp.ClientSession, url: str) -> str:
     except Exception:
         return "BŁĄD: Nie udało się pobrać danych ze źródła."
 
-async def solve_challenge_with_ai(session: aiohttp.ClientSession, url: str) -> List[str]:
+async def solve_challenge_with_ai(session: aiohttp.ClientSession, gateway: LLMGateway, url: str) -> List[str]:
     try:
         async with session.get(url) as response:
             response.raise_for_status()
@@ -115,14 +115,12 @@ Zwróć wynik jako tablicę JSON. Każdy element tablicy to string zawierający
 Przykład: jeśli pytania to "Jaki jest kolor nieba?" i "Stolica Polski?", wynikiem musi być JSON: ["niebieski", "Warszawa"]
 """
         
-        response = await client_openai.chat.completions.create(
-            model="gpt-3.5-turbo",  # Używamy szybszego modelu
-            messages=[{"role": "system", "content": system_prompt}, {"role": "user", "content": user_prompt}],
-            max_tokens=300,  # Zmniejszamy limit tokenów
-            temperature=0.0
-        )
-        
-        ai_response_text = response.choices[0].message.content.strip()
+        ai_response_text = await gateway.chat_text({
+            "model": "gpt-3.5-turbo",  # Używamy szybszego modelu
+            "messages": [{"role": "system", "content": system_prompt}, {"role": "user", "content": user_prompt}],
+            "max_tokens": 300,  # Zmniejszamy limit tokenów
+            "temperature": 0.0
+        })
 
         try:
             if ai_response_text.startswith("```json"):
@@ -140,16 +138,15 @@ Kontekst:
 
 Zwróć tablicę JSON z odpowiedziami. Przykład: ["odpowiedź1", "odpowiedź2"]
 """
-                retry_response = await client_openai.chat.completions.create(
-                    model="gpt-3.5-turbo",
-                    messages=[
+                retry_text = await gateway.chat_text({
+                    "model": "gpt-3.5-turbo",
+                    "messages": [
                         {"role": "system", "content": "Zwróć tylko tablicę JSON z odpowiedziami."},
                         {"role": "user", "content": retry_prompt}
                     ],
-                    max_tokens=300,
-                    temperature=0.0
-                )
-                retry_text = retry_response.choices[0].message.content.strip()
+                    "max_tokens": 300,
+                    "temperature": 0.0
+                })
                 if retry_text.startswith("```json"):
                     retry_text = retry_text.strip("```json").strip("`").strip()
                 answers = ast.literal_eval(retry_text)
@@ -164,7 +161,8 @@ Zwróć tablicę JSON z odpowiedziami. Przykład: ["odpowiedź1", "odpowiedź2"]
 async def main_async():
     start_time = time.time()
     
-    async with aiohttp.ClientSession() as session:
+    # Brama jest tworzona tutaj, żeby pula połączeń należała do działającej pętli zdarzeń
+    async with LLMGateway(api_key=OPENAI_API_KEY) as gateway, aiohttp.ClientSession() as session:
         try:
             hash_value = await get_hash(session)
             tasks_data = await get_tasks(session, hash_value)
@@ -173,7 +171,7 @@ async def main_async():
             if not challenge_urls:
                 return
 
-            challenge_coroutines = [solve_challenge_with_ai(session, url) for url in challenge_urls]
+            challenge_coroutines = [solve_challenge_with_ai(session, gateway, url) for url in challenge_urls]
             results_nested = await asyncio.gather(*challenge_coroutines)
             
             final_answers = [answer for sublist in results_nested for answer in sublist]
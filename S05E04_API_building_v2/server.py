@@ -1,9 +1,10 @@
-from fastapi import FastAPI, HTTPException, File, UploadFile
+from fastapi import FastAPI, HTTPException, File, UploadFile, Request
 from pydantic import BaseModel
 import uvicorn
 import logging
 import os
-from datetime import datetime
+import sys
+from pathlib import Path
 import requests
 import json
 from typing import Optional, List
@@ -14,28 +15,28 @@ import openai
 import httpx
 import io
 
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+from common.async_logging import setup_logging, log_sampling
+
 # --- Konfiguracja OpenAI ---
 load_dotenv()
 client = openai.AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"))
 
-# Konfiguracja logowania
+# Konfiguracja logowania: zapis w wątku tła, plik rotowany po rozmiarze
 log_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "logs")
-if not os.path.exists(log_dir):
-    os.makedirs(log_dir)
-log_file = os.path.join(log_dir, f"api_{datetime.now().strftime('%Y%m%d_%H%M%S')}.log")
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler(log_file, encoding='utf-8'),
-        logging.StreamHandler()
-    ]
-)
+log_file = setup_logging("api", log_dir)
+LOG_SAMPLE_RATE = float(os.getenv("LOG_SAMPLE_RATE", "1.0"))
 logger = logging.getLogger(__name__)
 logger.info(f"Rozpoczęto logowanie do pliku: {log_file}")
 
 app = FastAPI()
 
+@app.middleware("http")
+async def probkowanie_logow(request: Request, call_next):
+    # Przy LOG_SAMPLE_RATE < 1 tylko część żądań zapisuje logi INFO, reszta tylko ostrzeżenia i błędy
+    with log_sampling(LOG_SAMPLE_RATE):
+        return await call_next(request)
+
 # Zmienne do przechowywania zapamiętanych danych
 stored_data = {
     "klucz": None,
@@ -0,0 +1,179 @@
+import os
+import sys
+import json
+import random
+import tempfile
+from pathlib import Path
+
+from harness import REPO_ROOT, benchmark, load_module
+from startup import measure as measure_startup
+
+sys.path.insert(0, str(REPO_ROOT / "mock_api"))
+
+DRONE_INSTRUCTIONS = [
+    "dwa kroki w prawo, potem na dół",
+    "poleciałem jedno pole w prawo, a później na sam dół",
+    "słuchaj kolego, lecimy na maksa w prawo, a potem ile wlezie w dół. Co tam widzisz?",
+    "trzy pola w dół i jedno w prawo, zaczynamy od nowa, dwa w prawo",
+    "do końca w prawo następnie w lewo o jedno pole oraz dwa kroki w dół",
+]
+
+CENZURA_TEXT = (
+    "Dane podejrzanego: Jan Kowalski. Adres: Wrocław, ul. Szeroka 18. Wiek: 32 lata. "
+    "Informacje o osobie: Adam Nowak. Adres: Kraków, ul. Polna 5. Wiek: 45 lat. "
+) * 8
+
+
+@benchmark("drone.interpretuj_instrukcje", iterations=2000, warmup=100)
+def bench_drone_interpreter():
+    server = load_module("S04E04_API_creation/server.py")
+    instructions = iter(DRONE_INSTRUCTIONS * 1000)
+    yield lambda: server.interpretuj_instrukcje(next(instructions))
+
+
+@benchmark("drone.interpretuj_instrukcje_1000_znakow", iterations=300, warmup=20)
+def bench_drone_interpreter_long():
+    server = load_module("S04E04_API_creation/server.py")
+    long_instruction = ", ".join(DRONE_INSTRUCTIONS * 20)[:1000]
+    yield lambda: server.interpretuj_instrukcje(long_instruction)
+
+
+@benchmark("drone.nowe_instrukcje", iterations=2000, warmup=100)
+def bench_drone_novel_instructions():
+    # Za każdym razem inna instrukcja (brak trafień w cache wyników), ale złożona ze znanych fraz
+    server = load_module("S04E04_API_creation/server.py")
+    rng = random.Random(0)
+    phrases = [phrase for instruction in DRONE_INSTRUCTIONS for phrase in instruction.split(", ")]
+    instructions = iter([", ".join(rng.sample(phrases, 4)) + f", {i % 3} w lewo" for i in range(2100)])
+    yield lambda: server.interpretuj_instrukcje(next(instructions))
+
+
+@benchmark("cenzura.cenzuruj_dane", iterations=5000, warmup=100)
+def bench_cenzuruj_dane():
+    cenzura = load_module("S01E05_censoring_data/cenzura.py")
+    yield lambda: cenzura.cenzuruj_dane(CENZURA_TEXT)
+
+
+@benchmark("text_splitter.split", iterations=500, warmup=20)
+def bench_text_splitter():
+    text_service = load_module("ts_to_py_codes/text-splitter/text_service.py")
+    rng = random.Random(0)
+    words = ["dron", "mapa", "raport", "fabryka", "robot", "analiza", "tekst", "model"]
+    paragraphs = [" ".join(rng.choice(words) for _ in range(rng.randint(20, 200))) for _ in range(400)]
+    text = "\n\n".join(paragraphs)
+    splitter = text_service.TextSplitter()
+    yield lambda: splitter.split(text, 1000)
+
+
+@benchmark("vector_service.perform_search", iterations=200, warmup=10)
+def bench_vector_search():
+    vector_service = load_module("ts_to_py_codes/embedding/VectorService.py")
+
+    class StubEmbeddings:
+        """Deterministyczne embeddingi zamiast zapytań do API."""
+
+        async def create_embedding(self, text: str) -> list[float]:
+            rng = random.Random(text)
+            return [rng.uniform(-1, 1) for _ in range(1536)]
+
+    service = vector_service.VectorService(StubEmbeddings())
+    points = [{"text": f"Firma {i} (branża {i % 7})"} for i in range(50)]
+
+    async def setup_and_search():
+        if "aidevs" not in service.collections:
+            await service.initialize_collection_with_data("aidevs", points)
+        return await service.perform_search("aidevs", "Car company", 3)
+
+    yield setup_and_search
+
+
+@benchmark("memory_service.recall", iterations=200, warmup=10)
+def bench_memory_recall():
+    memory_service = load_module("ts_to_py_codes/memory/MemoryService.py")
+    previous_cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        memories = [{"id": str(i), "content": f"Wspomnienie numer {i}: lubię kolor {i % 5} i miasto {i % 11}", "metadata": {}}
+                    for i in range(100)]
+        memories.append({"id": "name", "content": "Mam na imię Adam", "metadata": {}})
+        with open("memories.json", "w", encoding="utf-8") as f:
+            json.dump(memories, f, ensure_ascii=False)
+        service = memory_service.MemoryService(os.path.join(tmp, "memories"), openai_service=None)
+
+        async def recall():
+            return await service.recall(["jak masz na imię", "miasto 3"])
+
+        try:
+            yield recall
+        finally:
+            os.chdir(previous_cwd)
+
+
+@benchmark("analyze_keywords.find_relevant_facts", iterations=2000, warmup=50)
+def bench_find_relevant_facts():
+    previous_cwd = os.getcwd()
+    os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+    with tempfile.TemporaryDirectory() as tmp:
+        # Skrypt tworzy katalogi cache w bieżącym katalogu
+        os.chdir(tmp)
+        analyze_keywords = load_module("S03E01_analyze_keywords/analyze_keywords.py")
+        rng = random.Random(0)
+        people = [f"osoba{i} nazwisko{i}" for i in range(40)]
+        facts = {f"f{i:02d}.txt": " ".join(rng.choice(people) + " pracuje w sektorze C4." for _ in range(10)) for i in range(30)}
+        person_map = {person: ["programista"] for person in people}
+        report = f"Patrol w sektorze C4 zatrzymał {people[3]} oraz {people[17]}."
+        try:
+            yield lambda: analyze_keywords.find_relevant_facts(report, facts, person_map)
+        finally:
+            os.chdir(previous_cwd)
+
+
+@benchmark("quick_answering.main_async", iterations=20, warmup=2)
+def bench_quick_answering():
+    from server import MockServer, MockConfig
+
+    config = MockConfig(
+        latency_ms=50,
+        jitter_ms=10,
+        seed=0,
+        rules=[{"endpoint": "chat", "match": "pytania", "response": '["niebieski", "Warszawa"]'}],
+    )
+    mock = MockServer(config)
+
+    # Zastępczy serwer zadań S05E03: hasło -> hash -> lista wyzwań -> odpowiedź
+    async def tasks_endpoint(payload: dict):
+        if "password" in payload:
+            return {"message": "hash"}
+        if "sign" in payload:
+            challenges = [f"{mock.url}/s05e03/challenge/{i}" for i in range(5)]
+            return {"message": {"challenges": challenges, "timestamp": 1, "signature": "sig"}}
+        return {"code": 0, "message": "OK"}
+
+    async def challenge_endpoint(number: int):
+        return {"task": "Odpowiedz na pytania", "data": [f"pytanie {number}a", f"pytanie {number}b"]}
+
+    mock.app.add_api_route("/s05e03", tasks_endpoint, methods=["POST"])
+    mock.app.add_api_route("/s05e03/challenge/{number}", challenge_endpoint, methods=["GET"])
+
+    with mock:
+        os.environ.update({
+            "API_KEY": "benchmark",
+            "PASSWORD": "benchmark",
+            "OPENAI_API_KEY": "benchmark",
+            "BASE_URL": f"{mock.url}/s05e03",
+            "OPENAI_BASE_URL": mock.openai_url,
+        })
+        solution = load_module("S05E03_quick_answering/solution.py")
+        yield solution.main_async
+
+
+@benchmark("startup.process_article", iterations=10, warmup=1)
+def bench_startup_process_article():
+    # Wczytanie skryptu w świeżym procesie (bez main) - ciężkie zależności nie powinny być importowane
+    yield lambda: measure_startup("S02E05_multimodal_processing/process_article.py")
+
+
+@benchmark("startup.analyze_factory_reports", iterations=10, warmup=1)
+def bench_startup_factory_reports():
+    os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+    yield lambda: measure_startup("S02E04_multimodal_processing1/analyze_factory_reports.py")
@@ -0,0 +1,146 @@
+import os
+import sys
+import json
+import time
+import asyncio
+import inspect
+import logging
+import importlib.util
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Optional
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+BASELINE_FILE = Path(__file__).resolve().parent / "baselines.json"
+
+# Serwery używające common.async_logging nie piszą wtedy na konsolę
+os.environ.setdefault("LOG_CONSOLE", "0")
+
+# Rejestr benchmarków: nazwa -> funkcja przygotowująca (generator zwracający mierzoną funkcję)
+BENCHMARKS = {}
+
+
+def benchmark(name: str, iterations: int = 1000, warmup: int = 50):
+    """Rejestruje benchmark.
+
+    Dekorowana funkcja to generator: przygotowuje dane, zwraca (yield) mierzoną funkcję
+    (zwykłą albo async) i po pomiarze sprząta.
+    """
+    def decorator(setup):
+        BENCHMARKS[name] = {"setup": contextmanager(setup), "iterations": iterations, "warmup": warmup}
+        return setup
+    return decorator
+
+
+def load_module(relative_path: str, module_name: Optional[str] = None):
+    """Importuje skrypt z katalogu zadania (katalogi nie są pakietami, więc ładujemy je po ścieżce)."""
+    path = REPO_ROOT / relative_path
+    module_name = module_name or f"bench_{path.parent.name}_{path.stem}".replace("-", "_")
+    if module_name in sys.modules:
+        return sys.modules[module_name]
+    # Skrypty importują moduły z własnego katalogu (np. `from OpenAIService import ...`)
+    sys.path.insert(0, str(path.parent))
+    spec = importlib.util.spec_from_file_location(module_name, path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[module_name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+def silence_console():
+    """Kieruje logi konsolowe do /dev/null, zostawiając koszt formatowania i zapisu do plików."""
+    devnull = open(os.devnull, "w", encoding="utf-8")
+    for handler in logging.getLogger().handlers:
+        if type(handler) is logging.StreamHandler:
+            handler.setStream(devnull)
+    return devnull
+
+
+def peak_rss_mb() -> Optional[float]:
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux podaje wartość w KB, macOS w bajtach
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def percentile(sorted_values: list[float], fraction: float) -> float:
+    """Percentyl metodą najbliższej rangi."""
+    index = max(0, min(len(sorted_values) - 1, int(round(fraction * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+
+def summarize(timings_ns: list[int], total_seconds: float) -> dict:
+    timings_ms = sorted(t / 1e6 for t in timings_ns)
+    return {
+        "iterations": len(timings_ms),
+        "mean_ms": round(sum(timings_ms) / len(timings_ms), 4),
+        "p50_ms": round(percentile(timings_ms, 0.50), 4),
+        "p95_ms": round(percentile(timings_ms, 0.95), 4),
+        "p99_ms": round(percentile(timings_ms, 0.99), 4),
+        "max_ms": round(timings_ms[-1], 4),
+        "ops_per_sec": round(len(timings_ms) / total_seconds, 2) if total_seconds else None,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def measure(func: Callable, iterations: int, warmup: int) -> dict:
+    """Mierzy czas pojedynczych wywołań funkcji (zwykłej albo async)."""
+    if inspect.iscoroutinefunction(func):
+        return asyncio.run(_measure_async(func, iterations, warmup))
+
+    for _ in range(warmup):
+        func()
+    timings = []
+    start = time.perf_counter()
+    for _ in range(iterations):
+        t0 = time.perf_counter_ns()
+        func()
+        timings.append(time.perf_counter_ns() - t0)
+    return summarize(timings, time.perf_counter() - start)
+
+
+async def _measure_async(func: Callable, iterations: int, warmup: int) -> dict:
+    for _ in range(warmup):
+        await func()
+    timings = []
+    start = time.perf_counter()
+    for _ in range(iterations):
+        t0 = time.perf_counter_ns()
+        await func()
+        timings.append(time.perf_counter_ns() - t0)
+    return summarize(timings, time.perf_counter() - start)
+
+
+def load_baselines() -> dict:
+    if BASELINE_FILE.exists():
+        with open(BASELINE_FILE, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    return {}
+
+
+def save_baselines(results: dict):
+    baselines = load_baselines()
+    baselines.update(results)
+    with open(BASELINE_FILE, 'w', encoding='utf-8') as f:
+        json.dump(dict(sorted(baselines.items())), f, ensure_ascii=False, indent=2)
+        f.write("\n")
+
+
+def find_regressions(results: dict, baselines: dict, tolerance: float) -> list[str]:
+    """Porównuje p95 i przepustowość z zapisanym wzorcem; zwraca opisy regresji."""
+    regressions = []
+    for name, result in results.items():
+        baseline = baselines.get(name)
+        if not baseline:
+            continue
+        if result["p95_ms"] > baseline["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{name}: p95 {result['p95_ms']:.3f} ms > wzorzec {baseline['p95_ms']:.3f} ms")
+        if result["ops_per_sec"] and baseline.get("ops_per_sec") and result["ops_per_sec"] < baseline["ops_per_sec"] / (1 + tolerance):
+            regressions.append(f"{name}: {result['ops_per_sec']:.1f} op/s < wzorzec {baseline['ops_per_sec']:.1f} op/s")
+    return regressions
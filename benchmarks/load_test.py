@@ -0,0 +1,105 @@
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+from datetime import datetime
+from pathlib import Path
+
+import aiohttp
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from harness import percentile
+
+RESULTS_FILE = Path(__file__).resolve().parent / "load_test_results.json"
+
+# Frazy, z których składane są instrukcje wysyłane do /dron
+PHRASES = [
+    "dwa kroki w prawo", "potem na dół", "jedno pole w prawo", "a później na sam dół",
+    "lecimy na maksa w prawo", "trzy pola w dół", "jedno w prawo", "do końca w prawo",
+    "w lewo o jedno pole", "dwa kroki w dół", "na samą górę", "ile wlezie w dół",
+]
+
+
+def make_instructions(count: int, unique: bool, seed: int = 0) -> list[str]:
+    """Instrukcje do wysłania; przy `unique` każda jest inna (brak trafień w cache wyników serwera)."""
+    rng = random.Random(seed)
+    instructions = [", ".join(rng.sample(PHRASES, rng.randint(1, 4))) for _ in range(count)]
+    if unique:
+        instructions = [f"{instruction}, {i} w lewo" for i, instruction in enumerate(instructions)]
+    return instructions
+
+
+async def worker(session: aiohttp.ClientSession, url: str, instructions: list[str], deadline: float, timings: list[float], errors: list[str]):
+    i = 0
+    while time.perf_counter() < deadline:
+        instruction = instructions[i % len(instructions)]
+        i += 1
+        t0 = time.perf_counter()
+        try:
+            async with session.post(url, json={"instruction": instruction}) as response:
+                await response.read()
+                if response.status != 200:
+                    errors.append(str(response.status))
+                    continue
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            errors.append(type(e).__name__)
+            continue
+        timings.append((time.perf_counter() - t0) * 1000)
+
+
+async def run_load(url: str, concurrency: int, duration: float, unique: bool) -> dict:
+    instructions = make_instructions(100_000 if unique else 200, unique)
+    timings, errors = [], []
+    # aiohttp zużywa wyraźnie mniej CPU na zapytanie niż httpx, więc klient mniej zaburza pomiar
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    async with aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=30)) as session:
+        # Rozgrzewka: połączenia i cache serwera
+        await worker(session, url, instructions, time.perf_counter() + 1, [], [])
+        start = time.perf_counter()
+        deadline = start + duration
+        await asyncio.gather(*(
+            worker(session, url, instructions[k::concurrency] or instructions, deadline, timings, errors)
+            for k in range(concurrency)
+        ))
+        elapsed = time.perf_counter() - start
+
+    timings.sort()
+    return {
+        "requests": len(timings),
+        "errors": len(errors),
+        "rps": round(len(timings) / elapsed, 1),
+        "p50_ms": round(percentile(timings, 0.50), 2) if timings else None,
+        "p95_ms": round(percentile(timings, 0.95), 2) if timings else None,
+        "p99_ms": round(percentile(timings, 0.99), 2) if timings else None,
+        "concurrency": concurrency,
+        "duration_s": duration,
+        "unique_instructions": unique,
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Test obciążeniowy endpointu /dron (S04E04_API_creation)")
+    parser.add_argument("--url", default="http://127.0.0.1:3000/dron")
+    parser.add_argument("--concurrency", type=int, default=64, help="Liczba równoległych klientów")
+    parser.add_argument("--duration", type=float, default=20, help="Czas trwania pomiaru w sekundach")
+    parser.add_argument("--unique", action="store_true", help="Każda instrukcja inna (bez trafień w cache wyników)")
+    parser.add_argument("--label", help="Zapisz wynik pod tą nazwą w load_test_results.json")
+    args = parser.parse_args()
+
+    result = asyncio.run(run_load(args.url, args.concurrency, args.duration, args.unique))
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+
+    if args.label:
+        results = json.loads(RESULTS_FILE.read_text(encoding="utf-8")) if RESULTS_FILE.exists() else {}
+        results[args.label] = {**result, "date": datetime.now().strftime("%Y-%m-%d")}
+        RESULTS_FILE.write_text(json.dumps(dict(sorted(results.items())), ensure_ascii=False, indent=2) + "\n", encoding="utf-8")
+        print(f"Zapisano wynik jako '{args.label}' w {RESULTS_FILE.name}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+import os
+import sys
+import json
+import argparse
+import subprocess
+from contextlib import redirect_stdout
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from harness import BENCHMARKS, measure, silence_console, load_baselines, save_baselines, find_regressions
+import benchmarks  # noqa: F401 - rejestruje benchmarki
+
+
+def run_single(name: str) -> dict:
+    """Uruchamia jeden benchmark w bieżącym procesie (wyjście skryptów trafia do /dev/null)."""
+    config = BENCHMARKS[name]
+    with open(os.devnull, "w", encoding="utf-8") as devnull, redirect_stdout(devnull):
+        with config["setup"]() as func:
+            silence_console()
+            return measure(func, config["iterations"], config["warmup"])
+
+
+def run_isolated(name: str) -> dict:
+    """Uruchamia benchmark w osobnym procesie, żeby szczytowe RSS dotyczyło tylko jego."""
+    completed = subprocess.run(
+        [sys.executable, __file__, "--single", name],
+        capture_output=True,
+        text=True,
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(f"Benchmark {name} zakończył się błędem:\n{completed.stderr}")
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def print_table(results: dict):
+    headers = ["benchmark", "p50_ms", "p95_ms", "p99_ms", "ops_per_sec", "peak_rss_mb"]
+    print(" | ".join(headers))
+    print("-" * 100)
+    for name, result in results.items():
+        print(" | ".join([name] + [str(result[h]) for h in headers[1:]]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarki ścieżek krytycznych skryptów z zadań")
+    parser.add_argument("names", nargs="*", help="Nazwy (lub prefiksy nazw) benchmarków; domyślnie wszystkie")
+    parser.add_argument("--save-baseline", action="store_true", help="Zapisz wyniki jako nowy wzorzec")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Dopuszczalne pogorszenie względem wzorca (0.25 = 25%%)")
+    parser.add_argument("--single", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.single:
+        print(json.dumps(run_single(args.single)))
+        return
+
+    selected = [name for name in BENCHMARKS if not args.names or any(name.startswith(prefix) for prefix in args.names)]
+    results = {}
+    failures = []
+    for name in selected:
+        print(f"Uruchamiam {name}...", file=sys.stderr)
+        try:
+            results[name] = run_isolated(name)
+        except RuntimeError as e:
+            print(e, file=sys.stderr)
+            failures.append(name)
+
+    print_table(results)
+
+    if args.save_baseline:
+        save_baselines(results)
+        print(f"\nZapisano wzorzec dla {len(results)} benchmarków")
+        return
+
+    regressions = find_regressions(results, load_baselines(), args.tolerance)
+    regressions += [f"{name}: benchmark zakończył się błędem" for name in failures]
+    if regressions:
+        print("\nWykryto regresje:")
+        for regression in regressions:
+            print(f"- {regression}")
+        sys.exit(1)
+    print("\nBrak regresji względem wzorca")
+
+
+if __name__ == "__main__":
+    main()
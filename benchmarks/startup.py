@@ -0,0 +1,115 @@
+import os
+import sys
+import argparse
+import statistics
+import subprocess
+import tempfile
+import time
+from pathlib import Path
+from typing import NamedTuple
+
+from harness import REPO_ROOT
+
+# Pomiar czasu startu skryptu: skrypt jest wczytywany (bez uruchamiania main) w świeżym procesie
+# z `python -X importtime`, a z raportu importów liczony jest łączny czas importów i najdroższe moduły.
+
+HEAVY_MODULES = ("torch", "whisper", "transformers", "numpy", "PIL")
+
+# Wczytanie skryptu tak, jak przy uruchomieniu, ale z inną nazwą, więc blok `if __name__ == "__main__"` się nie wykona
+_LOADER = "import runpy, sys; sys.path.insert(0, {dir!r}); runpy.run_path({path!r}, run_name='__import_bench__')"
+
+
+class ImportRecord(NamedTuple):
+    """Linia raportu `-X importtime`: czas własny i łączny (z importami zależnymi) w mikrosekundach."""
+    module: str
+    self_us: int
+    cumulative_us: int
+    depth: int
+
+
+class StartupSample(NamedTuple):
+    wall_ms: float
+    import_ms: float
+    max_rss_mb: float
+    records: list[ImportRecord]
+
+    def loaded(self, module: str) -> bool:
+        return any(record.module == module or record.module.startswith(module + ".") for record in self.records)
+
+
+def parse_importtime(output: str) -> list[ImportRecord]:
+    """Parsuje stderr procesu uruchomionego z `-X importtime`."""
+    records = []
+    for line in output.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        # Moduły importowane przez inne moduły są wcięte o dwie spacje na poziom
+        depth = (len(name) - len(name.lstrip(" ")) - 1) // 2
+        records.append(ImportRecord(name.strip(), int(self_us), int(cumulative_us), depth))
+    return records
+
+
+def measure(script: str | Path, env: dict | None = None) -> StartupSample:
+    """Wczytuje skrypt w świeżym procesie i mierzy czas, importy oraz szczytowe zużycie pamięci."""
+    script = Path(script) if Path(script).exists() else REPO_ROOT / script
+    script = script.resolve()
+    code = _LOADER.format(dir=str(script.parent), path=str(script))
+    run_env = {**os.environ, **(env or {})}
+    with tempfile.TemporaryFile() as stderr:
+        start = time.perf_counter()
+        process = subprocess.Popen(
+            [sys.executable, "-X", "importtime", "-c", code],
+            cwd=script.parent, env=run_env, stdout=subprocess.DEVNULL, stderr=stderr,
+        )
+        # wait4 zwraca zużycie zasobów właśnie tego procesu (szczytowe RSS)
+        _, status, usage = os.wait4(process.pid, 0)
+        wall_ms = (time.perf_counter() - start) * 1000
+        process.returncode = os.waitstatus_to_exitcode(status)
+        stderr.seek(0)
+        output = stderr.read().decode(errors="replace")
+    if process.returncode != 0:
+        errors = [line for line in output.splitlines() if not line.startswith("import time:")]
+        raise RuntimeError(f"Nie udało się wczytać {script}:\n" + "\n".join(errors[-10:]))
+
+    records = parse_importtime(output)
+    import_ms = sum(record.cumulative_us for record in records if record.depth == 0) / 1000
+    # ru_maxrss jest w KB na Linuksie i w bajtach na macOS
+    max_rss_mb = usage.ru_maxrss / (1024 * 1024 if sys.platform == "darwin" else 1024)
+    return StartupSample(wall_ms, import_ms, max_rss_mb, records)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Czas startu skryptów (importy) mierzony przez python -X importtime")
+    parser.add_argument("scripts", nargs="+")
+    parser.add_argument("--runs", type=int, default=5, help="liczba pomiarów na skrypt (wynik to mediana)")
+    parser.add_argument("--top", type=int, default=10, help="ile najdroższych importów pokazać")
+    args = parser.parse_args()
+
+    # Skrypty sprawdzają klucz API przy wczytaniu - do pomiaru wystarczy dowolna wartość
+    env = {"OPENAI_API_KEY": os.getenv("OPENAI_API_KEY") or "import-bench"}
+    print("skrypt | start [ms] | importy [ms] | RSS [MB] | ciężkie moduły")
+    samples_by_script = {}
+    for script in args.scripts:
+        # Pierwsze wczytanie rozgrzewa cache dysku i pliki .pyc - nie wchodzi do wyniku
+        measure(script, env)
+        samples = [measure(script, env) for _ in range(args.runs)]
+        samples_by_script[script] = samples
+        heavy = [module for module in HEAVY_MODULES if samples[-1].loaded(module)]
+        print(
+            f"{script} | {statistics.median(s.wall_ms for s in samples):.0f} | "
+            f"{statistics.median(s.import_ms for s in samples):.0f} | "
+            f"{statistics.median(s.max_rss_mb for s in samples):.0f} | {', '.join(heavy) or '-'}"
+        )
+
+    for script, samples in samples_by_script.items():
+        if args.top <= 0:
+            break
+        top_level = sorted((r for r in samples[-1].records if r.depth == 0), key=lambda r: -r.cumulative_us)
+        print(f"\nNajdroższe importy: {script}")
+        for record in top_level[:args.top]:
+            print(f"  {record.cumulative_us / 1000:8.1f} ms  {record.module}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,21 @@
+# Eksporty ładowane leniwie, żeby np. `common.async_logging` nie wymagało instalacji httpx
+_EXPORTS = {
+    "LLMGateway": "llm_gateway",
+    "SyncLLMGateway": "llm_gateway",
+    "LLMGatewayError": "llm_gateway",
+    "TokenBucket": "llm_gateway",
+    "CompletionCache": "completion_cache",
+    "make_cache_key": "completion_cache",
+    "setup_logging": "async_logging",
+    "shutdown_logging": "async_logging",
+    "log_sampling": "async_logging",
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    import importlib
+    return getattr(importlib.import_module(f".{_EXPORTS[name]}", __name__), name)
@@ -0,0 +1,257 @@
+import os
+import time
+import json
+import queue
+import atexit
+import random
+import struct
+import logging
+import threading
+import socketserver
+from contextlib import contextmanager
+from contextvars import ContextVar
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler, SocketHandler
+from typing import Optional
+
+DEFAULT_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+
+# Minimalny poziom logów dla bieżącego żądania (NOTSET = wszystko przechodzi)
+_request_level: ContextVar[int] = ContextVar("log_request_level", default=logging.NOTSET)
+
+_listener: Optional[QueueListener] = None
+
+
+class BufferedRotatingFileHandler(RotatingFileHandler):
+    """RotatingFileHandler bez flush po każdym wpisie.
+
+    Rozmiar pliku jest liczony w pamięci (bez seek/tell przy każdym wpisie), a flush
+    wykonuje BatchingQueueListener raz na paczkę wpisów.
+    """
+
+    def __init__(self, filename, max_bytes: int = 0, backup_count: int = 0, encoding: str = 'utf-8'):
+        super().__init__(filename, maxBytes=max_bytes, backupCount=backup_count, encoding=encoding)
+        self._size = os.path.getsize(self.baseFilename) if os.path.exists(self.baseFilename) else 0
+
+    def emit(self, record: logging.LogRecord):
+        try:
+            data = self.format(record) + self.terminator
+            size = len(data.encode(self.encoding or 'utf-8'))
+            if self.maxBytes > 0 and self._size and self._size + size > self.maxBytes:
+                self.doRollover()
+                self._size = 0
+            if self.stream is None:
+                self.stream = self._open()
+            self.stream.write(data)
+            self._size += size
+        except Exception:
+            self.handleError(record)
+
+
+class BufferedStreamHandler(logging.StreamHandler):
+    """StreamHandler bez flush po każdym wpisie (flush robi BatchingQueueListener)."""
+
+    def emit(self, record: logging.LogRecord):
+        try:
+            self.stream.write(self.format(record) + self.terminator)
+        except Exception:
+            self.handleError(record)
+
+
+class DeferredQueueHandler(QueueHandler):
+    """Wkłada rekord do kolejki bez formatowania - formatuje dopiero wątek zapisujący.
+
+    Rekordy nie opuszczają procesu, więc nie trzeba ich przygotowywać do serializacji.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+class JSONSocketHandler(SocketHandler):
+    """SocketHandler wysyłający wpisy jako JSON (4 bajty długości + JSON) zamiast pickle.
+
+    Odbiorca (start_log_server) nie wykonuje więc żadnego kodu z otrzymanych danych. Jak w
+    SocketHandler, treść jest wysyłana już sformatowana z argumentami, a wyjątek jako tekst.
+    """
+
+    def makePickle(self, record: logging.LogRecord) -> bytes:
+        if record.exc_info:
+            # format() uzupełnia record.exc_text
+            self.format(record)
+        data = dict(record.__dict__)
+        data.update(msg=record.getMessage(), args=None, exc_info=None)
+        data.pop("message", None)
+        payload = json.dumps(data, ensure_ascii=False, default=str).encode("utf-8")
+        return struct.pack(">L", len(payload)) + payload
+
+
+class RequestSamplingFilter(logging.Filter):
+    """Odrzuca wpisy poniżej poziomu wybranego dla bieżącego żądania (patrz log_sampling)."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        return record.levelno >= _request_level.get()
+
+
+class BatchingQueueListener(QueueListener):
+    """QueueListener, który zapisuje wpisy paczkami i robi jeden flush na paczkę.
+
+    Wątek budzi się najwyżej raz na `flush_interval` (chyba że paczka jest pełna),
+    więc pod obciążeniem rzadko konkuruje o GIL z obsługą żądań.
+    """
+
+    def __init__(self, log_queue: queue.Queue, *handlers: logging.Handler, batch_size: int = 512, flush_interval: float = 0.2):
+        super().__init__(log_queue, *handlers, respect_handler_level=True)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+
+    def _monitor(self):
+        log_queue = self.queue
+        while True:
+            batch = [log_queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(log_queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            stop = False
+            for record in batch:
+                if record is self._sentinel:
+                    stop = True
+                else:
+                    self.handle(record)
+            for handler in self.handlers:
+                handler.flush()
+            if stop:
+                return
+            if len(batch) < self.batch_size:
+                # Zbieramy wpisy przez flush_interval zamiast budzić wątek przy każdym wpisie
+                time.sleep(self.flush_interval)
+
+
+def setup_logging(
+    name: str,
+    log_dir: str,
+    level: Optional[int] = None,
+    max_bytes: Optional[int] = None,
+    backup_count: Optional[int] = None,
+    console: Optional[bool] = None,
+    batch_size: int = 512,
+    flush_interval: float = 0.2,
+) -> str:
+    """Konfiguruje nieblokujące logowanie: logger główny -> kolejka -> wątek zapisujący do pliku i konsoli.
+
+    Plik `{log_dir}/{name}.log` jest rotowany po przekroczeniu `max_bytes`. Wartości domyślne można
+    nadpisać zmiennymi LOG_LEVEL, LOG_MAX_BYTES, LOG_BACKUP_COUNT i LOG_CONSOLE (0 = bez konsoli).
+    Zwraca ścieżkę pliku logów.
+
+    Jeśli ustawiona jest zmienna LOG_SERVER ("host:port", ustawia ją common/serve.py), proces jest
+    jednym z kilku workerów: wpisy trafiają wtedy przez gniazdo do procesu nadrzędnego
+    (start_log_server), który jako jedyny pisze do pliku i rotuje go.
+    """
+    global _listener
+
+    os.makedirs(log_dir, exist_ok=True)
+    log_file = os.path.join(log_dir, f"{name}.log")
+    if _listener is not None:
+        return log_file
+
+    if level is None:
+        level = logging.getLevelName(os.getenv("LOG_LEVEL", "INFO").upper())
+    if max_bytes is None:
+        max_bytes = int(os.getenv("LOG_MAX_BYTES", str(10 * 1024 * 1024)))
+    if backup_count is None:
+        backup_count = int(os.getenv("LOG_BACKUP_COUNT", "5"))
+    if console is None:
+        console = os.getenv("LOG_CONSOLE", "1") != "0"
+
+    formatter = logging.Formatter(DEFAULT_FORMAT)
+    log_server = os.getenv("LOG_SERVER")
+    if log_server:
+        host, port = log_server.rsplit(":", 1)
+        handlers = [JSONSocketHandler(host, int(port))]
+    else:
+        handlers = [BufferedRotatingFileHandler(log_file, max_bytes=max_bytes, backup_count=backup_count)]
+        if console:
+            handlers.append(BufferedStreamHandler())
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    log_queue = queue.SimpleQueue()
+    queue_handler = DeferredQueueHandler(log_queue)
+    queue_handler.addFilter(RequestSamplingFilter())
+
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(level)
+
+    _listener = BatchingQueueListener(log_queue, *handlers, batch_size=batch_size, flush_interval=flush_interval)
+    _listener.start()
+    atexit.register(shutdown_logging)
+    return log_file
+
+
+def shutdown_logging():
+    """Zapisuje zaległe wpisy i zatrzymuje wątek zapisujący."""
+    global _listener
+    if _listener is None:
+        return
+    _listener.stop()
+    for handler in _listener.handlers:
+        handler.close()
+    _listener = None
+
+
+# Największy przyjmowany wpis - dłuższy nagłówek oznacza uszkodzony albo obcy strumień
+MAX_RECORD_BYTES = 1024 * 1024
+
+
+class _LogRecordStreamHandler(socketserver.StreamRequestHandler):
+    """Odbiera wpisy wysłane przez JSONSocketHandler (długość + JSON) i przekazuje je do lokalnych loggerów."""
+
+    def handle(self):
+        while True:
+            header = self.rfile.read(4)
+            if len(header) < 4:
+                return
+            length = struct.unpack(">L", header)[0]
+            if length > MAX_RECORD_BYTES:
+                return
+            try:
+                data = json.loads(self.rfile.read(length))
+            except ValueError:
+                return
+            if not isinstance(data, dict):
+                return
+            record = logging.makeLogRecord(data)
+            logging.getLogger(str(record.name)).handle(record)
+
+
+def start_log_server(name: str, log_dir: str, host: str = "127.0.0.1", port: int = 0, **kwargs) -> tuple[str, int]:
+    """Uruchamia w wątku tła serwer zbierający wpisy z workerów i zapisujący je przez setup_logging.
+
+    Serwer domyślnie nasłuchuje tylko lokalnie. Wpisy przychodzą jako JSON, więc odebrane dane nie są
+    wykonywane jako kod. Zwraca ścieżkę pliku logów i port.
+    """
+    log_file = setup_logging(name, log_dir, **kwargs)
+    server = socketserver.ThreadingTCPServer((host, port), _LogRecordStreamHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="log-server", daemon=True).start()
+    return log_file, server.server_address[1]
+
+
+@contextmanager
+def log_sampling(sample_rate: float, unsampled_level: int = logging.WARNING):
+    """Próbkowanie logów w obrębie jednego żądania.
+
+    Z prawdopodobieństwem `sample_rate` żądanie loguje wszystko; pozostałe żądania
+    zapisują tylko wpisy od poziomu `unsampled_level` wzwyż.
+    """
+    sampled = sample_rate >= 1 or random.random() < sample_rate
+    token = _request_level.set(logging.NOTSET if sampled else unsampled_level)
+    try:
+        yield sampled
+    finally:
+        _request_level.reset(token)
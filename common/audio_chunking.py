@@ -0,0 +1,206 @@
+from __future__ import annotations
+
+import io
+import math
+import wave
+import asyncio
+import subprocess
+from concurrent.futures import Executor
+from pathlib import Path
+from typing import NamedTuple, Optional
+
+from .lazy_import import lazy_import
+
+# Dzielenie długich nagrań na fragmenty w miejscach ciszy, równoległa transkrypcja fragmentów
+# i sklejanie wyników z poprawionymi znacznikami czasu.
+
+# numpy i whisper (z torch) są wczytywane dopiero przy pierwszym nagraniu
+np = lazy_import("numpy")
+whisper = lazy_import("whisper")
+
+SAMPLE_RATE = 16000
+# Fragment WAV 16 kHz / 16 bit mono to ok. 1,9 MB na minutę - 10 minut mieści się w limicie 25 MB API
+API_MAX_CHUNK_SECONDS = 600
+
+
+class Chunk(NamedTuple):
+    """Fragment nagrania: indeksy próbek [start, end)."""
+    start: int
+    end: int
+
+    def offset_seconds(self, sample_rate: int = SAMPLE_RATE) -> float:
+        return self.start / sample_rate
+
+
+def load_audio(path: str | Path, sample_rate: int = SAMPLE_RATE) -> np.ndarray:
+    """Dekoduje nagranie (dowolny format obsługiwany przez ffmpeg) do mono float32 w zakresie [-1, 1]."""
+    cmd = [
+        "ffmpeg", "-nostdin", "-threads", "0", "-i", str(path),
+        "-f", "s16le", "-ac", "1", "-acodec", "pcm_s16le", "-ar", str(sample_rate), "-",
+    ]
+    try:
+        out = subprocess.run(cmd, capture_output=True, check=True).stdout
+    except FileNotFoundError:
+        raise RuntimeError("Do dzielenia nagrań potrzebny jest ffmpeg (https://ffmpeg.org/download.html)")
+    except subprocess.CalledProcessError as e:
+        raise RuntimeError(f"Nie udało się zdekodować {path}: {e.stderr.decode(errors='ignore')}") from e
+    return np.frombuffer(out, np.int16).astype(np.float32) / 32768.0
+
+
+def find_silences(
+    samples: np.ndarray,
+    sample_rate: int = SAMPLE_RATE,
+    frame_ms: int = 30,
+    silence_db: float = -40.0,
+    min_silence_seconds: float = 0.4,
+) -> list[tuple[int, int]]:
+    """Zwraca przedziały ciszy [start, end) w próbkach: ramki o głośności RMS poniżej `silence_db` dBFS
+    trwające co najmniej `min_silence_seconds`."""
+    frame = int(sample_rate * frame_ms / 1000)
+    n_frames = len(samples) // frame
+    if n_frames == 0:
+        return []
+    frames = samples[:n_frames * frame].reshape(n_frames, frame)
+    rms = np.sqrt(np.mean(frames.astype(np.float64) ** 2, axis=1))
+    silent = 20 * np.log10(rms + 1e-10) < silence_db
+
+    # Początki i końce ciągów cichych ramek
+    edges = np.diff(np.concatenate(([0], silent.astype(np.int8), [0])))
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)
+    min_frames = max(1, math.ceil(min_silence_seconds * 1000 / frame_ms))
+    return [(int(s) * frame, int(e) * frame) for s, e in zip(starts, ends) if e - s >= min_frames]
+
+
+def split_on_silence(
+    samples: np.ndarray,
+    sample_rate: int = SAMPLE_RATE,
+    max_chunk_seconds: float = API_MAX_CHUNK_SECONDS,
+    min_chunk_seconds: float = 10.0,
+    **silence_kwargs,
+) -> list[Chunk]:
+    """Dzieli nagranie na fragmenty nie dłuższe niż `max_chunk_seconds`.
+
+    Cięcie wypada w środku ostatniej ciszy przed limitem; jeśli w oknie nie ma ciszy
+    (np. ciągła muzyka), fragment jest ucinany dokładnie na limicie.
+    """
+    total = len(samples)
+    max_len = int(max_chunk_seconds * sample_rate)
+    min_len = int(min(min_chunk_seconds, max_chunk_seconds / 2) * sample_rate)
+    if total <= max_len:
+        return [Chunk(0, total)]
+
+    cut_points = np.array([(s + e) // 2 for s, e in find_silences(samples, sample_rate, **silence_kwargs)], dtype=np.int64)
+    chunks = []
+    start = 0
+    while total - start > max_len:
+        limit = start + max_len
+        candidates = cut_points[(cut_points > start + min_len) & (cut_points <= limit)]
+        cut = int(candidates[-1]) if len(candidates) else limit
+        chunks.append(Chunk(start, cut))
+        start = cut
+    chunks.append(Chunk(start, total))
+    return chunks
+
+
+def to_wav_bytes(samples: np.ndarray, sample_rate: int = SAMPLE_RATE) -> bytes:
+    """Koduje próbki float32 jako WAV 16 bit mono (format przyjmowany przez API transkrypcji)."""
+    pcm = (np.clip(samples, -1.0, 1.0) * 32767).astype(np.int16)
+    buffer = io.BytesIO()
+    with wave.open(buffer, 'wb') as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        wav.writeframes(pcm.tobytes())
+    return buffer.getvalue()
+
+
+def stitch_transcripts(parts: list[tuple[float, dict]]) -> dict:
+    """Skleja wyniki transkrypcji fragmentów (offset w sekundach, wynik verbose_json / whisper).
+
+    Znaczniki czasu segmentów są przesuwane o offset fragmentu, a numeracja segmentów jest ciągła.
+    """
+    texts = []
+    segments = []
+    for offset, result in sorted(parts, key=lambda part: part[0]):
+        text = (result.get("text") or "").strip()
+        if text:
+            texts.append(text)
+        for segment in result.get("segments") or []:
+            segments.append({
+                **segment,
+                "id": len(segments),
+                "start": round(segment["start"] + offset, 3),
+                "end": round(segment["end"] + offset, 3),
+            })
+    return {"text": " ".join(texts), "segments": segments}
+
+
+async def transcribe_long_audio_api(
+    gateway,
+    path: str | Path,
+    model: str = "whisper-1",
+    language: Optional[str] = None,
+    max_chunk_seconds: float = API_MAX_CHUNK_SECONDS,
+    samples: Optional[np.ndarray] = None,
+) -> dict:
+    """Transkrybuje długie nagranie przez API: fragmenty są wysyłane równolegle (limit współbieżności
+    wyznacza brama LLMGateway), a wynik ma tekst i segmenty ze znacznikami czasu całego nagrania."""
+    path = Path(path)
+    if samples is None:
+        samples = await asyncio.to_thread(load_audio, path)
+    chunks = split_on_silence(samples, max_chunk_seconds=max_chunk_seconds)
+
+    async def transcribe_chunk(i: int, chunk: Chunk) -> tuple[float, dict]:
+        audio = await asyncio.to_thread(to_wav_bytes, samples[chunk.start:chunk.end])
+        result = await gateway.transcribe(
+            f"{path.stem}_{i:03d}.wav", audio, model=model, language=language, response_format="verbose_json"
+        )
+        return chunk.offset_seconds(), result
+
+    parts = await asyncio.gather(*(transcribe_chunk(i, chunk) for i, chunk in enumerate(chunks)))
+    return stitch_transcripts(list(parts))
+
+
+# Modele Whisper wczytane w bieżącym procesie (w procesach puli każdy wczytuje model raz)
+_local_models = {}
+
+
+def _local_model(model_name: str):
+    if model_name not in _local_models:
+        _local_models[model_name] = whisper.load_model(model_name)
+    return _local_models[model_name]
+
+
+def transcribe_samples_local(model_name: str, samples: np.ndarray, language: Optional[str] = None) -> dict:
+    """Transkrybuje próbki lokalnym modelem Whisper (funkcja wykonywana w procesie puli)."""
+    result = _local_model(model_name).transcribe(samples, language=language)
+    return {"text": result["text"], "segments": [
+        {"start": s["start"], "end": s["end"], "text": s["text"]} for s in result["segments"]
+    ]}
+
+
+def transcribe_long_audio_local(
+    path: str | Path,
+    executor: Executor,
+    workers: int,
+    model_name: str = "base",
+    language: Optional[str] = None,
+    max_chunk_seconds: float = API_MAX_CHUNK_SECONDS,
+    samples: Optional[np.ndarray] = None,
+) -> dict:
+    """Transkrybuje nagranie lokalnym Whisperem, dzieląc je na fragmenty wykonywane w puli procesów.
+
+    Długość fragmentu jest dobierana tak, żeby każdy z `workers` procesów dostał pracę
+    (nie krócej niż 30 s - tyle wynosi okno modelu).
+    """
+    if samples is None:
+        samples = load_audio(path)
+    duration = len(samples) / SAMPLE_RATE
+    chunk_seconds = min(max_chunk_seconds, max(30.0, duration / max(1, workers)))
+    chunks = split_on_silence(samples, max_chunk_seconds=chunk_seconds)
+    futures = [
+        (chunk.offset_seconds(), executor.submit(transcribe_samples_local, model_name, samples[chunk.start:chunk.end], language))
+        for chunk in chunks
+    ]
+    return stitch_transcripts([(offset, future.result()) for offset, future in futures])
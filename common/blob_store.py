@@ -0,0 +1,226 @@
+import os
+import re
+import json
+import time
+import hashlib
+from pathlib import Path
+from typing import NamedTuple, Optional
+
+import httpx
+
+from .jsonl_log import JsonlLog
+
+# Pobrane pliki (obrazy, nagrania) zapisywane pod skrótem SHA-256 treści, a nie pod nazwą z adresu:
+# dwa różne adresy z tą samą nazwą pliku się nie nadpisują, a ta sama treść spod dwóch adresów
+# jest na dysku raz. Plik jest zapisywany strumieniowo, kawałkami, bez trzymania całości w pamięci.
+
+CHUNK_SIZE = 64 * 1024
+DEFAULT_BLOB_DIR = os.getenv("BLOB_STORE_DIR", os.path.join("cache", "blobs"))
+
+_CONTENT_RANGE = re.compile(r"bytes (\d+)-(\d+)/(\d+|\*)")
+
+
+class Blob(NamedTuple):
+    """Pobrany plik: ścieżka w magazynie, skrót treści i to, czy obyło się bez pobierania treści."""
+    url: str
+    path: Path
+    sha256: str
+    size: int
+    content_type: Optional[str]
+    cached: bool
+
+
+class BlobStore:
+    """Magazyn pobranych plików adresowanych treścią (SHA-256), z indeksem adres -> skrót.
+
+    - Treść jest zapisywana kawałkami po `chunk_size` bajtów prosto do pliku `.part` i dopiero
+      po pobraniu całości przenoszona do `objects/<ab>/<sha256>`
+    - Przerwane pobieranie jest wznawiane nagłówkiem `Range` (z `If-Range`, więc zmieniony na
+      serwerze plik jest pobierany od nowa, a nie sklejany ze starym początkiem)
+    - Indeks (`index.jsonl`) trzyma dla adresu skrót, ETag i Last-Modified; ponowne pobranie
+      wysyła zapytanie warunkowe i przy 304 nie pobiera treści
+
+    Jeden adres nie powinien być pobierany jednocześnie przez dwóch wywołujących (wspólny plik `.part`).
+
+    store = BlobStore("cache/blobs")
+    with httpx.Client() as client:
+        blob = store.fetch(client, "https://example.com/nagranie.mp3")
+    """
+
+    def __init__(self, root: str | Path = DEFAULT_BLOB_DIR, chunk_size: int = CHUNK_SIZE):
+        self.root = Path(root)
+        self.chunk_size = chunk_size
+        self.index_path = self.root / "index.jsonl"
+        self.index = JsonlLog(self.index_path)
+        self.entries: dict[str, dict] = {entry["url"]: entry for entry in self.index.read()}
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def __contains__(self, url: str) -> bool:
+        return self.get(url) is not None
+
+    def blob_path(self, sha256: str) -> Path:
+        return self.root / "objects" / sha256[:2] / sha256
+
+    def get(self, url: str) -> Optional[Blob]:
+        """Plik pobrany wcześniej spod adresu (bez zapytania do serwera) albo None."""
+        entry = self.entries.get(url)
+        if entry is None:
+            return None
+        path = self.blob_path(entry["sha256"])
+        if not path.exists():
+            return None
+        return Blob(url, path, entry["sha256"], entry["size"], entry.get("content_type"), True)
+
+    def path_for(self, url: str) -> Optional[Path]:
+        blob = self.get(url)
+        return blob.path if blob else None
+
+    def fetch(self, client: httpx.Client, url: str, revalidate: bool = True) -> Blob:
+        """Pobiera plik (albo wznawia pobieranie) i zwraca go z magazynu.
+
+        Przy `revalidate=False` plik znany z indeksu jest zwracany bez żadnego zapytania.
+        """
+        cached = self.get(url)
+        if cached is not None and not revalidate:
+            return cached
+        headers, offset, hasher = self._request_state(url, cached)
+        with client.stream("GET", url, headers=headers) as response:
+            if response.status_code == 304 and cached is not None:
+                return cached
+            if response.status_code == 416 and offset:
+                # Serwer nie przyjął zakresu (np. plik się skrócił) - pobieramy od początku
+                self._discard_partial(url)
+                return self.fetch(client, url, revalidate)
+            response.raise_for_status()
+            part, offset, hasher = self._open_partial(url, response, offset, hasher)
+            with open(part, 'ab') as f:
+                for chunk in response.iter_bytes(self.chunk_size):
+                    f.write(chunk)
+                    hasher.update(chunk)
+                    offset += len(chunk)
+            return self._finish(url, response, part, hasher, offset)
+
+    async def fetch_async(self, client: httpx.AsyncClient, url: str, revalidate: bool = True) -> Blob:
+        """Asynchroniczna wersja `fetch`."""
+        cached = self.get(url)
+        if cached is not None and not revalidate:
+            return cached
+        headers, offset, hasher = self._request_state(url, cached)
+        async with client.stream("GET", url, headers=headers) as response:
+            if response.status_code == 304 and cached is not None:
+                return cached
+            if response.status_code == 416 and offset:
+                self._discard_partial(url)
+                return await self.fetch_async(client, url, revalidate)
+            response.raise_for_status()
+            part, offset, hasher = self._open_partial(url, response, offset, hasher)
+            with open(part, 'ab') as f:
+                async for chunk in response.aiter_bytes(self.chunk_size):
+                    f.write(chunk)
+                    hasher.update(chunk)
+                    offset += len(chunk)
+            return self._finish(url, response, part, hasher, offset)
+
+    def _partial_paths(self, url: str) -> tuple[Path, Path]:
+        key = hashlib.sha256(url.encode()).hexdigest()
+        return self.root / "partial" / f"{key}.part", self.root / "partial" / f"{key}.json"
+
+    def _discard_partial(self, url: str):
+        for path in self._partial_paths(url):
+            path.unlink(missing_ok=True)
+
+    def _request_state(self, url: str, cached: Optional[Blob]):
+        """Nagłówki zapytania, liczba bajtów już pobranych i skrót liczony od ich początku."""
+        # Bez kompresji transportowej: zakres bajtów (Range) dotyczy wtedy samej treści
+        headers = {"Accept-Encoding": "identity"}
+        if cached is not None:
+            entry = self.entries[url]
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+
+        hasher = hashlib.sha256()
+        part, meta = self._partial_paths(url)
+        if not part.exists():
+            return headers, 0, hasher
+        validators = json.loads(meta.read_text(encoding='utf-8')) if meta.exists() else {}
+        # Słaby ETag (W/...) nie gwarantuje identycznych bajtów, więc nie nadaje się do If-Range
+        etag = validators.get("etag")
+        validator = etag if etag and not etag.startswith("W/") else validators.get("last_modified")
+        if not validator or part.stat().st_size == 0:
+            self._discard_partial(url)
+            return headers, 0, hasher
+
+        with open(part, 'rb') as f:
+            while chunk := f.read(self.chunk_size):
+                hasher.update(chunk)
+        offset = part.stat().st_size
+        headers.update({"Range": f"bytes={offset}-", "If-Range": validator})
+        return headers, offset, hasher
+
+    def _open_partial(self, url: str, response: httpx.Response, offset: int, hasher):
+        """Przygotowuje plik `.part`: dopisywanie przy 206 od właściwego bajtu, od nowa przy 200."""
+        part, meta = self._partial_paths(url)
+        if response.status_code == 206:
+            match = _CONTENT_RANGE.match(response.headers.get("content-range", ""))
+            if match is None or int(match.group(1)) != offset:
+                self._discard_partial(url)
+                raise RuntimeError(f"Nieoczekiwany zakres odpowiedzi dla {url}: {response.headers.get('content-range')}")
+            return part, offset, hasher
+
+        # Pełna odpowiedź (pierwsze pobranie albo plik zmienił się na serwerze): zaczynamy od zera
+        part.parent.mkdir(parents=True, exist_ok=True)
+        part.write_bytes(b"")
+        meta.write_text(json.dumps({
+            "url": url,
+            "etag": response.headers.get("etag"),
+            "last_modified": response.headers.get("last-modified"),
+        }), encoding='utf-8')
+        return part, 0, hashlib.sha256()
+
+    def _finish(self, url: str, response: httpx.Response, part: Path, hasher, size: int) -> Blob:
+        expected = _expected_size(response)
+        if expected is not None and size != expected:
+            # Połączenie zerwane bez błędu - plik .part zostaje do wznowienia
+            raise RuntimeError(f"Niepełne pobieranie {url}: {size} z {expected} bajtów")
+
+        sha256 = hasher.hexdigest()
+        path = self.blob_path(sha256)
+        if path.exists():
+            # Ta sama treść jest już w magazynie (np. spod innego adresu)
+            part.unlink()
+        else:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            os.replace(part, path)
+        self._partial_paths(url)[1].unlink(missing_ok=True)
+
+        content_type = response.headers.get("content-type")
+        self._record({
+            "url": url,
+            "sha256": sha256,
+            "size": size,
+            "etag": response.headers.get("etag"),
+            "last_modified": response.headers.get("last-modified"),
+            "content_type": content_type,
+            "fetched_at": time.time(),
+        })
+        return Blob(url, path, sha256, size, content_type, False)
+
+    def _record(self, entry: dict):
+        self.index.append(entry)
+        self.entries[entry["url"]] = entry
+
+
+def _expected_size(response: httpx.Response) -> Optional[int]:
+    """Pełny rozmiar pliku według nagłówków (Content-Range przy 206, Content-Length przy 200)."""
+    match = _CONTENT_RANGE.match(response.headers.get("content-range", ""))
+    if match and match.group(3) != "*":
+        return int(match.group(3))
+    # Przy kompresji (Content-Encoding) Content-Length dotyczy bajtów przed rozpakowaniem
+    if response.status_code == 200 and "content-encoding" not in response.headers:
+        length = response.headers.get("content-length")
+        return int(length) if length and length.isdigit() else None
+    return None
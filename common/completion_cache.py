@@ -0,0 +1,148 @@
+import os
+import json
+import time
+import base64
+import sqlite3
+import hashlib
+import logging
+import threading
+from pathlib import Path
+from typing import Any, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_PATH = os.getenv("LLM_CACHE_PATH", os.path.join("cache", "completions.sqlite"))
+
+# Pola zapytania, które nie wpływają na treść odpowiedzi
+IGNORED_FIELDS = {"stream", "user"}
+
+
+def _normalize(value: Any) -> Any:
+    """Zastępuje obrazki w formacie data URL skrótem SHA-256 ich bajtów."""
+    if isinstance(value, dict):
+        return {key: _normalize(item) for key, item in value.items() if key not in IGNORED_FIELDS}
+    if isinstance(value, list):
+        return [_normalize(item) for item in value]
+    if isinstance(value, str) and value.startswith("data:") and ";base64," in value:
+        header, encoded = value.split(";base64,", 1)
+        return f"{header};sha256,{hashlib.sha256(base64.b64decode(encoded)).hexdigest()}"
+    return value
+
+
+def is_cacheable(payload: dict) -> bool:
+    """Czy odpowiedź na zapytanie można zapisać w cache.
+
+    Zapytanie z jawną temperaturą powyżej 0 ma dawać za każdym razem inną odpowiedź, więc nie jest
+    zapisywane. Zapytania bez pola `temperature` są zapisywane - o tym, czy odpowiedź ma się
+    powtarzać, decyduje wtedy wywołujący.
+    """
+    return (payload.get("temperature") or 0) <= 0
+
+
+def make_cache_key(endpoint: str, payload: dict) -> str:
+    """Klucz cache: skrót z endpointu i znormalizowanego zapytania (model, wiadomości, temperatura, obrazki, format)."""
+    canonical = json.dumps({"endpoint": endpoint, "payload": _normalize(payload)}, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class CompletionCache:
+    """Trwały cache odpowiedzi API w SQLite, adresowany treścią zapytania.
+
+    Wpisy wygasają po `ttl` sekundach, a po przekroczeniu `max_bytes` usuwane są najdawniej używane
+    (do `EVICT_TO` limitu, żeby sprzątanie nie uruchamiało się przy każdym kolejnym zapisie).
+    Rozmiar cache jest liczony na bieżąco przy zapisie; pełne przeliczenie (uwzględniające też
+    zapisy innych procesów) odbywa się tylko przy sprzątaniu. Tryb WAL i `busy_timeout` pozwalają
+    na zapis z wielu procesów jednocześnie.
+    """
+
+    # Sprzątanie zmniejsza cache do tej części `max_bytes`
+    EVICT_TO = 0.9
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, ttl: Optional[float] = None, max_bytes: int = 256 * 1024 * 1024):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS entries (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )"""
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS entries_accessed_at ON entries (accessed_at)")
+        self._total = self._size_on_disk()
+
+    def _size_on_disk(self) -> int:
+        return self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+
+    def get(self, key: str) -> Optional[Any]:
+        """Zwraca zapisaną odpowiedź albo None (i liczy trafienia/chybienia)."""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT value, size, created_at FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            value, size, created_at = row
+            if self.ttl is not None and created_at + self.ttl < now:
+                self._conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                self._total -= size
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE entries SET accessed_at = ? WHERE key = ?", (now, key))
+            self.hits += 1
+        return json.loads(value)
+
+    def set(self, key: str, value: Any):
+        """Zapisuje odpowiedź i w razie potrzeby usuwa najdawniej używane wpisy."""
+        serialized = json.dumps(value, ensure_ascii=False)
+        now = time.time()
+        with self._lock:
+            previous = self._conn.execute("SELECT size FROM entries WHERE key = ?", (key,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO entries (key, value, size, created_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                (key, serialized, len(serialized), now, now),
+            )
+            self._total += len(serialized) - (previous[0] if previous else 0)
+            if self._total > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        if self.ttl is not None:
+            self._conn.execute("DELETE FROM entries WHERE created_at < ?", (time.time() - self.ttl,))
+        total = self._size_on_disk()
+        target = int(self.max_bytes * self.EVICT_TO)
+        evicted = []
+        if total > self.max_bytes:
+            for key, size in self._conn.execute("SELECT key, size FROM entries ORDER BY accessed_at"):
+                if total <= target:
+                    break
+                evicted.append((key,))
+                total -= size
+            self._conn.executemany("DELETE FROM entries WHERE key = ?", evicted)
+            logger.debug(f"Usunięto {len(evicted)} najdawniej używanych wpisów z cache")
+        self._total = total
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries, size = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+            self._total = size
+        return {"hits": self.hits, "misses": self.misses, "entries": entries, "bytes": size}
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM entries")
+            self._total = 0
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,296 @@
+from __future__ import annotations
+
+import io
+import os
+import sys
+import math
+import base64
+import asyncio
+import hashlib
+import argparse
+from concurrent.futures import Executor, ProcessPoolExecutor
+from pathlib import Path
+from typing import NamedTuple, Optional
+
+from .lazy_import import lazy_import
+
+# numpy i Pillow są wczytywane dopiero przy pierwszym przygotowaniu obrazu
+np = lazy_import("numpy")
+Image = lazy_import("PIL.Image")
+ImageOps = lazy_import("PIL.ImageOps")
+
+# Przygotowanie obrazów przed wysłaniem do modelu z wizją: zmniejszenie do rozdzielczości,
+# którą model i tak widzi, kompresja JPEG/WebP do zadanego rozmiaru i usunięcie metadanych.
+
+# GPT-4o (detail=high): obraz mieszczony w 2048x2048, potem krótszy bok skalowany do 768 px,
+# koszt to 85 tokenów + 170 za każdy kafelek 512x512
+MAX_SIDE = 2048
+SHORT_SIDE = 768
+TILE = 512
+BASE_TOKENS = 85
+TILE_TOKENS = 170
+
+DEFAULT_MAX_BYTES = 300 * 1024
+DEFAULT_CACHE_DIR = os.getenv("IMAGE_CACHE_DIR", os.path.join("cache", "images"))
+# Zmiana algorytmu unieważnia wpisy w cache
+PREP_VERSION = 1
+
+
+class PreparedImage(NamedTuple):
+    data: bytes
+    mime_type: str
+    width: int
+    height: int
+    original_bytes: int
+    original_width: int
+    original_height: int
+
+    def data_url(self) -> str:
+        return f"data:{self.mime_type};base64,{base64.b64encode(self.data).decode('ascii')}"
+
+    @property
+    def tokens(self) -> int:
+        return vision_tokens(self.width, self.height)
+
+    @property
+    def original_tokens(self) -> int:
+        return vision_tokens(self.original_width, self.original_height)
+
+
+def model_size(width: int, height: int) -> tuple[int, int]:
+    """Rozmiar, do jakiego model przeskaluje obraz przed podziałem na kafelki (nigdy nie powiększa)."""
+    scale = min(1.0, MAX_SIDE / max(width, height))
+    short_side = min(width, height) * scale
+    if short_side > SHORT_SIDE:
+        scale *= SHORT_SIDE / short_side
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+
+def vision_tokens(width: int, height: int) -> int:
+    """Koszt obrazu w tokenach (detail=high)."""
+    w, h = model_size(width, height)
+    return BASE_TOKENS + TILE_TOKENS * math.ceil(w / TILE) * math.ceil(h / TILE)
+
+
+def target_size(width: int, height: int, tile_slack: float = 0.15) -> tuple[int, int]:
+    """Rozmiar docelowy: to, co widzi model, a jeśli bok tylko nieznacznie (o `tile_slack`) wystaje
+    poza wielokrotność kafelka, obraz jest zmniejszany do tej wielokrotności - oszczędza cały rząd kafelków."""
+    w, h = model_size(width, height)
+    scale = 1.0
+    for side in (w, h):
+        tiles = side // TILE
+        if tiles and side % TILE and side - tiles * TILE <= tile_slack * tiles * TILE:
+            scale = min(scale, tiles * TILE / side)
+    return max(1, math.floor(w * scale)), max(1, math.floor(h * scale))
+
+
+def _encode(image: Image.Image, image_format: str, quality: int) -> bytes:
+    buffer = io.BytesIO()
+    # Zapis bez exif/icc/info - metadane (GPS, aparat, miniatury) nie trafiają do zapytania
+    image.save(buffer, format=image_format, quality=quality, optimize=image_format == "JPEG")
+    return buffer.getvalue()
+
+
+def prepare_image_bytes(
+    data: bytes,
+    max_bytes: int = DEFAULT_MAX_BYTES,
+    image_format: str = "JPEG",
+    min_quality: int = 40,
+    max_quality: int = 90,
+    tile_slack: float = 0.15,
+) -> PreparedImage:
+    """Zmniejsza obraz do rozmiaru docelowego i dobiera najwyższą jakość mieszczącą się w `max_bytes`.
+
+    Jeśli nawet najniższa jakość nie mieści się w limicie, obraz jest dalej zmniejszany.
+    """
+    with Image.open(io.BytesIO(data)) as source:
+        image = ImageOps.exif_transpose(source)
+        original_width, original_height = image.size
+        if image.mode not in ("RGB", "L"):
+            # JPEG nie ma kanału alfa - przezroczystość na białym tle
+            rgba = image.convert("RGBA")
+            image = Image.new("RGB", rgba.size, "white")
+            image.paste(rgba, mask=rgba.getchannel("A"))
+        size = target_size(original_width, original_height, tile_slack)
+        if size != image.size:
+            image = image.resize(size, Image.LANCZOS)
+
+    while True:
+        # Wyszukiwanie binarne najwyższej jakości, która mieści się w limicie
+        low, high = min_quality, max_quality
+        best = None
+        while low <= high:
+            quality = (low + high) // 2
+            encoded = _encode(image, image_format, quality)
+            if len(encoded) <= max_bytes:
+                best = encoded
+                low = quality + 1
+            else:
+                high = quality - 1
+        if best is not None or min(image.size) <= 64:
+            best = best or _encode(image, image_format, min_quality)
+            break
+        image = image.resize((max(1, int(image.width * 0.8)), max(1, int(image.height * 0.8))), Image.LANCZOS)
+
+    return PreparedImage(
+        best, f"image/{image_format.lower()}", image.width, image.height,
+        len(data), original_width, original_height,
+    )
+
+
+class Tile(NamedTuple):
+    """Wycinek obrazu: prostokąt (left, top, right, bottom) w pikselach oryginału i przygotowany obraz."""
+    box: tuple[int, int, int, int]
+    image: PreparedImage
+
+
+def _tile_starts(size: int, tile_size: int, overlap: int) -> list[int]:
+    if size <= tile_size:
+        return [0]
+    stride = max(1, tile_size - overlap)
+    starts = list(range(0, size - tile_size, stride))
+    # Ostatni wycinek dosunięty do krawędzi - bez wąskiego paska na końcu
+    return starts + [size - tile_size]
+
+
+def tile_boxes(width: int, height: int, tile_size: int = SHORT_SIDE, overlap: int = 128) -> list[tuple[int, int, int, int]]:
+    """Prostokąty wycinków `tile_size` x `tile_size` zachodzących na siebie o `overlap` pikseli, wierszami."""
+    return [
+        (left, top, min(width, left + tile_size), min(height, top + tile_size))
+        for top in _tile_starts(height, tile_size, overlap)
+        for left in _tile_starts(width, tile_size, overlap)
+    ]
+
+
+def is_blank(image: Image.Image, min_std: float = 6.0, min_edge_density: float = 0.005) -> bool:
+    """Czy wycinek jest prawie pusty: jednolity (małe odchylenie jasności) albo prawie bez krawędzi."""
+    gray = np.asarray(image.convert("L"), dtype=np.int16)
+    if gray.std() < min_std:
+        return True
+    edges = (np.abs(np.diff(gray, axis=0)) > 24).mean() + (np.abs(np.diff(gray, axis=1)) > 24).mean()
+    return edges / 2 < min_edge_density
+
+
+def prepare_tiles(
+    path: str | Path,
+    tile_size: int = SHORT_SIDE,
+    overlap: int = 128,
+    min_std: float = 6.0,
+    min_edge_density: float = 0.005,
+    **options,
+) -> tuple[list[Tile], int]:
+    """Tnie obraz na zachodzące na siebie wycinki w pełnej rozdzielczości i przygotowuje niepuste.
+
+    Wycinek nie większy niż `SHORT_SIDE` model widzi bez zmniejszania, więc drobny tekst zostaje
+    czytelny. Zwraca przygotowane wycinki i liczbę pominiętych jako puste.
+    """
+    options.setdefault("tile_slack", 0)
+    tiles = []
+    skipped = 0
+    with Image.open(path) as source:
+        image = ImageOps.exif_transpose(source)
+        for box in tile_boxes(image.width, image.height, tile_size, overlap):
+            crop = image.crop(box)
+            if is_blank(crop, min_std, min_edge_density):
+                skipped += 1
+                continue
+            buffer = io.BytesIO()
+            crop.save(buffer, format="PNG")
+            tiles.append(Tile(box, prepare_image_bytes(buffer.getvalue(), **options)))
+    return tiles, skipped
+
+
+def prepare_image(path: str | Path, cache_dir: Optional[str | Path] = DEFAULT_CACHE_DIR, **options) -> PreparedImage:
+    """Przygotowuje obraz z pliku; wynik jest zapisywany w `cache_dir` (klucz: skrót treści i parametrów)."""
+    data = Path(path).read_bytes()
+    if cache_dir is None:
+        return prepare_image_bytes(data, **options)
+
+    key = hashlib.sha256(data + repr((PREP_VERSION, sorted(options.items()))).encode()).hexdigest()
+    cached_path = Path(cache_dir) / f"{key}.bin"
+    if cached_path.exists():
+        cached = cached_path.read_bytes()
+        header, payload = cached.split(b"\n", 1)
+        mime_type, *sizes = header.decode().split(" ")
+        return PreparedImage(payload, mime_type, *map(int, sizes))
+
+    prepared = prepare_image_bytes(data, **options)
+    header = " ".join(str(value) for value in (prepared.mime_type, *prepared[2:])).encode()
+    cached_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = cached_path.with_name(cached_path.name + f".{os.getpid()}.tmp")
+    tmp_path.write_bytes(header + b"\n" + prepared.data)
+    os.replace(tmp_path, cached_path)
+    return prepared
+
+
+class ImagePreprocessor:
+    """Przygotowanie obrazów w puli procesów (zmiana rozmiaru i kompresja obciążają CPU).
+
+    with ImagePreprocessor() as prep:
+        url = prep.prepare("mapa.png").data_url()
+        prepared = await prep.prepare_async("raport.png")
+    """
+
+    def __init__(self, workers: Optional[int] = None, executor: Optional[Executor] = None, **options):
+        self.options = options
+        self._own_executor = executor is None
+        self.executor = executor or ProcessPoolExecutor(max_workers=workers or os.cpu_count() or 1)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        if self._own_executor:
+            self.executor.shutdown()
+
+    def prepare(self, path: str | Path) -> PreparedImage:
+        return self.executor.submit(prepare_image, str(path), **self.options).result()
+
+    def prepare_many(self, paths: list[str | Path]) -> list[PreparedImage]:
+        """Przygotowuje obrazy równolegle; wyniki w kolejności ścieżek."""
+        futures = [self.executor.submit(prepare_image, str(path), **self.options) for path in paths]
+        return [future.result() for future in futures]
+
+    async def prepare_async(self, path: str | Path) -> PreparedImage:
+        return await asyncio.wrap_future(self.executor.submit(prepare_image, str(path), **self.options))
+
+    async def prepare_tiles_async(self, path: str | Path, **tile_options) -> tuple[list[Tile], int]:
+        """Wycinki obrazu (`prepare_tiles`) przygotowane w puli procesów."""
+        options = {**self.options, **tile_options}
+        return await asyncio.wrap_future(self.executor.submit(prepare_tiles, str(path), **options))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Porównanie rozmiaru i kosztu obrazów przed i po przygotowaniu")
+    parser.add_argument("paths", nargs="+")
+    parser.add_argument("--max-kb", type=int, default=DEFAULT_MAX_BYTES // 1024)
+    parser.add_argument("--format", default="JPEG", choices=["JPEG", "WEBP"])
+    args = parser.parse_args()
+
+    total = {"before_kb": 0.0, "after_kb": 0.0, "before_tokens": 0, "after_tokens": 0}
+    print("plik | rozmiar | KB przed | KB po | tokeny przed | tokeny po")
+    for path in args.paths:
+        prepared = prepare_image(path, cache_dir=None, max_bytes=args.max_kb * 1024, image_format=args.format)
+        # Bez przygotowania obraz idzie w oryginale, a base64 powiększa go o 1/3
+        before_kb = prepared.original_bytes * 4 / 3 / 1024
+        after_kb = len(prepared.data) * 4 / 3 / 1024
+        total["before_kb"] += before_kb
+        total["after_kb"] += after_kb
+        total["before_tokens"] += prepared.original_tokens
+        total["after_tokens"] += prepared.tokens
+        print(
+            f"{Path(path).name} | {prepared.original_width}x{prepared.original_height} -> {prepared.width}x{prepared.height} | "
+            f"{before_kb:.0f} | {after_kb:.0f} | {prepared.original_tokens} | {prepared.tokens}"
+        )
+    if len(args.paths) > 1:
+        print(
+            f"razem | | {total['before_kb']:.0f} | {total['after_kb']:.0f} | "
+            f"{total['before_tokens']} | {total['after_tokens']}"
+        )
+
+
+if __name__ == "__main__":
+    sys.exit(main())
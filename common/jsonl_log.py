@@ -0,0 +1,67 @@
+import os
+import json
+import threading
+from pathlib import Path
+from typing import Iterable, Iterator
+
+
+class JsonlLog:
+    """Plik JSONL dopisywany linia po linii - wspólny zapis dla TranscriptStore, RunManifest i BlobStore.
+
+    Każdy wpis jest dopisywany jako osobna linia i od razu zapisywany na dysk (flush + fsync), więc
+    przerwanie skryptu nie traci zapisanych wpisów. Uszkodzona linia (np. ostatnia, urwana przy
+    awarii w trakcie zapisu) jest przy odczycie pomijana, a następny wpis zaczyna się od nowej linii.
+
+    log = JsonlLog("cache/index.jsonl")
+    entries = {entry["url"]: entry for entry in log.read()}  # przy powtórzeniach wygrywa ostatni wpis
+    log.append({"url": url, "sha256": sha256})
+    """
+
+    def __init__(self, path: str | Path):
+        self.path = Path(path)
+        # Liczba poprawnych linii w pliku (wczytanych i dopisanych)
+        self.lines = 0
+        self._lock = threading.Lock()
+        self._needs_newline = False
+
+    def read(self) -> Iterator[dict]:
+        """Wpisy z pliku w kolejności zapisu (pusty, jeśli pliku nie ma)."""
+        if not self.path.exists():
+            return
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                self._needs_newline = not line.endswith("\n")
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                self.lines += 1
+                yield entry
+
+    def append(self, entry: dict):
+        """Dopisuje wpis i od razu zapisuje go na dysk."""
+        line = json.dumps(entry, ensure_ascii=False) + "\n"
+        with self._lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, 'a', encoding='utf-8') as f:
+                if self._needs_newline:
+                    f.write("\n")
+                    self._needs_newline = False
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+            self.lines += 1
+
+    def rewrite(self, entries: Iterable[dict]):
+        """Zastępuje zawartość pliku podanymi wpisami (atomowo, przez plik tymczasowy)."""
+        entries = list(entries)
+        with self._lock:
+            tmp_path = self.path.with_name(self.path.name + ".tmp")
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                for entry in entries:
+                    f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+            self.lines = len(entries)
+            self._needs_newline = False
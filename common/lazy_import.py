@@ -0,0 +1,54 @@
+import sys
+import importlib
+import threading
+from types import ModuleType
+
+# Ciężkie zależności (numpy, Pillow, torch, whisper) wczytywane dopiero przy pierwszym użyciu.
+# Skrypt, który w danym uruchomieniu nie dotyka obrazów ani nagrań, nie płaci za ich import.
+
+
+class LazyModule(ModuleType):
+    """Zastępca modułu, który importuje właściwy moduł przy pierwszym odwołaniu do atrybutu.
+
+    Import odbywa się przez `importlib.import_module`, więc jest bezpieczny przy pierwszym użyciu
+    z kilku wątków naraz (np. z `asyncio.to_thread`).
+    """
+
+    def __init__(self, name: str):
+        super().__init__(name)
+        self.__dict__["_lazy_module"] = None
+        self.__dict__["_lazy_lock"] = threading.Lock()
+
+    def _load(self) -> ModuleType:
+        module = self.__dict__["_lazy_module"]
+        if module is None:
+            with self.__dict__["_lazy_lock"]:
+                module = self.__dict__["_lazy_module"]
+                if module is None:
+                    module = importlib.import_module(self.__name__)
+                    self.__dict__["_lazy_module"] = module
+        return module
+
+    def __getattr__(self, attr: str):
+        return getattr(self._load(), attr)
+
+    def __dir__(self):
+        return dir(self._load())
+
+    def __repr__(self) -> str:
+        state = "wczytany" if self.__dict__["_lazy_module"] is not None else "niewczytany"
+        return f"<leniwy moduł {self.__name__!r} ({state})>"
+
+
+def lazy_import(name: str) -> ModuleType:
+    """Moduł `name` importowany przy pierwszym użyciu; jeśli jest już wczytany, zwraca go od razu.
+
+    np = lazy_import("numpy")
+    Image = lazy_import("PIL.Image")
+    """
+    return sys.modules.get(name) or LazyModule(name)
+
+
+def is_loaded(name: str) -> bool:
+    """Czy moduł został już naprawdę zaimportowany (w tym procesie)."""
+    return name in sys.modules
@@ -0,0 +1,459 @@
+import os
+import re
+import time
+import random
+import asyncio
+import logging
+import threading
+from typing import Any, Optional
+
+import httpx
+from dotenv import load_dotenv
+
+from .completion_cache import CompletionCache, is_cacheable, make_cache_key
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+OPENAI_BASE_URL = "https://api.openai.com/v1"
+
+# Statusy, przy których warto ponowić zapytanie
+RETRY_STATUSES = {408, 409, 429, 500, 502, 503, 504}
+
+# Limity na minutę dla poszczególnych modeli (rpm - zapytania, tpm - tokeny; 0 oznacza brak limitu)
+DEFAULT_LIMITS = {
+    "gpt-4o": {"rpm": 500, "tpm": 30000},
+    "gpt-4o-mini": {"rpm": 500, "tpm": 200000},
+    "gpt-4": {"rpm": 500, "tpm": 10000},
+    "gpt-3.5-turbo": {"rpm": 500, "tpm": 200000},
+    "text-embedding-3-small": {"rpm": 3000, "tpm": 1000000},
+    "text-embedding-3-large": {"rpm": 3000, "tpm": 1000000},
+    "whisper-1": {"rpm": 50, "tpm": 0},
+    "dall-e-3": {"rpm": 5, "tpm": 0},
+}
+FALLBACK_LIMITS = {"rpm": 500, "tpm": 30000}
+
+
+class LLMGatewayError(Exception):
+    """Błąd zwracany po wyczerpaniu ponowień lub przy błędzie, którego nie warto ponawiać."""
+
+    def __init__(self, message: str, status_code: Optional[int] = None, body: str = ""):
+        super().__init__(message)
+        self.status_code = status_code
+        self.body = body
+
+
+class TokenBucket:
+    """Kubełek żetonów uzupełniany w sposób ciągły (pojemność na minutę).
+
+    Stan kubełka jest uzgadniany z limitami po stronie serwera (`observe`), a po odpowiedzi 429
+    wydawanie żetonów jest wstrzymywane dla wszystkich czekających zapytań naraz (`pause`).
+    """
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.refill_per_second = self.capacity / 60.0
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self.paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.refill_per_second)
+        self.updated_at = now
+
+    async def acquire(self, amount: float = 1.0):
+        """Czeka, aż w kubełku będzie co najmniej `amount` żetonów, i je pobiera."""
+        if self.capacity <= 0 and self.paused_until <= time.monotonic():
+            return
+        async with self._lock:
+            while True:
+                paused_for = self.paused_until - time.monotonic()
+                if paused_for > 0:
+                    await asyncio.sleep(paused_for)
+                    continue
+                if self.capacity <= 0:
+                    return
+                # Pojedyncze zapytanie większe niż cały kubełek czekałoby w nieskończoność
+                needed = min(amount, self.capacity)
+                self._refill()
+                if self.tokens >= needed:
+                    self.tokens -= needed
+                    return
+                await asyncio.sleep((needed - self.tokens) / self.refill_per_second)
+
+    def adjust(self, delta: float):
+        """Koryguje stan kubełka (np. o różnicę między szacowanym a rzeczywistym zużyciem tokenów)."""
+        if self.capacity <= 0:
+            return
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens + delta)
+
+    def pause(self, seconds: float):
+        """Wstrzymuje wydawanie żetonów na `seconds` sekund (np. po 429 z nagłówkiem `retry-after`)."""
+        if seconds > 0:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+    def observe(self, limit: Optional[float], remaining: float, reset_after: Optional[float] = None):
+        """Uzgadnia kubełek z nagłówkami `x-ratelimit-*` odpowiedzi.
+
+        Limit konta z nagłówka zastępuje domyślny z `DEFAULT_LIMITS` (w obie strony), a żetonów nie
+        może być więcej, niż serwerowi zostało. Przy wyczerpanym limicie kubełek czeka do resetu.
+        """
+        if limit and limit != self.capacity:
+            self._refill()
+            self.capacity = float(limit)
+            self.refill_per_second = self.capacity / 60.0
+        if self.capacity <= 0:
+            return
+        self._refill()
+        self.tokens = min(self.tokens, float(remaining))
+        if remaining < 1 and reset_after:
+            self.pause(reset_after)
+
+
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+
+
+def parse_duration(value: Optional[str]) -> Optional[float]:
+    """Czas w sekundach z nagłówków limitów: "20ms", "1.5s", "6m0s" albo sama liczba sekund."""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = _DURATION_PART.findall(value)
+    if not parts or "".join(number + unit for number, unit in parts) != value:
+        return None
+    scale = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+    return sum(float(number) * scale[unit] for number, unit in parts)
+
+
+def _header_number(headers: httpx.Headers, name: str) -> Optional[float]:
+    try:
+        return float(headers[name])
+    except (KeyError, ValueError):
+        return None
+
+
+def retry_after(headers: httpx.Headers) -> Optional[float]:
+    """Opóźnienie wskazane przez serwer (`retry-after-ms` albo `retry-after` w sekundach)."""
+    milliseconds = _header_number(headers, "retry-after-ms")
+    if milliseconds is not None:
+        return milliseconds / 1000
+    return _header_number(headers, "retry-after")
+
+
+def estimate_tokens(payload: dict) -> int:
+    """Zgrubnie szacuje liczbę tokenów zapytania (ok. 4 znaki na token + limit odpowiedzi)."""
+    chars = 0
+    for message in payload.get("messages", []):
+        content = message.get("content")
+        if isinstance(content, str):
+            chars += len(content)
+        elif isinstance(content, list):
+            for part in content:
+                if part.get("type") == "text":
+                    chars += len(part.get("text", ""))
+                else:
+                    # Obrazek w trybie high kosztuje co najmniej kilkaset tokenów
+                    chars += 4 * 765
+    embedding_input = payload.get("input")
+    if isinstance(embedding_input, str):
+        chars += len(embedding_input)
+    elif isinstance(embedding_input, list):
+        chars += sum(len(item) for item in embedding_input if isinstance(item, str))
+    return chars // 4 + int(payload.get("max_tokens") or 256)
+
+
+class LLMGateway:
+    """Asynchroniczna brama do API zgodnego z OpenAI.
+
+    Trzyma jedną pulę połączeń HTTP/2, pilnuje limitów zapytań i tokenów dla każdego modelu
+    (kubełki żetonów) i ponawia błędy 429/5xx z losowym opóźnieniem wykładniczym.
+    """
+
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        base_url: Optional[str] = None,
+        max_concurrency: int = 16,
+        max_retries: int = 6,
+        base_delay: float = 0.5,
+        max_delay: float = 30.0,
+        timeout: float = 120.0,
+        limits: Optional[dict] = None,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+        cache: Optional[CompletionCache] = None,
+        vision_cache=None,
+    ):
+        self.api_key = api_key or os.getenv("OPENAI_API_KEY")
+        if not self.api_key:
+            raise ValueError("Brak klucza API OpenAI w pliku .env")
+        self.base_url = (base_url or os.getenv("OPENAI_BASE_URL") or OPENAI_BASE_URL).rstrip("/")
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.limits = {**DEFAULT_LIMITS, **(limits or {})}
+        self.cache = cache
+        # Opcjonalny VisionCache (common/vision_cache.py): odpowiedzi dla wizualnie takich samych obrazów
+        self.vision_cache = vision_cache
+
+        self.client = httpx.AsyncClient(
+            http2=True,
+            timeout=timeout,
+            headers={"Authorization": f"Bearer {self.api_key}"},
+            limits=httpx.Limits(max_connections=max_concurrency, max_keepalive_connections=max_concurrency),
+            transport=transport,
+        )
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._buckets = {}
+        self.stats = {"requests": 0, "retries": 0, "errors": 0, "prompt_tokens": 0, "completion_tokens": 0}
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+    async def aclose(self):
+        await self.client.aclose()
+
+    def _buckets_for(self, model: str) -> tuple[TokenBucket, TokenBucket]:
+        if model not in self._buckets:
+            limits = self.limits.get(model, FALLBACK_LIMITS)
+            self._buckets[model] = (TokenBucket(limits["rpm"]), TokenBucket(limits["tpm"]))
+        return self._buckets[model]
+
+    def _observe_limits(self, model: str, headers: httpx.Headers):
+        """Przenosi stan limitów z nagłówków odpowiedzi (`x-ratelimit-*`) do kubełków modelu."""
+        for bucket, kind in zip(self._buckets_for(model), ("requests", "tokens")):
+            remaining = _header_number(headers, f"x-ratelimit-remaining-{kind}")
+            if remaining is not None:
+                bucket.observe(
+                    _header_number(headers, f"x-ratelimit-limit-{kind}"),
+                    remaining,
+                    parse_duration(headers.get(f"x-ratelimit-reset-{kind}")),
+                )
+
+    def _backoff(self, attempt: int, server_delay: Optional[float] = None) -> float:
+        if server_delay is not None:
+            return server_delay
+        # Pełny jitter: losowe opóźnienie z przedziału [0, base * 2^attempt]
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    async def request(self, path: str, model: str, estimated_tokens: int = 0, **kwargs) -> httpx.Response:
+        """Wysyła zapytanie z limitowaniem i ponowieniami. Zwraca odpowiedź z kodem 2xx."""
+        request_bucket, token_bucket = self._buckets_for(model)
+        url = f"{self.base_url}{path}"
+
+        for attempt in range(self.max_retries + 1):
+            await request_bucket.acquire(1)
+            await token_bucket.acquire(estimated_tokens)
+            try:
+                async with self._semaphore:
+                    self.stats["requests"] += 1
+                    response = await self.client.post(url, **kwargs)
+            except (httpx.TimeoutException, httpx.TransportError) as e:
+                if attempt >= self.max_retries:
+                    self.stats["errors"] += 1
+                    raise LLMGatewayError(f"Błąd sieciowy dla {path}: {e}") from e
+                wait_time = self._backoff(attempt)
+                logger.warning(f"Błąd sieciowy ({model}): {e}. Czekam {wait_time:.2f}s...")
+            else:
+                self._observe_limits(model, response.headers)
+                if response.status_code < 400:
+                    return response
+                if response.status_code not in RETRY_STATUSES or attempt >= self.max_retries:
+                    self.stats["errors"] += 1
+                    raise LLMGatewayError(
+                        f"Błąd HTTP {response.status_code} dla {path}",
+                        status_code=response.status_code,
+                        body=response.text,
+                    )
+                wait_time = self._backoff(attempt, retry_after(response.headers))
+                logger.warning(f"Błąd {response.status_code} ({model}). Czekam {wait_time:.2f}s...")
+                if response.status_code == 429:
+                    # Limit dotyczy całego modelu: wstrzymujemy jego kubełek, więc czekają też pozostałe zapytania
+                    request_bucket.pause(wait_time)
+                    wait_time = 0
+
+            self.stats["retries"] += 1
+            await asyncio.sleep(wait_time)
+
+        raise LLMGatewayError(f"Nie udało się wykonać zapytania {path} po {self.max_retries} ponowieniach")
+
+    async def _cache_get(self, endpoint: str, payload: dict):
+        if self.cache is None or not is_cacheable(payload):
+            return None, None
+        key = make_cache_key(endpoint, payload)
+        return key, await asyncio.to_thread(self.cache.get, key)
+
+    async def _cache_set(self, key: Optional[str], value):
+        if key is not None:
+            await asyncio.to_thread(self.cache.set, key, value)
+
+    async def _vision_cache_get(self, payload: dict):
+        if self.vision_cache is None or not is_cacheable(payload):
+            return None, None
+        key = await asyncio.to_thread(self.vision_cache.key_for, "/chat/completions", payload)
+        if key is None:
+            return None, None
+        return key, await asyncio.to_thread(self.vision_cache.get, key)
+
+    async def chat(self, payload: dict) -> dict:
+        """Wywołuje /chat/completions i zwraca pełną odpowiedź JSON."""
+        key, cached = await self._cache_get("/chat/completions", payload)
+        if cached is not None:
+            return cached
+        # Ten sam obraz po ponownej kompresji lub zmianie rozmiaru ma inne bajty, ale tę samą odpowiedź
+        vision_key, cached = await self._vision_cache_get(payload)
+        if cached is not None:
+            await self._cache_set(key, cached)
+            return cached
+
+        estimated = estimate_tokens(payload)
+        response = await self.request("/chat/completions", payload["model"], estimated, json=payload)
+        data = response.json()
+        await self._cache_set(key, data)
+        if vision_key is not None:
+            await asyncio.to_thread(self.vision_cache.set, vision_key, data)
+
+        usage = data.get("usage") or {}
+        if usage:
+            self.stats["prompt_tokens"] += usage.get("prompt_tokens", 0)
+            self.stats["completion_tokens"] += usage.get("completion_tokens", 0)
+            # Oddaj do kubełka to, czego faktycznie nie zużyliśmy (albo dobierz niedoszacowanie);
+            # gdy serwer podał stan limitu tokenów, kubełek jest już z nim uzgodniony
+            if "x-ratelimit-remaining-tokens" not in response.headers:
+                _, token_bucket = self._buckets_for(payload["model"])
+                token_bucket.adjust(estimated - usage.get("total_tokens", estimated))
+        return data
+
+    async def chat_text(self, payload: dict) -> str:
+        """Wywołuje /chat/completions i zwraca samą treść odpowiedzi."""
+        data = await self.chat(payload)
+        return data["choices"][0]["message"]["content"].strip()
+
+    async def chat_text_many(self, payloads: list[dict]) -> list:
+        """Wysyła wiele zapytań równolegle; błędy zwraca w miejscu wyniku zamiast przerywać całość."""
+        return await asyncio.gather(*(self.chat_text(payload) for payload in payloads), return_exceptions=True)
+
+    async def embeddings(self, input_text, model: str = "text-embedding-3-small") -> list:
+        """Zwraca embedding (dla stringa) albo listę embeddingów (dla listy stringów)."""
+        payload = {"model": model, "input": input_text}
+        key, vectors = await self._cache_get("/embeddings", payload)
+        if vectors is None:
+            response = await self.request("/embeddings", model, estimate_tokens(payload), json=payload)
+            vectors = [item["embedding"] for item in sorted(response.json()["data"], key=lambda item: item["index"])]
+            await self._cache_set(key, vectors)
+        return vectors[0] if isinstance(input_text, str) else vectors
+
+    async def embeddings_many(self, texts: list[str], model: str = "text-embedding-3-small", batch_size: int = 256) -> list:
+        """Embeddingi wielu tekstów, w kolejności; cache działa dla każdego tekstu osobno.
+
+        Do API trafiają tylko teksty, których nie ma w cache, paczkami po `batch_size`, więc
+        zmiana jednego fragmentu dokumentu nie wymusza ponownego liczenia pozostałych.
+        """
+        vectors: list = [None] * len(texts)
+        keys: list = [None] * len(texts)
+        if self.cache is not None:
+            for i, text in enumerate(texts):
+                # Ten sam klucz i format wpisu co `embeddings(text)`: lista z jednym wektorem
+                keys[i], cached = await self._cache_get("/embeddings", {"model": model, "input": text})
+                vectors[i] = cached[0] if cached else None
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+
+        async def embed_batch(batch: list[int]):
+            payload = {"model": model, "input": [texts[i] for i in batch]}
+            response = await self.request("/embeddings", model, estimate_tokens(payload), json=payload)
+            for item in response.json()["data"]:
+                i = batch[item["index"]]
+                vectors[i] = item["embedding"]
+                await self._cache_set(keys[i], [vectors[i]])
+
+        await asyncio.gather(*(
+            embed_batch(missing[start:start + batch_size]) for start in range(0, len(missing), batch_size)
+        ))
+        return vectors
+
+    async def transcribe(
+        self,
+        filename: str,
+        audio: bytes,
+        model: str = "whisper-1",
+        language: Optional[str] = None,
+        response_format: str = "json",
+        **extra: Any,
+    ):
+        """Transkrybuje nagranie przez /audio/transcriptions. Dla formatów JSON zwraca słownik."""
+        data = {"model": model, "response_format": response_format, **extra}
+        if language:
+            data["language"] = language
+        response = await self.request(
+            "/audio/transcriptions", model, data=data, files={"file": (filename, audio)}
+        )
+        if response_format in ("json", "verbose_json"):
+            return response.json()
+        return response.text
+
+
+class SyncLLMGateway:
+    """Synchroniczna fasada nad LLMGateway dla starszych skryptów.
+
+    Pętla zdarzeń działa w osobnym wątku, więc wszystkie wywołania współdzielą jedną pulę połączeń
+    i jedne limity, także gdy skrypt woła bramę z wielu wątków.
+    """
+
+    def __init__(self, **kwargs):
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="llm-gateway", daemon=True)
+        self._thread.start()
+        self.gateway = self._run(self._create(kwargs))
+
+    @staticmethod
+    async def _create(kwargs: dict) -> LLMGateway:
+        return LLMGateway(**kwargs)
+
+    def _run(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result()
+
+    def run(self, coro):
+        """Wykonuje korutynę w pętli bramy i zwraca jej wynik.
+
+        Pozwala asynchronicznej części skryptu korzystać z tej samej bramy (`self.gateway`), a więc
+        z tych samych limitów i puli połączeń, co wywołania synchroniczne.
+        """
+        return self._run(coro)
+
+    @property
+    def stats(self) -> dict:
+        return self.gateway.stats
+
+    def chat(self, payload: dict) -> dict:
+        return self._run(self.gateway.chat(payload))
+
+    def chat_text(self, payload: dict) -> str:
+        return self._run(self.gateway.chat_text(payload))
+
+    def chat_text_many(self, payloads: list[dict]) -> list:
+        return self._run(self.gateway.chat_text_many(payloads))
+
+    def embeddings(self, input_text, model: str = "text-embedding-3-small") -> list:
+        return self._run(self.gateway.embeddings(input_text, model))
+
+    def embeddings_many(self, texts: list[str], model: str = "text-embedding-3-small", batch_size: int = 256) -> list:
+        return self._run(self.gateway.embeddings_many(texts, model, batch_size))
+
+    def transcribe(self, filename: str, audio: bytes, **kwargs):
+        return self._run(self.gateway.transcribe(filename, audio, **kwargs))
+
+    def close(self):
+        if self._loop.is_running():
+            self._run(self.gateway.aclose())
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(timeout=5)
@@ -0,0 +1,75 @@
+import re
+import json
+from typing import Iterable, Optional
+
+# Pakowanie wielu krótkich dokumentów do jednego zapytania: dokumenty dostają numery,
+# a model zwraca obiekt JSON {numer: odpowiedź}. Odpowiedzi, które nie przejdą walidacji,
+# wywołujący ponawia pojedynczymi zapytaniami.
+
+
+def estimate_text_tokens(text: str) -> int:
+    """Zgrubna liczba tokenów tekstu (ok. 4 znaki na token, jak w LLMGateway)."""
+    return len(text) // 4 + 1
+
+
+def pack_items(
+    items: Iterable[tuple[str, str]],
+    token_budget: int,
+    max_items: int = 25,
+    overhead_tokens: int = 0,
+) -> list[list[tuple[str, str]]]:
+    """Dzieli pary (id, tekst) na paczki mieszczące się w `token_budget` tokenach.
+
+    Kolejność jest zachowana. `overhead_tokens` to stały koszt paczki (instrukcja), a każdy
+    dokument kosztuje swoje tokeny plus nagłówek z numerem. Dokument większy niż cały budżet
+    trafia do osobnej, jednoelementowej paczki.
+    """
+    packs = []
+    current = []
+    used = overhead_tokens
+    for item_id, text in items:
+        cost = estimate_text_tokens(text) + 4
+        if current and (used + cost > token_budget or len(current) >= max_items):
+            packs.append(current)
+            current = []
+            used = overhead_tokens
+        current.append((item_id, text))
+        used += cost
+    if current:
+        packs.append(current)
+    return packs
+
+
+def render_numbered(texts: list[str]) -> str:
+    """Dokumenty z nagłówkami [1], [2], ... do wstawienia w treść zapytania."""
+    return "\n\n".join(f"[{i}]\n{text.strip()}" for i, text in enumerate(texts, start=1))
+
+
+def parse_id_mapping(answer: str, count: int, allowed: set[str]) -> tuple[dict[int, str], list[int]]:
+    """Waliduje odpowiedź {"1": "kategoria", ...} dla dokumentów o numerach 1..count.
+
+    Zwraca poprawne przypisania (numer -> kategoria małymi literami) oraz numery, które trzeba
+    sklasyfikować osobno: brakujące, z kategorią spoza `allowed` albo wszystkie, jeśli odpowiedź
+    nie jest obiektem JSON.
+    """
+    mapping = _load_json_object(answer)
+    valid = {}
+    if mapping is not None:
+        for key, value in mapping.items():
+            try:
+                number = int(str(key).strip().strip("[]"))
+            except ValueError:
+                continue
+            if 1 <= number <= count and isinstance(value, str) and value.strip().lower() in allowed:
+                valid[number] = value.strip().lower()
+    return valid, [number for number in range(1, count + 1) if number not in valid]
+
+
+def _load_json_object(answer: str) -> Optional[dict]:
+    # Model czasem otacza JSON blokiem ```json ... ```
+    text = re.sub(r"^```(?:json)?\s*|\s*```$", "", answer.strip())
+    try:
+        data = json.loads(text)
+    except json.JSONDecodeError:
+        return None
+    return data if isinstance(data, dict) else None
@@ -0,0 +1,100 @@
+from __future__ import annotations
+
+import re
+from typing import NamedTuple
+
+from .lazy_import import lazy_import
+
+# Wyszukiwanie fragmentów dokumentu do pytania: dokument jest dzielony na fragmenty, fragmenty
+# dostają embeddingi (raz, z cache bramy), a do zapytania trafia tylko `k` najbliższych pytaniu.
+
+np = lazy_import("numpy")
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+
+class Chunk(NamedTuple):
+    """Fragment dokumentu i jego źródło (np. "tekst", "obraz: wykres.png")."""
+    text: str
+    source: str
+
+
+def _split_long(paragraph: str, max_chars: int, overlap: int) -> list[str]:
+    """Akapit dłuższy niż `max_chars` dzielony na zdania, a zbyt długie zdanie - na zachodzące okna."""
+    if len(paragraph) <= max_chars:
+        return [paragraph]
+    pieces = []
+    for sentence in _SENTENCE_END.split(paragraph):
+        if len(sentence) <= max_chars:
+            pieces.append(sentence)
+            continue
+        step = max(1, max_chars - overlap)
+        pieces.extend(sentence[start:start + max_chars] for start in range(0, len(sentence) - overlap, step))
+
+    windows = []
+    current = ""
+    for piece in pieces:
+        if current and len(current) + 1 + len(piece) > max_chars:
+            windows.append(current)
+            # Kontekst z końca poprzedniego okna (ostatnie zdanie, jeśli jest krótkie)
+            tail = _SENTENCE_END.split(current)[-1]
+            current = tail if len(tail) <= overlap and len(tail) + 1 + len(piece) <= max_chars else ""
+        current = f"{current} {piece}" if current else piece
+    if current:
+        windows.append(current)
+    return windows
+
+
+def split_text(text: str, max_chars: int = 1200, overlap: int = 200) -> list[str]:
+    """Dzieli tekst na fragmenty najwyżej `max_chars` znaków, granicami akapitów, a w długich
+    akapitach - zdań (z zakładką `overlap` znaków)."""
+    paragraphs = [" ".join(p.split()) for p in re.split(r"\n\s*\n", text)]
+    chunks = []
+    current = ""
+    for paragraph in filter(None, paragraphs):
+        for piece in _split_long(paragraph, max_chars, overlap):
+            if current and len(current) + 2 + len(piece) > max_chars:
+                chunks.append(current)
+                current = ""
+            current = f"{current}\n\n{piece}" if current else piece
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+class EmbeddingIndex:
+    """Fragmenty z embeddingami i wyszukiwanie `k` najbliższych (podobieństwo kosinusowe).
+
+    index = await EmbeddingIndex.build(gateway, chunks)
+    for chunk, score in index.search(await gateway.embeddings(pytanie), k=5):
+        ...
+    """
+
+    def __init__(self, chunks: list[Chunk], vectors: list[list[float]]):
+        self.chunks = chunks
+        if chunks:
+            matrix = np.asarray(vectors, dtype=np.float32).reshape(len(chunks), -1)
+        else:
+            # Pusty indeks (np. dokument bez tekstu) to macierz bez wierszy - `search` zwraca wtedy []
+            matrix = np.zeros((0, 0), dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        self.matrix = matrix / np.maximum(norms, 1e-12)
+
+    @classmethod
+    async def build(cls, gateway, chunks: list[Chunk], model: str = "text-embedding-3-small") -> EmbeddingIndex:
+        """Liczy embeddingi fragmentów przez bramę (`embeddings_many`: cache dla każdego fragmentu osobno)."""
+        return cls(chunks, await gateway.embeddings_many([chunk.text for chunk in chunks], model))
+
+    def __len__(self) -> int:
+        return len(self.chunks)
+
+    def search(self, query_vector: list[float], k: int = 5) -> list[tuple[Chunk, float]]:
+        """`k` fragmentów najbliższych zapytaniu, od najbliższego, z podobieństwem kosinusowym."""
+        if not self.chunks:
+            return []
+        query = np.asarray(query_vector, dtype=np.float32)
+        scores = self.matrix @ (query / max(float(np.linalg.norm(query)), 1e-12))
+        k = min(k, len(self.chunks))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(self.chunks[i], float(scores[i])) for i in top]
@@ -0,0 +1,64 @@
+import os
+from pathlib import Path
+from typing import NamedTuple, Optional
+
+from .jsonl_log import JsonlLog
+from .transcript_store import sha256_file
+
+
+class FileFingerprint(NamedTuple):
+    sha256: str
+    size: int
+    mtime_ns: int
+
+
+class RunManifest:
+    """Manifest przetworzonych plików w JSONL: ścieżka -> skrót treści i wynik (np. kategoria, model, wersja promptu).
+
+    Każdy wynik jest dopisywany jako osobna linia zaraz po otrzymaniu; przy wczytywaniu wygrywa
+    ostatni wpis dla danej ścieżki. Kolejne uruchomienie przetwarza tylko pliki nowe, zmienione
+    albo przetworzone innym modelem lub wersją promptu. Plik o niezmienionym rozmiarze i czasie
+    modyfikacji nie jest ponownie haszowany.
+    """
+
+    def __init__(self, path: str | Path):
+        self.path = Path(path)
+        self.log = JsonlLog(self.path)
+        self.entries: dict[str, dict] = {entry["path"]: entry for entry in self.log.read()}
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    @property
+    def lines(self) -> int:
+        """Liczba linii w pliku (z nadpisanymi wpisami) - podstawa decyzji o `compact`."""
+        return self.log.lines
+
+    def fingerprint(self, file_path: str | Path) -> FileFingerprint:
+        """Skrót treści pliku; jeśli rozmiar i czas modyfikacji są jak w manifeście, bierze skrót z manifestu."""
+        stat = os.stat(file_path)
+        entry = self.entries.get(str(file_path))
+        if entry and entry.get("size") == stat.st_size and entry.get("mtime_ns") == stat.st_mtime_ns:
+            return FileFingerprint(entry["sha256"], stat.st_size, stat.st_mtime_ns)
+        return FileFingerprint(sha256_file(file_path), stat.st_size, stat.st_mtime_ns)
+
+    def get(self, file_path: str | Path, fingerprint: FileFingerprint, **expected) -> Optional[dict]:
+        """Wpis dla pliku, jeśli treść się nie zmieniła, a pola z `expected` (np. model) się zgadzają."""
+        entry = self.entries.get(str(file_path))
+        if entry is None or entry["sha256"] != fingerprint.sha256:
+            return None
+        if any(entry.get(key) != value for key, value in expected.items()):
+            return None
+        return entry
+
+    def record(self, file_path: str | Path, fingerprint: FileFingerprint, **fields):
+        """Dopisuje wynik dla pliku i od razu zapisuje go na dysk."""
+        entry = {"path": str(file_path), **fingerprint._asdict(), **fields}
+        self.log.append(entry)
+        self.entries[entry["path"]] = entry
+
+    def compact(self, keep: Optional[set[str]] = None):
+        """Przepisuje manifest bez nadpisanych wpisów (i bez ścieżek spoza `keep`, jeśli podano)."""
+        if keep is not None:
+            self.entries = {path: entry for path, entry in self.entries.items() if path in keep}
+        self.log.rewrite(self.entries.values())
@@ -0,0 +1,79 @@
+import os
+import re
+import sys
+import argparse
+import subprocess
+import importlib.util
+from pathlib import Path
+
+import uvicorn
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+from common.async_logging import start_log_server
+
+# Produkcyjne uruchamianie serwerów FastAPI z zadań (np. S04E04_API_creation/server.py):
+# kilka workerów uvicorn (albo gunicorn z workerami uvicorn), uvloop + httptools,
+# a logi wszystkich workerów zbiera i zapisuje do jednego pliku ten proces.
+
+
+def pick_loop() -> str:
+    # uvloop nie działa na Windows - wtedy zostaje zwykła pętla asyncio
+    return "uvloop" if importlib.util.find_spec("uvloop") else "asyncio"
+
+
+def pick_http() -> str:
+    return "httptools" if importlib.util.find_spec("httptools") else "h11"
+
+
+def default_log_name(server_path: Path) -> str:
+    """Nazwa logów, której serwer używa sam (`setup_logging("dron", ...)`), żeby przy workerach
+    logi trafiały do tego samego pliku co przy zwykłym uruchomieniu; inaczej nazwa pliku serwera."""
+    match = re.search(r"""setup_logging\(\s*["']([^"']+)["']""", server_path.read_text(encoding="utf-8"))
+    return match.group(1) if match else server_path.stem
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Uruchamia serwer FastAPI z wieloma workerami")
+    parser.add_argument("server", help="Ścieżka do pliku serwera, np. S04E04_API_creation/server.py")
+    parser.add_argument("--app", default="app", help="Nazwa obiektu aplikacji w pliku serwera")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=3000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--log-name", help="Nazwa pliku logów w katalogu logs/ obok serwera (domyślnie ta z setup_logging w pliku serwera)")
+    parser.add_argument("--gunicorn", action="store_true", help="Użyj gunicorn jako menedżera procesów (tylko Linux/macOS)")
+    args = parser.parse_args()
+
+    server_path = Path(args.server).resolve()
+    app_dir = str(server_path.parent)
+    app_import = f"{server_path.stem}:{args.app}"
+
+    log_name = args.log_name or default_log_name(server_path)
+    log_file, log_port = start_log_server(log_name, os.path.join(app_dir, "logs"))
+    os.environ["LOG_SERVER"] = f"127.0.0.1:{log_port}"
+    print(f"\nLogi wszystkich workerów są zapisywane do pliku: {log_file}\n")
+
+    if args.gunicorn:
+        subprocess.run([
+            sys.executable, "-m", "gunicorn", app_import,
+            "--chdir", app_dir,
+            "--workers", str(args.workers),
+            "--worker-class", "uvicorn.workers.UvicornWorker",
+            "--bind", f"{args.host}:{args.port}",
+        ], check=True)
+        return
+
+    uvicorn.run(
+        app_import,
+        app_dir=app_dir,
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        loop=pick_loop(),
+        http=pick_http(),
+        # Żądania logują serwery same; log dostępu uvicorn pisze synchronicznie na konsolę
+        access_log=False,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+import logging
+import socket
+import sys
+import tempfile
+import time
+import unittest
+from pathlib import Path
+
+from common.async_logging import JSONSocketHandler, setup_logging, shutdown_logging, start_log_server, log_sampling
+
+
+class TestAsyncLogging(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        root = logging.getLogger()
+        self.saved = (root.handlers[:], root.level)
+        self.logger = logging.getLogger("test_async_logging")
+
+    def tearDown(self):
+        shutdown_logging()
+        root = logging.getLogger()
+        root.handlers[:], level = self.saved
+        root.setLevel(level)
+        self.tmp.cleanup()
+
+    def test_writes_all_records_in_order_after_shutdown(self):
+        log_file = setup_logging("test", self.tmp.name, console=False)
+        for i in range(1000):
+            self.logger.info(f"wpis {i}")
+        shutdown_logging()
+        lines = Path(log_file).read_text(encoding="utf-8").splitlines()
+        self.assertEqual(len(lines), 1000)
+        self.assertTrue(lines[0].endswith("INFO - wpis 0"))
+        self.assertTrue(lines[-1].endswith("INFO - wpis 999"))
+
+    def test_rotates_by_size(self):
+        setup_logging("test", self.tmp.name, max_bytes=2000, backup_count=3, console=False)
+        for i in range(200):
+            self.logger.info(f"wpis {i}")
+        shutdown_logging()
+        files = sorted(p.name for p in Path(self.tmp.name).iterdir())
+        self.assertEqual(files, ["test.log", "test.log.1", "test.log.2", "test.log.3"])
+        self.assertLessEqual(Path(self.tmp.name, "test.log.1").stat().st_size, 2000)
+
+    def test_unsampled_request_keeps_only_warnings(self):
+        log_file = setup_logging("test", self.tmp.name, console=False)
+        with log_sampling(0.0) as sampled:
+            self.assertFalse(sampled)
+            self.logger.info("pominięty")
+            self.logger.warning("ostrzeżenie")
+        with log_sampling(1.0):
+            self.logger.info("zapisany")
+        shutdown_logging()
+        content = Path(log_file).read_text(encoding="utf-8")
+        self.assertNotIn("pominięty", content)
+        self.assertIn("ostrzeżenie", content)
+        self.assertIn("zapisany", content)
+
+    def test_log_server_receives_json_records(self):
+        log_file, port = start_log_server("test", self.tmp.name, console=False)
+        handler = JSONSocketHandler("127.0.0.1", port)
+        worker = logging.getLogger("worker")
+        try:
+            raise ValueError("zły ruch")
+        except ValueError:
+            record = worker.makeRecord("worker", logging.ERROR, __file__, 1, "błąd %s", ("drona",), sys.exc_info())
+        # Bajty na gnieździe to JSON, a nie pickle
+        self.assertIn(b'"msg": "b', handler.makePickle(record))
+        handler.handle(record)
+        handler.close()
+        time.sleep(0.3)
+        shutdown_logging()
+        content = Path(log_file).read_text(encoding="utf-8")
+        self.assertIn("ERROR - błąd drona", content)
+        self.assertIn("ValueError: zły ruch", content)
+
+    def test_log_server_ignores_garbage(self):
+        log_file, port = start_log_server("test", self.tmp.name, console=False)
+        with socket.create_connection(("127.0.0.1", port)) as sock:
+            sock.sendall(b"\x00\x00\x00\x05cos(x")
+        time.sleep(0.2)
+        shutdown_logging()
+        self.assertEqual(Path(log_file).read_text(encoding="utf-8"), "")
+
+
+if __name__ == "__main__":
+    unittest.main()
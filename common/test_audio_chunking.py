@@ -0,0 +1,84 @@
+import io
+import wave
+import asyncio
+import unittest
+
+import httpx
+import numpy as np
+
+from common.audio_chunking import SAMPLE_RATE, find_silences, split_on_silence, stitch_transcripts, to_wav_bytes, transcribe_long_audio_api
+from common.llm_gateway import LLMGateway
+
+
+def speech_with_pauses(speech_seconds: list[float], pause_seconds: float = 1.0) -> np.ndarray:
+    """Sygnał testowy: odcinki "mowy" (szum) przedzielone ciszą."""
+    rng = np.random.default_rng(0)
+    parts = []
+    for seconds in speech_seconds:
+        parts.append(rng.uniform(-0.5, 0.5, int(seconds * SAMPLE_RATE)).astype(np.float32))
+        parts.append(np.zeros(int(pause_seconds * SAMPLE_RATE), dtype=np.float32))
+    return np.concatenate(parts)
+
+
+class TestAudioChunking(unittest.TestCase):
+    def test_finds_silences(self):
+        samples = speech_with_pauses([2, 3])
+        silences = find_silences(samples)
+        self.assertEqual(len(silences), 2)
+        start, end = silences[0]
+        self.assertAlmostEqual(start / SAMPLE_RATE, 2.0, delta=0.05)
+        self.assertAlmostEqual(end / SAMPLE_RATE, 3.0, delta=0.05)
+
+    def test_cuts_inside_silences_within_limit(self):
+        samples = speech_with_pauses([25, 25, 25, 25])
+        chunks = split_on_silence(samples, max_chunk_seconds=60)
+        self.assertEqual(chunks[0].start, 0)
+        self.assertEqual(chunks[-1].end, len(samples))
+        for previous, chunk in zip(chunks, chunks[1:]):
+            self.assertEqual(previous.end, chunk.start)
+        for chunk in chunks:
+            self.assertLessEqual(chunk.end - chunk.start, 60 * SAMPLE_RATE)
+        for chunk in chunks[:-1]:
+            self.assertLess(np.abs(samples[chunk.end - 100:chunk.end + 100]).max(), 1e-6)
+
+    def test_hard_cut_without_silence(self):
+        samples = speech_with_pauses([130], pause_seconds=0)
+        chunks = split_on_silence(samples, max_chunk_seconds=60)
+        self.assertEqual([c.end - c.start for c in chunks], [60 * SAMPLE_RATE, 60 * SAMPLE_RATE, 10 * SAMPLE_RATE])
+
+    def test_wav_encoding(self):
+        with wave.open(io.BytesIO(to_wav_bytes(np.zeros(SAMPLE_RATE, dtype=np.float32)))) as wav:
+            self.assertEqual((wav.getnchannels(), wav.getframerate(), wav.getnframes()), (1, SAMPLE_RATE, SAMPLE_RATE))
+
+    def test_stitch_offsets_segments(self):
+        result = stitch_transcripts([
+            (60.0, {"text": " drugi", "segments": [{"id": 0, "start": 1.0, "end": 2.5, "text": "drugi"}]}),
+            (0.0, {"text": "pierwszy ", "segments": [{"id": 0, "start": 0.0, "end": 1.0, "text": "pierwszy"}]}),
+        ])
+        self.assertEqual(result["text"], "pierwszy drugi")
+        self.assertEqual([(s["id"], s["start"], s["end"]) for s in result["segments"]], [(0, 0.0, 1.0), (1, 61.0, 62.5)])
+
+    def test_api_chunks_are_sent_concurrently(self):
+        samples = speech_with_pauses([25, 25, 25, 25])
+        active = {"now": 0, "max": 0}
+
+        async def handler(request: httpx.Request) -> httpx.Response:
+            active["now"] += 1
+            active["max"] = max(active["max"], active["now"])
+            await asyncio.sleep(0.05)
+            active["now"] -= 1
+            return httpx.Response(200, json={"text": "fragment", "segments": [{"id": 0, "start": 0.0, "end": 5.0, "text": "fragment"}]})
+
+        async def run():
+            async with LLMGateway(api_key="test", transport=httpx.MockTransport(handler)) as gateway:
+                return await transcribe_long_audio_api(gateway, "nagranie.m4a", max_chunk_seconds=60, samples=samples)
+
+        result = asyncio.run(run())
+        chunks = split_on_silence(samples, max_chunk_seconds=60)
+        self.assertEqual(len(result["segments"]), len(chunks))
+        self.assertEqual(result["segments"][1]["start"], round(chunks[1].start / SAMPLE_RATE, 3))
+        self.assertEqual(active["max"], len(chunks))
+
+
+if __name__ == "__main__":
+    unittest.main()
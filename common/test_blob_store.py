@@ -0,0 +1,110 @@
+import asyncio
+import hashlib
+import tempfile
+import unittest
+from pathlib import Path
+
+import httpx
+
+from common.blob_store import BlobStore
+
+CONTENT = bytes(range(256)) * 1000
+
+
+class BrokenStream(httpx.SyncByteStream):
+    """Treść urywająca się po `limit` bajtach, jak przy zerwanym połączeniu."""
+
+    def __init__(self, data: bytes, limit: int):
+        self.data = data
+        self.limit = limit
+
+    def __iter__(self):
+        yield self.data[:self.limit]
+        raise httpx.ReadError("połączenie zerwane")
+
+
+def file_server(files: dict[str, bytes], requests: list, break_after: int = 0):
+    """Handler MockTransport z ETag, zapytaniami warunkowymi i zakresami (Range/If-Range)."""
+    def handler(request):
+        requests.append(request)
+        data = files[request.url.path]
+        etag = f'"{hashlib.md5(data).hexdigest()}"'
+        if request.headers.get("if-none-match") == etag:
+            return httpx.Response(304, headers={"etag": etag})
+        headers = {"etag": etag, "content-type": "application/octet-stream"}
+        range_header = request.headers.get("range")
+        if range_header and request.headers.get("if-range") == etag:
+            start = int(range_header.split("=")[1].rstrip("-"))
+            headers["content-range"] = f"bytes {start}-{len(data) - 1}/{len(data)}"
+            return httpx.Response(206, headers=headers, content=data[start:])
+        if break_after and len(requests) == 1:
+            headers["content-length"] = str(len(data))
+            return httpx.Response(200, headers=headers, stream=BrokenStream(data, break_after))
+        return httpx.Response(200, headers=headers, content=data)
+    return handler
+
+
+class TestBlobStore(unittest.TestCase):
+    def test_content_addressed_paths(self):
+        files = {"/a/img.png": b"pierwszy", "/b/img.png": b"drugi", "/c/kopia.png": b"pierwszy"}
+        with tempfile.TemporaryDirectory() as tmp, httpx.Client(transport=httpx.MockTransport(file_server(files, []))) as client:
+            store = BlobStore(Path(tmp) / "blobs")
+            first, second, copy = (store.fetch(client, f"https://example.com{path}") for path in files)
+            self.assertNotEqual(first.path, second.path)
+            self.assertEqual(first.path, copy.path)
+            self.assertEqual(first.path.read_bytes(), b"pierwszy")
+            self.assertEqual(first.sha256, hashlib.sha256(b"pierwszy").hexdigest())
+            # Indeks przetrwa ponowne utworzenie magazynu
+            self.assertEqual(BlobStore(Path(tmp) / "blobs").path_for("https://example.com/b/img.png"), second.path)
+
+    def test_revalidation_skips_unchanged_content(self):
+        requests = []
+        files = {"/nagranie.mp3": CONTENT}
+        with tempfile.TemporaryDirectory() as tmp, httpx.Client(transport=httpx.MockTransport(file_server(files, requests))) as client:
+            store = BlobStore(tmp)
+            self.assertFalse(store.fetch(client, "https://example.com/nagranie.mp3").cached)
+            self.assertTrue(store.fetch(client, "https://example.com/nagranie.mp3").cached)
+            self.assertIn("if-none-match", requests[1].headers)
+            store.fetch(client, "https://example.com/nagranie.mp3", revalidate=False)
+            self.assertEqual(len(requests), 2)
+
+            files["/nagranie.mp3"] = b"nowa wersja"
+            blob = store.fetch(client, "https://example.com/nagranie.mp3")
+            self.assertEqual(blob.path.read_bytes(), b"nowa wersja")
+
+    def test_interrupted_download_resumes_with_range(self):
+        requests = []
+        handler = file_server({"/nagranie.mp3": CONTENT}, requests, break_after=100_000)
+        with tempfile.TemporaryDirectory() as tmp, httpx.Client(transport=httpx.MockTransport(handler)) as client:
+            store = BlobStore(tmp, chunk_size=4096)
+            with self.assertRaises(httpx.ReadError):
+                store.fetch(client, "https://example.com/nagranie.mp3")
+            self.assertNotIn("https://example.com/nagranie.mp3", store)
+
+            partial = next((Path(tmp) / "partial").glob("*.part")).stat().st_size
+            self.assertGreater(partial, 0)
+
+            blob = store.fetch(client, "https://example.com/nagranie.mp3")
+            self.assertEqual(requests[1].headers["range"], f"bytes={partial}-")
+            self.assertEqual(blob.path.read_bytes(), CONTENT)
+            self.assertEqual(blob.sha256, hashlib.sha256(CONTENT).hexdigest())
+            self.assertEqual(list((Path(tmp) / "partial").iterdir()), [])
+
+    def test_async_fetch(self):
+        requests = []
+        handler = file_server({"/mapa.png": CONTENT}, requests)
+
+        async def run(store):
+            async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+                return await asyncio.gather(*(store.fetch_async(client, url) for url in (
+                    "https://example.com/mapa.png", "https://example.org/mapa.png",
+                )))
+
+        with tempfile.TemporaryDirectory() as tmp:
+            first, second = asyncio.run(run(BlobStore(tmp)))
+            self.assertEqual(first.path, second.path)
+            self.assertEqual(first.path.read_bytes(), CONTENT)
+
+
+if __name__ == '__main__':
+    unittest.main()
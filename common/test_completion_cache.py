@@ -0,0 +1,83 @@
+import base64
+import tempfile
+import time
+import unittest
+from pathlib import Path
+
+from common.completion_cache import CompletionCache, is_cacheable, make_cache_key
+
+
+def image_payload(image_bytes: bytes, temperature: float = 0) -> dict:
+    url = f"data:image/png;base64,{base64.b64encode(image_bytes).decode()}"
+    return {
+        "model": "gpt-4o",
+        "temperature": temperature,
+        "messages": [{"role": "user", "content": [
+            {"type": "text", "text": "Opisz obraz"},
+            {"type": "image_url", "image_url": {"url": url}},
+        ]}],
+    }
+
+
+class TestCompletionCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = Path(self.tmp.name) / "cache.sqlite"
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_key_depends_on_image_bytes_and_temperature(self):
+        base = make_cache_key("/chat/completions", image_payload(b"abc"))
+        self.assertEqual(base, make_cache_key("/chat/completions", image_payload(b"abc")))
+        self.assertNotEqual(base, make_cache_key("/chat/completions", image_payload(b"abd")))
+        self.assertNotEqual(base, make_cache_key("/chat/completions", image_payload(b"abc", temperature=0.5)))
+
+    def test_only_deterministic_requests_are_cacheable(self):
+        self.assertTrue(is_cacheable(image_payload(b"abc")))
+        self.assertTrue(is_cacheable({"model": "text-embedding-3-small", "input": "tekst"}))
+        self.assertFalse(is_cacheable(image_payload(b"abc", temperature=0.3)))
+
+    def test_hits_and_misses(self):
+        cache = CompletionCache(self.path)
+        self.assertIsNone(cache.get("k"))
+        cache.set("k", {"choices": [{"message": {"content": "people"}}]})
+        self.assertEqual(cache.get("k")["choices"][0]["message"]["content"], "people")
+        self.assertEqual(cache.stats()["hits"], 1)
+        self.assertEqual(cache.stats()["misses"], 1)
+
+        # Nowa instancja widzi wpisy zapisane na dysku
+        self.assertIsNotNone(CompletionCache(self.path).get("k"))
+
+    def test_ttl_expires_entries(self):
+        cache = CompletionCache(self.path, ttl=0.05)
+        cache.set("k", "v")
+        time.sleep(0.1)
+        self.assertIsNone(cache.get("k"))
+
+    def test_evicts_least_recently_used(self):
+        cache = CompletionCache(self.path, max_bytes=30)
+        cache.set("a", "x" * 10)
+        time.sleep(0.01)
+        cache.set("b", "y" * 10)
+        time.sleep(0.01)
+        cache.get("a")
+        cache.set("c", "z" * 10)
+        self.assertIsNotNone(cache.get("a"))
+        self.assertIsNone(cache.get("b"))
+        self.assertIsNotNone(cache.get("c"))
+
+    def test_running_size_matches_disk(self):
+        cache = CompletionCache(self.path, max_bytes=1000)
+        for i in range(20):
+            cache.set(f"k{i % 7}", "x" * (10 + i))
+        self.assertLessEqual(cache._total, 1000)
+        self.assertEqual(cache._total, cache.stats()["bytes"])
+        for i in range(100):
+            cache.set(f"n{i}", "y" * 40)
+        self.assertLessEqual(cache.stats()["bytes"], 1000)
+        self.assertEqual(cache._total, cache.stats()["bytes"])
+
+
+if __name__ == '__main__':
+    unittest.main()
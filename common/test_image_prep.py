@@ -0,0 +1,87 @@
+import io
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+from PIL import Image
+
+from common.image_prep import is_blank, prepare_image, prepare_image_bytes, prepare_tiles, target_size, tile_boxes, vision_tokens
+
+
+def noisy_png(width: int, height: int, exif: bool = False) -> bytes:
+    """Obraz testowy trudny do skompresowania (szum), opcjonalnie z metadanymi EXIF."""
+    pixels = np.random.default_rng(0).integers(0, 256, (height, width, 3), dtype=np.uint8)
+    image = Image.fromarray(pixels)
+    buffer = io.BytesIO()
+    if exif:
+        metadata = image.getexif()
+        metadata[0x010F] = "Aparat"
+        image.save(buffer, format="JPEG", exif=metadata)
+    else:
+        image.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+class TestImagePrep(unittest.TestCase):
+    def test_vision_tokens(self):
+        self.assertEqual(vision_tokens(512, 512), 85 + 170)
+        # 4000x3000 -> 1024x768 -> 2x2 kafelki
+        self.assertEqual(vision_tokens(4000, 3000), 85 + 4 * 170)
+
+    def test_target_size_matches_model_view_and_snaps_to_tiles(self):
+        self.assertEqual(target_size(400, 300), (400, 300))
+        self.assertEqual(target_size(4000, 3000), (1024, 768))
+        # 3000x2000 model widzi jako 1152x768 (3x2 kafelki) - przycięcie do 1024 oszczędza kolumnę kafelków
+        self.assertEqual(target_size(3000, 2000), (1024, 682))
+        self.assertEqual(target_size(3000, 2000, tile_slack=0), (1152, 768))
+        self.assertLess(vision_tokens(*target_size(3000, 2000)), vision_tokens(3000, 2000))
+
+    def test_byte_budget_and_metadata(self):
+        prepared = prepare_image_bytes(noisy_png(1600, 1200, exif=True), max_bytes=60 * 1024)
+        self.assertLessEqual(len(prepared.data), 60 * 1024)
+        self.assertEqual(prepared.mime_type, "image/jpeg")
+        with Image.open(io.BytesIO(prepared.data)) as image:
+            self.assertEqual(image.size, (prepared.width, prepared.height))
+            self.assertEqual(dict(image.getexif()), {})
+
+    def test_webp_and_alpha(self):
+        image = Image.new("RGBA", (64, 64), (255, 0, 0, 0))
+        buffer = io.BytesIO()
+        image.save(buffer, format="PNG")
+        prepared = prepare_image_bytes(buffer.getvalue(), image_format="WEBP")
+        self.assertTrue(prepared.data_url().startswith("data:image/webp;base64,"))
+
+    def test_result_is_cached(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "raport.png"
+            path.write_bytes(noisy_png(300, 200))
+            first = prepare_image(path, cache_dir=tmp)
+            with mock.patch("common.image_prep.prepare_image_bytes") as prepare:
+                second = prepare_image(path, cache_dir=tmp)
+                prepare.assert_not_called()
+            self.assertEqual(first, second)
+
+    def test_tile_boxes_cover_image_with_overlap(self):
+        boxes = tile_boxes(2000, 700, tile_size=768, overlap=128)
+        self.assertEqual([box[0] for box in boxes], [0, 640, 1232])
+        self.assertEqual({(box[1], box[3]) for box in boxes}, {(0, 700)})
+        self.assertEqual(boxes[-1][2], 2000)
+
+    def test_blank_tiles_are_skipped(self):
+        self.assertTrue(is_blank(Image.new("RGB", (256, 256), "white")))
+        noisy = Image.open(io.BytesIO(noisy_png(256, 256)))
+        self.assertFalse(is_blank(noisy))
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "mapa.png"
+            page = Image.new("RGB", (1536, 768), "white")
+            page.paste(noisy, (100, 100))
+            page.save(path)
+            tiles, skipped = prepare_tiles(path, tile_size=768, overlap=0)
+            self.assertEqual(([tile.box for tile in tiles], skipped), ([(0, 0, 768, 768)], 1))
+            self.assertEqual((tiles[0].image.width, tiles[0].image.height), (768, 768))
+
+
+if __name__ == "__main__":
+    unittest.main()
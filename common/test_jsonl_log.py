@@ -0,0 +1,39 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+from common.jsonl_log import JsonlLog
+
+
+class TestJsonlLog(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = Path(self.tmp.name) / "sub" / "log.jsonl"
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_append_after_torn_line(self):
+        log = JsonlLog(self.path)
+        log.append({"id": 1})
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write('{"id": 2, "tekst": "urwa')
+        log = JsonlLog(self.path)
+        self.assertEqual(list(log.read()), [{"id": 1}])
+        log.append({"id": 3})
+        self.assertEqual([entry["id"] for entry in JsonlLog(self.path).read()], [1, 3])
+
+    def test_rewrite_replaces_content(self):
+        log = JsonlLog(self.path)
+        for i in range(5):
+            log.append({"id": i % 2, "wersja": i})
+        self.assertEqual(log.lines, 5)
+        log.rewrite([{"id": 0, "wersja": 4}, {"id": 1, "wersja": 3}])
+        reopened = JsonlLog(self.path)
+        self.assertEqual(len(list(reopened.read())), 2)
+        self.assertEqual((log.lines, reopened.lines), (2, 2))
+        self.assertFalse(self.path.with_name("log.jsonl.tmp").exists())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,31 @@
+import sys
+import subprocess
+import unittest
+
+from common.lazy_import import is_loaded, lazy_import
+
+
+class TestLazyImport(unittest.TestCase):
+    def test_module_is_imported_on_first_attribute_access(self):
+        sys.modules.pop("colorsys", None)
+        colorsys = lazy_import("colorsys")
+        self.assertFalse(is_loaded("colorsys"))
+        self.assertEqual(colorsys.rgb_to_hsv(1.0, 0.0, 0.0), (0.0, 1.0, 1.0))
+        self.assertTrue(is_loaded("colorsys"))
+
+    def test_missing_module_fails_on_first_use(self):
+        missing = lazy_import("nie_ma_takiego_modulu")
+        with self.assertRaises(ModuleNotFoundError):
+            missing.anything
+
+    def test_common_modules_do_not_import_heavy_dependencies(self):
+        code = (
+            "import sys; import common.image_prep, common.vision_cache, common.whisper_pool; "
+            "print(','.join(m for m in ('numpy', 'PIL', 'torch', 'whisper') if m in sys.modules))"
+        )
+        result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+        self.assertEqual(result.stdout.strip(), "")
+
+
+if __name__ == '__main__':
+    unittest.main()
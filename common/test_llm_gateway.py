@@ -0,0 +1,127 @@
+import asyncio
+import tempfile
+import time
+import unittest
+from pathlib import Path
+
+import httpx
+
+from common.llm_gateway import LLMGateway, LLMGatewayError, TokenBucket, parse_duration
+from common.completion_cache import CompletionCache
+
+
+def chat_response(content: str) -> httpx.Response:
+    return httpx.Response(200, json={
+        "choices": [{"message": {"content": content}}],
+        "usage": {"prompt_tokens": 10, "completion_tokens": 2, "total_tokens": 12},
+    })
+
+
+class TestTokenBucket(unittest.TestCase):
+    def test_waits_for_refill(self):
+        async def run():
+            bucket = TokenBucket(per_minute=600)  # 10 żetonów na sekundę
+            await bucket.acquire(600)
+            start = time.monotonic()
+            await bucket.acquire(2)
+            return time.monotonic() - start
+
+        self.assertGreaterEqual(asyncio.run(run()), 0.15)
+
+    def test_observe_follows_server_limits(self):
+        async def run():
+            bucket = TokenBucket(per_minute=60)
+            # Konto ma wyższy limit niż domyślny, ale serwerowi zostały już tylko 2 zapytania
+            bucket.observe(limit=6000, remaining=2)
+            capacity, tokens = bucket.capacity, bucket.tokens
+            bucket.observe(limit=6000, remaining=0, reset_after=0.2)
+            start = time.monotonic()
+            await bucket.acquire(1)
+            return capacity, tokens, time.monotonic() - start
+
+        capacity, tokens, waited = asyncio.run(run())
+        self.assertEqual(capacity, 6000)
+        self.assertLess(tokens, 3)
+        self.assertGreaterEqual(waited, 0.15)
+
+    def test_parse_duration(self):
+        self.assertEqual(parse_duration("20ms"), 0.02)
+        self.assertEqual(parse_duration("6m0s"), 360)
+        self.assertEqual(parse_duration("1.5"), 1.5)
+        self.assertIsNone(parse_duration("jutro"))
+
+
+class TestLLMGateway(unittest.TestCase):
+    def run_gateway(self, handler, coro_factory, cache=None):
+        async def run():
+            transport = httpx.MockTransport(handler)
+            async with LLMGateway(api_key="test", base_delay=0.01, transport=transport, cache=cache) as gateway:
+                return await coro_factory(gateway), gateway.stats
+
+        return asyncio.run(run())
+
+    def test_retries_rate_limit(self):
+        calls = []
+
+        def handler(request):
+            calls.append(request)
+            if len(calls) < 3:
+                return httpx.Response(429, headers={"retry-after": "0"})
+            return chat_response(" people ")
+
+        answer, stats = self.run_gateway(handler, lambda g: g.chat_text({"model": "gpt-4o", "messages": []}))
+        self.assertEqual(answer, "people")
+        self.assertEqual(stats["retries"], 2)
+        self.assertEqual(stats["prompt_tokens"], 10)
+
+    def test_rate_limit_pauses_queued_requests(self):
+        calls = []
+
+        def handler(request):
+            calls.append(time.monotonic())
+            if len(calls) == 1:
+                return httpx.Response(429, headers={"retry-after-ms": "200"})
+            return chat_response("ok")
+
+        payloads = [{"model": "gpt-4o", "messages": [{"role": "user", "content": str(i)}]} for i in range(3)]
+        answers, stats = self.run_gateway(handler, lambda g: g.chat_text_many(payloads))
+        self.assertEqual(answers, ["ok"] * 3)
+        self.assertEqual(stats["retries"], 1)
+        # Po 429 żadne zapytanie (także z kolejki) nie wyszło przed upływem retry-after
+        self.assertGreaterEqual(min(calls[1:]) - calls[0], 0.15)
+
+    def test_does_not_retry_client_error(self):
+        def handler(request):
+            return httpx.Response(401, text="invalid key")
+
+        with self.assertRaises(LLMGatewayError) as ctx:
+            self.run_gateway(handler, lambda g: g.chat_text({"model": "gpt-4o", "messages": []}))
+        self.assertEqual(ctx.exception.status_code, 401)
+
+    def test_chat_text_many_keeps_order(self):
+        def handler(request):
+            return chat_response(request.read().decode())
+
+        payloads = [{"model": "gpt-4o", "messages": [{"role": "user", "content": str(i)}]} for i in range(5)]
+        answers, _ = self.run_gateway(handler, lambda g: g.chat_text_many(payloads))
+        self.assertEqual([str(i) in answer for i, answer in enumerate(answers)], [True] * 5)
+
+    def test_cached_rerun_skips_network(self):
+        calls = []
+
+        def handler(request):
+            calls.append(request)
+            return chat_response("hardware")
+
+        payload = {"model": "gpt-4o", "messages": [{"role": "user", "content": "raport"}], "temperature": 0}
+        with tempfile.TemporaryDirectory() as tmp:
+            cache = CompletionCache(Path(tmp) / "cache.sqlite")
+            for _ in range(2):
+                answer, _ = self.run_gateway(handler, lambda g: g.chat_text(payload), cache=cache)
+                self.assertEqual(answer, "hardware")
+            cache.close()
+        self.assertEqual(len(calls), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,38 @@
+import unittest
+
+from common.prompt_packing import pack_items, parse_id_mapping, render_numbered
+
+CATEGORIES = {"people", "hardware", "none"}
+
+
+class TestPromptPacking(unittest.TestCase):
+    def test_packs_respect_budget_and_order(self):
+        items = [(f"n{i}", "x" * 400) for i in range(10)]  # ok. 100 tokenów każda
+        packs = pack_items(items, token_budget=350, overhead_tokens=40)
+        self.assertEqual([item for pack in packs for item in pack], items)
+        self.assertEqual([len(pack) for pack in packs], [2, 2, 2, 2, 2])
+
+    def test_oversized_item_gets_own_pack(self):
+        packs = pack_items([("a", "x" * 40), ("b", "x" * 4000), ("c", "x" * 40)], token_budget=200)
+        self.assertEqual([[item_id for item_id, _ in pack] for pack in packs], [["a"], ["b"], ["c"]])
+
+    def test_max_items(self):
+        packs = pack_items([(str(i), "x") for i in range(7)], token_budget=10000, max_items=3)
+        self.assertEqual([len(pack) for pack in packs], [3, 3, 1])
+
+    def test_render_numbered(self):
+        self.assertEqual(render_numbered(["pierwsza ", "druga"]), "[1]\npierwsza\n\n[2]\ndruga")
+
+    def test_parse_marks_invalid_ids_for_fallback(self):
+        answer = '```json\n{"1": "People", "2": "software", "4": "none", "x": "none"}\n```'
+        valid, retry = parse_id_mapping(answer, 3, CATEGORIES)
+        self.assertEqual(valid, {1: "people"})
+        self.assertEqual(retry, [2, 3])
+
+    def test_parse_non_json_retries_everything(self):
+        self.assertEqual(parse_id_mapping("people, none", 2, CATEGORIES), ({}, [1, 2]))
+        self.assertEqual(parse_id_mapping('["people"]', 1, CATEGORIES), ({}, [1]))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,78 @@
+import json
+import asyncio
+import tempfile
+import unittest
+from pathlib import Path
+
+import httpx
+
+from common.llm_gateway import LLMGateway
+from common.completion_cache import CompletionCache
+from common.retrieval import Chunk, EmbeddingIndex, split_text
+
+
+def fake_embedding(text: str) -> list[float]:
+    """Embedding testowy: liczba wystąpień kilku słów kluczowych."""
+    return [float(text.lower().count(word)) + 0.01 for word in ("robot", "kot", "miasto", "rzeka")]
+
+
+class TestSplitText(unittest.TestCase):
+    def test_chunks_respect_limit_and_keep_all_text(self):
+        paragraphs = [f"Akapit {i}. " + "Zdanie o robotach i kotach. " * (i * 10) for i in range(1, 8)]
+        chunks = split_text("\n\n".join(paragraphs), max_chars=300, overlap=50)
+        self.assertTrue(all(len(chunk) <= 300 for chunk in chunks))
+        joined = " ".join(chunks)
+        for i in range(1, 8):
+            self.assertIn(f"Akapit {i}.", joined)
+
+    def test_long_sentence_is_split_into_overlapping_windows(self):
+        chunks = split_text("x" * 1000, max_chars=300, overlap=50)
+        self.assertTrue(all(len(chunk) <= 300 for chunk in chunks))
+        self.assertGreaterEqual(sum(len(chunk) for chunk in chunks), 1000)
+
+
+class TestEmbeddingIndex(unittest.TestCase):
+    def test_search_returns_nearest_chunks(self):
+        chunks = [Chunk("robot robot", "tekst"), Chunk("kot i kot", "tekst"), Chunk("miasto nad rzeką", "obraz a.png")]
+        index = EmbeddingIndex(chunks, [fake_embedding(chunk.text) for chunk in chunks])
+        results = index.search(fake_embedding("gdzie jest kot?"), k=2)
+        self.assertEqual(results[0][0].text, "kot i kot")
+        self.assertEqual(len(results), 2)
+
+    def test_empty_index(self):
+        index = EmbeddingIndex([], [])
+        self.assertEqual(len(index), 0)
+        self.assertEqual(index.search(fake_embedding("kot")), [])
+
+        async def run():
+            async with LLMGateway(api_key="test", transport=httpx.MockTransport(lambda request: httpx.Response(500))) as gateway:
+                return await EmbeddingIndex.build(gateway, [])
+
+        self.assertEqual(asyncio.run(run()).search(fake_embedding("kot")), [])
+
+    def test_embeddings_are_cached_per_chunk(self):
+        inputs = []
+
+        def handler(request):
+            texts = json.loads(request.read())["input"]
+            inputs.extend(texts)
+            return httpx.Response(200, json={"data": [
+                {"index": i, "embedding": fake_embedding(text)} for i, text in enumerate(texts)
+            ]})
+
+        async def run(cache, texts):
+            async with LLMGateway(api_key="test", transport=httpx.MockTransport(handler), cache=cache) as gateway:
+                return await EmbeddingIndex.build(gateway, [Chunk(text, "tekst") for text in texts])
+
+        with tempfile.TemporaryDirectory() as tmp:
+            cache = CompletionCache(Path(tmp) / "cache.sqlite")
+            asyncio.run(run(cache, ["robot", "kot", "miasto"]))
+            index = asyncio.run(run(cache, ["robot", "kot", "rzeka"]))
+            cache.close()
+        # Drugi raz do API trafia tylko zmieniony fragment
+        self.assertEqual(inputs, ["robot", "kot", "miasto", "rzeka"])
+        self.assertEqual(index.search(fake_embedding("rzeka"), k=1)[0][0].text, "rzeka")
+
+
+if __name__ == '__main__':
+    unittest.main()
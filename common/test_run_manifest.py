@@ -0,0 +1,58 @@
+import os
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from common.run_manifest import RunManifest
+
+
+class TestRunManifest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.dir = Path(self.tmp.name)
+        self.path = self.dir / "manifest.jsonl"
+        self.report = self.dir / "raport.txt"
+        self.report.write_text("Schwytano dwie osoby", encoding="utf-8")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_unchanged_file_is_reused_after_reopen(self):
+        manifest = RunManifest(self.path)
+        manifest.record(self.report, manifest.fingerprint(self.report), category="people", model="gpt-4o", prompt_version=1)
+        reopened = RunManifest(self.path)
+        fingerprint = reopened.fingerprint(self.report)
+        self.assertEqual(reopened.get(self.report, fingerprint, model="gpt-4o", prompt_version=1)["category"], "people")
+        self.assertIsNone(reopened.get(self.report, fingerprint, model="gpt-4o", prompt_version=2))
+
+    def test_modified_file_is_not_reused(self):
+        manifest = RunManifest(self.path)
+        manifest.record(self.report, manifest.fingerprint(self.report), category="people")
+        self.report.write_text("Usterka czujnika", encoding="utf-8")
+        self.assertIsNone(manifest.get(self.report, manifest.fingerprint(self.report)))
+
+    def test_unchanged_stat_skips_hashing(self):
+        manifest = RunManifest(self.path)
+        manifest.record(self.report, manifest.fingerprint(self.report), category="none")
+        with mock.patch("common.run_manifest.sha256_file") as sha256_file:
+            manifest.fingerprint(self.report)
+            sha256_file.assert_not_called()
+            os.utime(self.report, ns=(0, 0))
+            manifest.fingerprint(self.report)
+            sha256_file.assert_called_once()
+
+    def test_compact_keeps_latest_entries(self):
+        manifest = RunManifest(self.path)
+        fingerprint = manifest.fingerprint(self.report)
+        manifest.record(self.report, fingerprint, category="none")
+        manifest.record(self.report, fingerprint, category="people")
+        manifest.record(self.dir / "usuniety.txt", fingerprint, category="hardware")
+        manifest.compact(keep={str(self.report)})
+        reopened = RunManifest(self.path)
+        self.assertEqual((reopened.lines, len(reopened)), (1, 1))
+        self.assertEqual(reopened.get(self.report, fingerprint)["category"], "people")
+
+
+if __name__ == "__main__":
+    unittest.main()
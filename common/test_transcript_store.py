@@ -0,0 +1,41 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+from common.transcript_store import TranscriptStore, sha256_file
+
+
+class TestTranscriptStore(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = Path(self.tmp.name) / "transcripts.jsonl"
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_entries_survive_reopen(self):
+        store = TranscriptStore(self.path)
+        store.add("abc", "Pierwsza transkrypcja", file="a.m4a")
+        reopened = TranscriptStore(self.path)
+        self.assertIn("abc", reopened)
+        self.assertEqual(reopened.get("abc"), "Pierwsza transkrypcja")
+        self.assertIsNone(reopened.get("xyz"))
+
+    def test_truncated_last_line_is_skipped_and_not_corrupting(self):
+        store = TranscriptStore(self.path)
+        store.add("abc", "Gotowa")
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write('{"sha256": "def", "text": "Przerw')
+        store = TranscriptStore(self.path)
+        self.assertEqual(len(store), 1)
+        store.add("ghi", "Po awarii")
+        self.assertEqual(TranscriptStore(self.path).get("ghi"), "Po awarii")
+
+    def test_sha256_file(self):
+        audio = Path(self.tmp.name) / "a.m4a"
+        audio.write_bytes(b"abc")
+        self.assertEqual(sha256_file(audio), "ba7816bf8f01cfea414140de5dae2223b00361a396177a9cb410ff61f20015ad")
+
+
+if __name__ == "__main__":
+    unittest.main()
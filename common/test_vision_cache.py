@@ -0,0 +1,130 @@
+import io
+import base64
+import asyncio
+import tempfile
+import unittest
+from pathlib import Path
+
+import httpx
+from PIL import Image, ImageDraw, ImageEnhance
+
+from common.llm_gateway import LLMGateway
+from common.vision_cache import VisionCache, fingerprint, same_image, vision_key
+
+
+def scene(seed: int = 0, size: tuple[int, int] = (640, 480)) -> Image.Image:
+    """Obraz testowy z prostokątami i liniami (skróty percepcyjne potrzebują struktury)."""
+    image = Image.new("RGB", size, "white")
+    draw = ImageDraw.Draw(image)
+    for i in range(8):
+        x, y = (seed * 97 + i * 73) % (size[0] - 120), (seed * 53 + i * 41) % (size[1] - 90)
+        draw.rectangle((x, y, x + 120, y + 90), fill=((i * 60 + seed * 40) % 256, (i * 30) % 256, 120))
+        draw.line((0, y, size[0], (y + seed * 30 + 60) % size[1]), fill="black", width=3)
+    return image
+
+
+def encode(image: Image.Image, image_format: str = "PNG", **options) -> bytes:
+    buffer = io.BytesIO()
+    image.save(buffer, format=image_format, **options)
+    return buffer.getvalue()
+
+
+def image_payload(data: bytes, prompt: str = "Co jest na obrazie?") -> dict:
+    url = f"data:image/png;base64,{base64.b64encode(data).decode('ascii')}"
+    return {"model": "gpt-4o", "messages": [{"role": "user", "content": [
+        {"type": "text", "text": prompt},
+        {"type": "image_url", "image_url": {"url": url}},
+    ]}]}
+
+
+class TestFingerprint(unittest.TestCase):
+    def test_reencoded_and_resized_image_matches(self):
+        original = fingerprint(encode(scene()))
+        self.assertTrue(same_image(original, fingerprint(encode(scene(), "JPEG", quality=60))))
+        self.assertTrue(same_image(original, fingerprint(encode(scene().resize((320, 240)), "WEBP"))))
+
+    def test_different_or_brightened_image_does_not_match(self):
+        original = fingerprint(encode(scene()))
+        self.assertFalse(same_image(original, fingerprint(encode(scene(seed=1)))))
+        brightened = ImageEnhance.Brightness(scene()).enhance(1.3)
+        self.assertFalse(same_image(original, fingerprint(encode(brightened))))
+
+    def test_key_requires_inline_images(self):
+        self.assertIsNone(vision_key("/chat/completions", {"model": "gpt-4o", "messages": []}))
+        payload = image_payload(b"")
+        payload["messages"][0]["content"][1]["image_url"]["url"] = "https://example.com/mapa.png"
+        self.assertIsNone(vision_key("/chat/completions", payload))
+
+
+class TestVisionCache(unittest.TestCase):
+    def test_hit_requires_same_prompt(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            cache = VisionCache(Path(tmp) / "vision.sqlite")
+            cache.set(cache.key_for("/chat/completions", image_payload(encode(scene()))), {"answer": "mapa"})
+            jpeg = encode(scene(), "JPEG", quality=70)
+            self.assertEqual(cache.get(cache.key_for("/chat/completions", image_payload(jpeg))), {"answer": "mapa"})
+            self.assertIsNone(cache.get(cache.key_for("/chat/completions", image_payload(jpeg, "Jakie miasto?"))))
+            self.assertEqual((cache.stats()["hits"], cache.stats()["misses"]), (1, 1))
+            cache.close()
+
+    def test_evicts_least_recently_used(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            cache = VisionCache(Path(tmp) / "vision.sqlite", max_bytes=450)
+            keys = [cache.key_for("/chat/completions", image_payload(encode(scene(seed)))) for seed in range(3)]
+            for seed, key in enumerate(keys):
+                cache.set(key, {"answer": "x" * 100, "seed": seed})
+            self.assertIsNone(cache.get(keys[0]))
+            self.assertIsNotNone(cache.get(keys[2]))
+            cache.close()
+
+    def test_repeated_set_replaces_entry(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            cache = VisionCache(Path(tmp) / "vision.sqlite")
+            key = cache.key_for("/chat/completions", image_payload(encode(scene())))
+            cache.set(key, {"answer": "x" * 100})
+            cache.set(key, {"answer": "mapa"})
+            self.assertEqual(cache.get(key), {"answer": "mapa"})
+            self.assertEqual(cache._total, cache.stats()["bytes"])
+            self.assertEqual(cache.stats()["entries"], 1)
+            cache.close()
+
+    def test_older_duplicate_entries_are_removed(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "vision.sqlite"
+            cache = VisionCache(path)
+            key = cache.key_for("/chat/completions", image_payload(encode(scene())))
+            cache.set(key, {"answer": "stara"})
+            # Plik z czasu, gdy `set` dopisywał powtórzone wpisy
+            cache._conn.execute("DROP INDEX entries_prompt_images")
+            cache._conn.execute("INSERT INTO entries (prompt_key, images, value, size, accessed_at) "
+                                "SELECT prompt_key, images, '{\"answer\": \"nowa\"}', size, accessed_at FROM entries")
+            cache.close()
+
+            cache = VisionCache(path)
+            self.assertEqual(cache.stats()["entries"], 1)
+            self.assertEqual(cache.get(key), {"answer": "nowa"})
+            cache.close()
+
+    def test_gateway_skips_network_for_reencoded_image(self):
+        calls = []
+
+        def handler(request):
+            calls.append(request)
+            return httpx.Response(200, json={"choices": [{"message": {"content": "Kraków"}}]})
+
+        async def run(cache):
+            transport = httpx.MockTransport(handler)
+            async with LLMGateway(api_key="test", transport=transport, vision_cache=cache) as gateway:
+                first = await gateway.chat_text(image_payload(encode(scene())))
+                second = await gateway.chat_text(image_payload(encode(scene().resize((480, 360)), "JPEG", quality=80)))
+                return first, second
+
+        with tempfile.TemporaryDirectory() as tmp:
+            cache = VisionCache(Path(tmp) / "vision.sqlite")
+            self.assertEqual(asyncio.run(run(cache)), ("Kraków", "Kraków"))
+            cache.close()
+        self.assertEqual(len(calls), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
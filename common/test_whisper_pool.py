@@ -0,0 +1,97 @@
+import multiprocessing
+import os
+import tempfile
+import types
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+
+from common import audio_chunking, whisper_pool
+from common.audio_chunking import SAMPLE_RATE
+from common.whisper_pool import WhisperPool
+
+
+# Zastępcze funkcje wykonywane w procesach puli (zamiast ffmpeg, whisper i torch). Procesy powstają
+# przez fork, więc dziedziczą podmienione atrybuty modułów.
+
+def fake_load_audio(path) -> np.ndarray:
+    """Plik testowy zawiera długość "nagrania" w sekundach; nagranie z kilkoma sekundami ciszy co 20 s."""
+    text = Path(path).read_text()
+    if text == "uszkodzony":
+        raise RuntimeError(f"ffmpeg nie odczytał {path}")
+    samples = np.full(int(float(text) * SAMPLE_RATE), 0.3, dtype=np.float32)
+    for start in range(20, int(float(text)), 20):
+        samples[(start - 1) * SAMPLE_RATE:start * SAMPLE_RATE] = 0
+    return samples
+
+
+def fake_transcribe_samples(model_name, samples, language=None) -> dict:
+    seconds = len(samples) / SAMPLE_RATE
+    return {"text": f"{seconds:.0f}s pid={os.getpid()}", "segments": [{"start": 0.0, "end": seconds, "text": "x"}]}
+
+
+def fake_local_model(model_name):
+    return None
+
+
+@unittest.skipUnless(multiprocessing.get_start_method() == "fork", "zastępcze funkcje wymagają procesów tworzonych przez fork")
+class TestWhisperPool(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        patches = [
+            mock.patch.object(whisper_pool, "torch", types.SimpleNamespace(set_num_threads=lambda threads: None)),
+            mock.patch.object(whisper_pool, "_local_model", fake_local_model),
+            mock.patch.object(whisper_pool, "load_audio", fake_load_audio),
+            mock.patch.object(whisper_pool, "transcribe_samples_local", fake_transcribe_samples),
+            mock.patch.object(audio_chunking, "transcribe_samples_local", fake_transcribe_samples),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+        self.pool = WhisperPool(workers=2, long_recording_seconds=45)
+        self.addCleanup(self.pool.close)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def recording(self, name: str, content: str) -> Path:
+        path = Path(self.tmp.name) / name
+        path.write_text(content)
+        return path
+
+    def test_submit_runs_in_worker_process(self):
+        result = self.pool.submit(self.recording("a.mp3", "5")).result()
+        self.assertTrue(result["text"].startswith("5s"))
+        self.assertNotIn(f"pid={os.getpid()}", result["text"])
+
+    def test_transcribe_many_pairs_paths_with_results_and_errors(self):
+        paths = [self.recording(f"{i}.mp3", str(i + 1)) for i in range(6)]
+        paths.append(self.recording("uszkodzony.mp3", "uszkodzony"))
+        results = dict(self.pool.transcribe_many(iter(paths)))
+        self.assertEqual(set(results), set(paths))
+        for i, path in enumerate(paths[:-1]):
+            self.assertTrue(results[path]["text"].startswith(f"{i + 1}s"))
+        self.assertIsInstance(results[paths[-1]], RuntimeError)
+
+    def test_transcribe_splits_only_long_recordings(self):
+        short = self.pool.transcribe(self.recording("krotkie.mp3", "30"))
+        self.assertEqual(len(short["segments"]), 1)
+
+        long = self.pool.transcribe(self.recording("dlugie.mp3", "90"))
+        self.assertGreater(len(long["segments"]), 1)
+        self.assertEqual(long["segments"][0]["start"], 0.0)
+        self.assertAlmostEqual(long["segments"][-1]["end"], 90.0, delta=0.01)
+
+        with self.assertRaises(RuntimeError):
+            self.pool.transcribe(self.recording("uszkodzony.mp3", "uszkodzony"))
+
+    def test_close_rejects_new_work(self):
+        self.pool.close()
+        with self.assertRaises(RuntimeError):
+            self.pool.submit(self.recording("a.mp3", "5"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,45 @@
+import hashlib
+from pathlib import Path
+from typing import Optional
+
+from .jsonl_log import JsonlLog
+
+
+def sha256_file(path: str | Path, chunk_size: int = 1024 * 1024) -> str:
+    """Skrót SHA-256 zawartości pliku, liczony porcjami (bez wczytywania całego pliku do pamięci)."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        while chunk := f.read(chunk_size):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class TranscriptStore:
+    """Transkrypcje w pliku JSONL, adresowane skrótem SHA-256 nagrania.
+
+    Każdy wynik jest dopisywany jako osobna linia zaraz po otrzymaniu, więc przerwanie skryptu
+    nie traci gotowych transkrypcji, a ponowne uruchomienie pomija nagrania już przetworzone
+    (także po zmianie nazwy pliku). Uszkodzona ostatnia linia (np. po awarii w trakcie zapisu)
+    jest pomijana.
+    """
+
+    def __init__(self, path: str | Path):
+        self.path = Path(path)
+        self.log = JsonlLog(self.path)
+        self.entries: dict[str, dict] = {entry["sha256"]: entry for entry in self.log.read()}
+
+    def __contains__(self, sha256: str) -> bool:
+        return sha256 in self.entries
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def get(self, sha256: str) -> Optional[str]:
+        entry = self.entries.get(sha256)
+        return entry["text"] if entry else None
+
+    def add(self, sha256: str, text: str, **metadata):
+        """Dopisuje transkrypcję (z dodatkowymi polami, np. file, model) i od razu zapisuje ją na dysk."""
+        entry = {"sha256": sha256, "text": text, **metadata}
+        self.log.append(entry)
+        self.entries[sha256] = entry
@@ -0,0 +1,260 @@
+from __future__ import annotations
+
+import io
+import os
+import json
+import time
+import base64
+import sqlite3
+import logging
+import threading
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, NamedTuple, Optional
+
+from .completion_cache import make_cache_key
+from .lazy_import import lazy_import
+
+# numpy i Pillow są wczytywane dopiero przy pierwszym obrazie (zapytania bez obrazów ich nie potrzebują)
+np = lazy_import("numpy")
+Image = lazy_import("PIL.Image")
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_VISION_CACHE_PATH = os.getenv("VISION_CACHE_PATH", os.path.join("cache", "vision.sqlite"))
+
+# Rozmiar skrótu (8x8 = 64 bity) i miniatury dla pHash (32x32 -> 8x8 najniższych częstotliwości DCT)
+HASH_SIZE = 8
+_DCT_SIZE = 32
+
+
+@lru_cache(maxsize=None)
+def _dct_matrix() -> np.ndarray:
+    """Ortonormalna macierz DCT-II (liczona raz, przy pierwszym pHash)."""
+    dct = np.sqrt(2 / _DCT_SIZE) * np.cos(
+        np.pi * np.outer(np.arange(_DCT_SIZE), 2 * np.arange(_DCT_SIZE) + 1) / (2 * _DCT_SIZE)
+    )
+    dct[0] /= np.sqrt(2)
+    return dct
+
+
+class ImageFingerprint(NamedTuple):
+    """Odcisk obrazu: dHash i pHash (64 bity) oraz średnia jasność i kontrast w skali 0-255.
+
+    Skróty nie zmieniają się przy zmianie jasności, więc jasność i kontrast są porównywane osobno -
+    rozjaśniona wersja zdjęcia to dla modelu inny obraz.
+    """
+    dhash: int
+    phash: int
+    mean: float
+    std: float
+
+
+def _gray(image: Image.Image, width: int, height: int) -> np.ndarray:
+    return np.asarray(image.convert("L").resize((width, height), Image.LANCZOS), dtype=np.float64)
+
+
+def _bits_to_int(bits: np.ndarray) -> int:
+    return int("".join("1" if bit else "0" for bit in bits.flatten()), 2)
+
+
+def dhash(image: Image.Image) -> int:
+    """Skrót różnicowy: czy piksel jest jaśniejszy od sąsiada po prawej (miniatura 9x8)."""
+    pixels = _gray(image, HASH_SIZE + 1, HASH_SIZE)
+    return _bits_to_int(pixels[:, 1:] > pixels[:, :-1])
+
+
+def phash(image: Image.Image) -> int:
+    """Skrót percepcyjny: znaki najniższych częstotliwości DCT względem ich mediany (miniatura 32x32)."""
+    dct = _dct_matrix()
+    low = (dct @ _gray(image, _DCT_SIZE, _DCT_SIZE) @ dct.T)[:HASH_SIZE, :HASH_SIZE]
+    # Składowa stała (średnia jasność) nie wchodzi do mediany
+    return _bits_to_int(low > np.median(low.flatten()[1:]))
+
+
+def fingerprint(data: bytes) -> ImageFingerprint:
+    with Image.open(io.BytesIO(data)) as image:
+        image.load()
+        small = _gray(image, 64, 64)
+        return ImageFingerprint(dhash(image), phash(image), float(small.mean()), float(small.std()))
+
+
+def hamming(a: int, b: int) -> int:
+    return (a ^ b).bit_count()
+
+
+def same_image(a: ImageFingerprint, b: ImageFingerprint, max_distance: int = 4, max_tone_diff: float = 6.0) -> bool:
+    """Czy odciski opisują ten sam obraz (np. po ponownej kompresji albo zmianie rozmiaru)."""
+    return (
+        hamming(a.dhash, b.dhash) <= max_distance
+        and hamming(a.phash, b.phash) <= max_distance
+        and abs(a.mean - b.mean) <= max_tone_diff
+        and abs(a.std - b.std) <= max_tone_diff
+    )
+
+
+class VisionKey(NamedTuple):
+    """Klucz zapytania z obrazami: skrót treści bez obrazów i odciski obrazów w kolejności."""
+    prompt_key: str
+    images: tuple[ImageFingerprint, ...]
+
+
+def vision_key(endpoint: str, payload: dict) -> Optional[VisionKey]:
+    """Rozdziela zapytanie na część tekstową i obrazy (data URL).
+
+    Zwraca None dla zapytań bez obrazów albo z obrazami podanymi jako adres URL (nie ma ich bajtów).
+    """
+    images = []
+
+    def strip_images(value):
+        if isinstance(value, dict):
+            if value.get("type") == "image_url":
+                url = value["image_url"]["url"] if isinstance(value.get("image_url"), dict) else value.get("image_url")
+                if not isinstance(url, str) or not url.startswith("data:") or ";base64," not in url:
+                    raise ValueError("obraz bez danych")
+                images.append(base64.b64decode(url.split(";base64,", 1)[1]))
+                return {"type": "image_url", "image_url": "<obraz>"}
+            return {key: strip_images(item) for key, item in value.items()}
+        if isinstance(value, list):
+            return [strip_images(item) for item in value]
+        return value
+
+    try:
+        prompt_only = strip_images(payload)
+    except ValueError:
+        return None
+    if not images:
+        return None
+    return VisionKey(make_cache_key(endpoint, prompt_only), tuple(fingerprint(data) for data in images))
+
+
+class VisionCache:
+    """Cache odpowiedzi na zapytania z obrazami, odporny na ponowną kompresję i zmianę rozmiaru obrazu.
+
+    Odpowiedź jest zwracana, gdy tekst zapytania jest identyczny, a każdy obraz jest wizualnie taki
+    sam (dHash i pHash różnią się najwyżej o `max_distance` bitów, jasność i kontrast prawie równe).
+    Wpisy są w SQLite; po przekroczeniu `max_bytes` usuwane są najdawniej używane (do `EVICT_TO`
+    limitu). Rozmiar jest liczony na bieżąco przy zapisie, pełne przeliczenie tylko przy sprzątaniu,
+    tak jak w CompletionCache.
+    """
+
+    # Sprzątanie zmniejsza cache do tej części `max_bytes`
+    EVICT_TO = 0.9
+
+    def __init__(
+        self,
+        path: str = DEFAULT_VISION_CACHE_PATH,
+        max_distance: int = 4,
+        max_tone_diff: float = 6.0,
+        max_bytes: int = 64 * 1024 * 1024,
+    ):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_distance = max_distance
+        self.max_tone_diff = max_tone_diff
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS entries (
+                id INTEGER PRIMARY KEY,
+                prompt_key TEXT NOT NULL,
+                images TEXT NOT NULL,
+                value TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                accessed_at REAL NOT NULL
+            )"""
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS entries_prompt_key ON entries (prompt_key)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS entries_accessed_at ON entries (accessed_at)")
+        self._unique_entries()
+        self._total = self._size_on_disk()
+
+    def _unique_entries(self):
+        """Jeden wpis na zapytanie i odciski obrazów (ponowny zapis nadpisuje wpis, `set` używa ON CONFLICT)."""
+        exists = self._conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = 'entries_prompt_images'"
+        ).fetchone()
+        if exists:
+            return
+        # Starsze pliki cache mogą mieć powtórzone wpisy - zostaje najnowszy
+        self._conn.execute(
+            "DELETE FROM entries WHERE id NOT IN (SELECT MAX(id) FROM entries GROUP BY prompt_key, images)"
+        )
+        self._conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS entries_prompt_images ON entries (prompt_key, images)")
+
+    def _size_on_disk(self) -> int:
+        return self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+
+    def key_for(self, endpoint: str, payload: dict) -> Optional[VisionKey]:
+        return vision_key(endpoint, payload)
+
+    def _matches(self, stored: list, images: tuple[ImageFingerprint, ...]) -> bool:
+        return len(stored) == len(images) and all(
+            same_image(ImageFingerprint(*a), b, self.max_distance, self.max_tone_diff) for a, b in zip(stored, images)
+        )
+
+    def get(self, key: VisionKey) -> Optional[Any]:
+        """Odpowiedź dla wizualnie takiego samego zapytania albo None."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, images, value FROM entries WHERE prompt_key = ?", (key.prompt_key,)
+            ).fetchall()
+            for entry_id, images, value in rows:
+                if self._matches(json.loads(images), key.images):
+                    self._conn.execute("UPDATE entries SET accessed_at = ? WHERE id = ?", (time.time(), entry_id))
+                    self.hits += 1
+                    return json.loads(value)
+            self.misses += 1
+        return None
+
+    def set(self, key: VisionKey, value: Any):
+        serialized = json.dumps(value, ensure_ascii=False)
+        images = json.dumps([list(image) for image in key.images])
+        size = len(serialized) + len(images)
+        with self._lock:
+            previous = self._conn.execute(
+                "SELECT size FROM entries WHERE prompt_key = ? AND images = ?", (key.prompt_key, images)
+            ).fetchone()
+            self._conn.execute(
+                """INSERT INTO entries (prompt_key, images, value, size, accessed_at) VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT (prompt_key, images) DO UPDATE
+                SET value = excluded.value, size = excluded.size, accessed_at = excluded.accessed_at""",
+                (key.prompt_key, images, serialized, size, time.time()),
+            )
+            self._total += size - (previous[0] if previous else 0)
+            if self._total > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        total = self._size_on_disk()
+        target = int(self.max_bytes * self.EVICT_TO)
+        evicted = []
+        if total > self.max_bytes:
+            for entry_id, size in self._conn.execute("SELECT id, size FROM entries ORDER BY accessed_at"):
+                if total <= target:
+                    break
+                evicted.append((entry_id,))
+                total -= size
+            self._conn.executemany("DELETE FROM entries WHERE id = ?", evicted)
+            logger.debug(f"Usunięto {len(evicted)} najdawniej używanych wpisów z cache obrazów")
+        self._total = total
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries, size = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+            self._total = size
+        return {"hits": self.hits, "misses": self.misses, "entries": entries, "bytes": size}
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM entries")
+            self._total = 0
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,113 @@
+import os
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from pathlib import Path
+from typing import Iterable, Iterator, Optional
+
+from .audio_chunking import SAMPLE_RATE, _local_model, load_audio, transcribe_long_audio_local, transcribe_samples_local
+from .lazy_import import lazy_import
+
+# torch jest potrzebny tylko w procesach puli
+torch = lazy_import("torch")
+
+# Nagrania dłuższe niż tyle sekund `transcribe` dzieli na fragmenty dla wszystkich procesów
+LONG_RECORDING_SECONDS = 120.0
+
+
+def _init_worker(model_names: tuple[str, ...], torch_threads: int):
+    """Inicjalizacja procesu puli: wczytanie modeli raz na cały czas życia procesu."""
+    # Bez tego każdy proces używa wszystkich rdzeni i procesy zagłuszają się nawzajem
+    torch.set_num_threads(torch_threads)
+    for model_name in model_names:
+        _local_model(model_name)
+
+
+def _transcribe_path(model_name: str, path: str, language: Optional[str]) -> dict:
+    return transcribe_samples_local(model_name, load_audio(path), language)
+
+
+class WhisperPool:
+    """Pula procesów z modelami Whisper wczytanymi na stałe.
+
+    Każdy proces wczytuje modele z `model_names` raz, przy starcie, więc transkrypcja setek plików
+    płaci koszt wczytania modelu raz na proces, a nie raz na plik. Inne rozmiary modelu są
+    wczytywane w procesie przy pierwszym użyciu i też zostają w pamięci.
+
+    with WhisperPool(workers=4, model_names=["base"]) as pool:
+        for path, result in pool.transcribe_many(paths):
+            ...
+    """
+
+    def __init__(
+        self,
+        workers: Optional[int] = None,
+        model_names: Iterable[str] = ("base",),
+        long_recording_seconds: float = LONG_RECORDING_SECONDS,
+    ):
+        self.workers = workers or os.cpu_count() or 1
+        self.model_names = tuple(model_names)
+        self.long_recording_seconds = long_recording_seconds
+        torch_threads = max(1, (os.cpu_count() or 1) // self.workers)
+        self.executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            initializer=_init_worker,
+            initargs=(self.model_names, torch_threads),
+        )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self.executor.shutdown()
+
+    def submit(self, path: str | Path, model_name: Optional[str] = None, language: Optional[str] = None) -> Future:
+        """Zleca transkrypcję całego pliku; wynik Future to słownik {"text", "segments"}."""
+        return self.executor.submit(_transcribe_path, model_name or self.model_names[0], str(path), language)
+
+    def transcribe_many(
+        self,
+        paths: Iterable[str | Path],
+        model_name: Optional[str] = None,
+        language: Optional[str] = None,
+    ) -> Iterator[tuple[Path, dict | Exception]]:
+        """Transkrybuje kolejkę plików, zwracając (ścieżka, wynik) w kolejności ukończenia.
+
+        Ścieżki są pobierane z `paths` na bieżąco (może to być generator), a w toku jest najwyżej
+        dwa razy tyle plików, ile procesów. Błąd pojedynczego pliku jest zwracany jako wynik.
+        """
+        paths = iter(paths)
+        in_flight: dict[Future, Path] = {}
+
+        def fill():
+            while len(in_flight) < 2 * self.workers:
+                path = next(paths, None)
+                if path is None:
+                    return
+                in_flight[self.submit(path, model_name, language)] = Path(path)
+
+        fill()
+        while in_flight:
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                path = in_flight.pop(future)
+                error = future.exception()
+                yield path, error if error is not None else future.result()
+            fill()
+
+    def transcribe_long(self, path: str | Path, model_name: Optional[str] = None, language: Optional[str] = None) -> dict:
+        """Transkrybuje jedno długie nagranie, dzieląc je na fragmenty wykonywane przez wszystkie procesy."""
+        return transcribe_long_audio_local(path, self.executor, self.workers, model_name or self.model_names[0], language)
+
+    def transcribe(self, path: str | Path, model_name: Optional[str] = None, language: Optional[str] = None) -> dict:
+        """Transkrybuje nagranie dowolnej długości (wywołanie blokujące, np. przez `asyncio.to_thread`).
+
+        Nagranie dłuższe niż `long_recording_seconds` jest dzielone w miejscach ciszy i transkrybowane
+        fragmentami przez wszystkie procesy (jak `transcribe_long`), krótsze - w całości w jednym procesie.
+        """
+        model_name = model_name or self.model_names[0]
+        samples = load_audio(path)
+        if len(samples) / SAMPLE_RATE > self.long_recording_seconds:
+            return transcribe_long_audio_local(path, self.executor, self.workers, model_name, language, samples=samples)
+        return self.executor.submit(transcribe_samples_local, model_name, samples, language).result()
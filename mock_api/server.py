@@ -0,0 +1,305 @@
+import os
+import re
+import json
+import time
+import base64
+import random
+import asyncio
+import hashlib
+import logging
+import argparse
+import threading
+from collections import Counter
+from typing import Any, Optional
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, Response
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Przezroczysty obrazek PNG 1x1 zwracany przez /v1/images/generations
+PIXEL_PNG = base64.b64decode(
+    "iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mNkYPhfDwAChwGA60e6kgAAAABJRU5ErkJggg=="
+)
+
+# Wymiary embeddingów dla znanych modeli (pozostałe dostają MockConfig.embedding_dim)
+EMBEDDING_DIMS = {"text-embedding-3-small": 1536, "text-embedding-3-large": 3072, "text-embedding-ada-002": 1536}
+
+# Domyślne odpowiedzi zastępczych endpointów centrali
+CENTRALA_DEFAULTS = {
+    "report": {"code": 0, "message": "OK"},
+    "apidb": {"reply": [], "error": "OK"},
+    "people": {"code": 0, "message": ""},
+    "places": {"code": 0, "message": ""},
+    "gps": {"code": 0, "message": {"lat": 50.064651, "lon": 19.944981}},
+}
+
+
+class MockConfig:
+    """Ustawienia serwera testowego (można je zmieniać w trakcie działania przez POST /_mock/config)."""
+
+    def __init__(
+        self,
+        latency_ms: float = 0.0,
+        jitter_ms: float = 0.0,
+        rate_limit_probability: float = 0.0,
+        retry_after: str = "0",
+        default_reply: str = "none",
+        embedding_dim: int = 1536,
+        rules: Optional[list[dict]] = None,
+        seed: Optional[int] = None,
+    ):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.rate_limit_probability = rate_limit_probability
+        self.retry_after = retry_after
+        self.default_reply = default_reply
+        self.embedding_dim = embedding_dim
+        self.rules = rules or []
+        self.random = random.Random(seed)
+
+    @classmethod
+    def from_env(cls) -> "MockConfig":
+        rules = []
+        rules_file = os.getenv("MOCK_RULES")
+        if rules_file:
+            with open(rules_file, 'r', encoding='utf-8') as f:
+                rules = json.load(f)
+        return cls(
+            latency_ms=float(os.getenv("MOCK_LATENCY_MS", "0")),
+            jitter_ms=float(os.getenv("MOCK_JITTER_MS", "0")),
+            rate_limit_probability=float(os.getenv("MOCK_RATE_LIMIT_PROBABILITY", "0")),
+            retry_after=os.getenv("MOCK_RETRY_AFTER", "0"),
+            default_reply=os.getenv("MOCK_DEFAULT_REPLY", "none"),
+            rules=rules,
+        )
+
+    def update(self, values: dict):
+        for key, value in values.items():
+            if key in ("latency_ms", "jitter_ms", "rate_limit_probability", "retry_after", "default_reply", "embedding_dim", "rules"):
+                setattr(self, key, value)
+
+    def as_dict(self) -> dict:
+        return {
+            "latency_ms": self.latency_ms,
+            "jitter_ms": self.jitter_ms,
+            "rate_limit_probability": self.rate_limit_probability,
+            "retry_after": self.retry_after,
+            "default_reply": self.default_reply,
+            "embedding_dim": self.embedding_dim,
+            "rules": self.rules,
+        }
+
+    def match_rule(self, endpoint: str, text: str) -> Optional[Any]:
+        """Zwraca odpowiedź pierwszej reguły pasującej do endpointu i treści zapytania."""
+        for rule in self.rules:
+            if rule.get("endpoint", "chat") != endpoint:
+                continue
+            if re.search(rule.get("match", ""), text, re.IGNORECASE | re.DOTALL):
+                return rule["response"]
+        return None
+
+
+def _message_text(payload: dict) -> str:
+    """Skleja tekst wszystkich wiadomości (bez obrazków), żeby dopasować do niego reguły."""
+    parts = []
+    for message in payload.get("messages", []):
+        content = message.get("content")
+        if isinstance(content, str):
+            parts.append(content)
+        elif isinstance(content, list):
+            parts.extend(part.get("text", "") for part in content if part.get("type") == "text")
+    return "\n".join(parts)
+
+
+def _fake_embedding(text: str, dim: int) -> list[float]:
+    """Deterministyczny, znormalizowany wektor wyliczony ze skrótu tekstu."""
+    rng = random.Random(hashlib.sha256(text.encode("utf-8")).digest())
+    vector = [rng.gauss(0, 1) for _ in range(dim)]
+    norm = sum(value * value for value in vector) ** 0.5
+    return [value / norm for value in vector]
+
+
+def create_app(config: Optional[MockConfig] = None) -> FastAPI:
+    config = config or MockConfig.from_env()
+    stats = Counter()
+    app = FastAPI(title="Mock OpenAI / centrala")
+    app.state.config = config
+    app.state.stats = stats
+
+    async def simulate(endpoint: str) -> Optional[JSONResponse]:
+        """Dolicza zapytanie, odczekuje zadane opóźnienie i ewentualnie wstrzykuje błąd 429."""
+        stats[endpoint] += 1
+        delay = config.latency_ms + config.random.uniform(-config.jitter_ms, config.jitter_ms)
+        if delay > 0:
+            await asyncio.sleep(delay / 1000)
+        if config.random.random() < config.rate_limit_probability:
+            stats["rate_limited"] += 1
+            return JSONResponse(
+                status_code=429,
+                headers={"retry-after": str(config.retry_after)},
+                content={"error": {"message": "Rate limit reached (mock)", "type": "rate_limit_exceeded"}},
+            )
+        return None
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        payload = await request.json()
+        if (error := await simulate("chat")) is not None:
+            return error
+
+        text = _message_text(payload)
+        content = config.match_rule("chat", text)
+        if content is None:
+            json_mode = (payload.get("response_format") or {}).get("type") == "json_object"
+            content = "{}" if json_mode else config.default_reply
+        if not isinstance(content, str):
+            content = json.dumps(content, ensure_ascii=False)
+
+        prompt_tokens = len(text) // 4
+        completion_tokens = len(content) // 4
+        return {
+            "id": f"chatcmpl-mock-{stats['chat']}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": payload.get("model", "mock"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            },
+        }
+
+    @app.post("/v1/embeddings")
+    async def embeddings(request: Request):
+        payload = await request.json()
+        if (error := await simulate("embeddings")) is not None:
+            return error
+
+        inputs = payload.get("input", "")
+        inputs = [inputs] if isinstance(inputs, str) else inputs
+        dim = int(payload.get("dimensions") or EMBEDDING_DIMS.get(payload.get("model"), config.embedding_dim))
+        return {
+            "object": "list",
+            "model": payload.get("model", "mock"),
+            "data": [
+                {"object": "embedding", "index": i, "embedding": _fake_embedding(text, dim)}
+                for i, text in enumerate(inputs)
+            ],
+            "usage": {"prompt_tokens": sum(len(text) // 4 for text in inputs), "total_tokens": sum(len(text) // 4 for text in inputs)},
+        }
+
+    @app.post("/v1/audio/transcriptions")
+    async def transcriptions(request: Request):
+        form = await request.form()
+        if (error := await simulate("transcriptions")) is not None:
+            return error
+
+        upload = form.get("file")
+        filename = getattr(upload, "filename", "") or ""
+        text = config.match_rule("transcriptions", filename)
+        if text is None:
+            text = f"Transkrypcja pliku {filename}."
+        response_format = form.get("response_format", "json")
+        if response_format == "text":
+            return PlainTextResponse(text)
+        if response_format == "verbose_json":
+            return {"text": text, "segments": [{"id": 0, "start": 0.0, "end": 1.0, "text": text}]}
+        return {"text": text}
+
+    @app.post("/v1/images/generations")
+    async def image_generations(request: Request):
+        payload = await request.json()
+        if (error := await simulate("images")) is not None:
+            return error
+
+        count = int(payload.get("n", 1))
+        if payload.get("response_format") == "b64_json":
+            data = [{"b64_json": base64.b64encode(PIXEL_PNG).decode()} for _ in range(count)]
+        else:
+            base_url = str(request.base_url).rstrip("/")
+            data = [{"url": f"{base_url}/_mock/pixel.png"} for _ in range(count)]
+        return {"created": int(time.time()), "data": data}
+
+    @app.get("/_mock/pixel.png")
+    async def pixel():
+        return Response(content=PIXEL_PNG, media_type="image/png")
+
+    async def centrala(endpoint: str, request: Request):
+        payload = await request.json()
+        if (error := await simulate(endpoint)) is not None:
+            return error
+        response = config.match_rule(endpoint, json.dumps(payload, ensure_ascii=False))
+        return response if response is not None else CENTRALA_DEFAULTS[endpoint]
+
+    def centrala_route(endpoint: str):
+        async def route(request: Request):
+            return await centrala(endpoint, request)
+        return route
+
+    for endpoint in CENTRALA_DEFAULTS:
+        app.add_api_route(f"/{endpoint}", centrala_route(endpoint), methods=["POST"])
+
+    @app.get("/_mock/stats")
+    async def get_stats():
+        return dict(stats)
+
+    @app.get("/_mock/config")
+    async def get_config():
+        return config.as_dict()
+
+    @app.post("/_mock/config")
+    async def set_config(request: Request):
+        config.update(await request.json())
+        stats.clear()
+        return config.as_dict()
+
+    return app
+
+
+class MockServer:
+    """Uruchamia serwer testowy w wątku tła (np. w testach i benchmarkach).
+
+    with MockServer(MockConfig(latency_ms=200)) as server:
+        os.environ["OPENAI_BASE_URL"] = server.openai_url
+    """
+
+    def __init__(self, config: Optional[MockConfig] = None, host: str = "127.0.0.1", port: int = 0):
+        self.app = create_app(config)
+        self.server = uvicorn.Server(uvicorn.Config(self.app, host=host, port=port, log_level="warning"))
+        self.thread = threading.Thread(target=self.server.run, name="mock-api", daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.servers[0].sockets[0].getsockname()[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def openai_url(self) -> str:
+        return f"{self.url}/v1"
+
+    @property
+    def stats(self) -> Counter:
+        return self.app.state.stats
+
+    def __enter__(self):
+        self.thread.start()
+        while not self.server.started:
+            time.sleep(0.01)
+        return self
+
+    def __exit__(self, *exc_info):
+        self.server.should_exit = True
+        self.thread.join(timeout=5)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Lokalny serwer zastępujący API OpenAI i centrali")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    args = parser.parse_args()
+    logger.info(f"Serwer testowy: http://{args.host}:{args.port} (OPENAI_BASE_URL=http://{args.host}:{args.port}/v1)")
+    uvicorn.run(create_app(), host=args.host, port=args.port)
@@ -0,0 +1,71 @@
+import importlib.util
+import unittest
+from pathlib import Path
+
+from fastapi.testclient import TestClient
+
+# Wczytanie po ścieżce: moduł `server` jest też w S04E04_API_creation
+_spec = importlib.util.spec_from_file_location("mock_api_server", Path(__file__).resolve().parent / "server.py")
+mock_server = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(mock_server)
+
+
+def make_client(**config) -> TestClient:
+    return TestClient(mock_server.create_app(mock_server.MockConfig(seed=0, **config)))
+
+
+class TestMockServer(unittest.TestCase):
+    def test_chat_uses_rules_and_default_reply(self):
+        client = make_client(rules=[{"endpoint": "chat", "match": "robot", "response": "hardware"}])
+        response = client.post("/v1/chat/completions", json={
+            "model": "gpt-4o",
+            "messages": [{"role": "user", "content": [{"type": "text", "text": "Naprawa ROBOTA w sektorze C"}]}],
+        })
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data["choices"][0]["message"]["content"], "hardware")
+        self.assertEqual(data["model"], "gpt-4o")
+        self.assertEqual(data["usage"]["total_tokens"], data["usage"]["prompt_tokens"] + data["usage"]["completion_tokens"])
+
+        other = client.post("/v1/chat/completions", json={"model": "gpt-4o", "messages": [{"role": "user", "content": "pogoda"}]})
+        self.assertEqual(other.json()["choices"][0]["message"]["content"], "none")
+        json_mode = client.post("/v1/chat/completions", json={
+            "model": "gpt-4o", "messages": [{"role": "user", "content": "pogoda"}], "response_format": {"type": "json_object"},
+        })
+        self.assertEqual(json_mode.json()["choices"][0]["message"]["content"], "{}")
+
+    def test_embeddings_are_deterministic_and_ordered(self):
+        client = make_client()
+        data = client.post("/v1/embeddings", json={"model": "text-embedding-3-small", "input": ["a", "b"]}).json()["data"]
+        self.assertEqual([item["index"] for item in data], [0, 1])
+        self.assertEqual(len(data[0]["embedding"]), 1536)
+        self.assertAlmostEqual(sum(value * value for value in data[0]["embedding"]), 1.0, places=6)
+
+        single = client.post("/v1/embeddings", json={"model": "text-embedding-3-small", "input": "b"}).json()["data"]
+        self.assertEqual(single[0]["embedding"], data[1]["embedding"])
+        small = client.post("/v1/embeddings", json={"model": "text-embedding-3-large", "input": "a", "dimensions": 8}).json()
+        self.assertEqual(len(small["data"][0]["embedding"]), 8)
+
+    def test_transcription_formats(self):
+        client = make_client(rules=[{"endpoint": "transcriptions", "match": "adam", "response": "Instytut na ulicy"}])
+        files = {"file": ("adam.m4a", b"\x00" * 16)}
+        response = client.post("/v1/audio/transcriptions", data={"model": "whisper-1"}, files=files)
+        self.assertEqual(response.json(), {"text": "Instytut na ulicy"})
+
+        text = client.post("/v1/audio/transcriptions", data={"model": "whisper-1", "response_format": "text"},
+                           files={"file": ("rafal.m4a", b"\x00")})
+        self.assertEqual(text.text, "Transkrypcja pliku rafal.m4a.")
+        verbose = client.post("/v1/audio/transcriptions", data={"model": "whisper-1", "response_format": "verbose_json"},
+                              files={"file": ("adam.m4a", b"\x00")})
+        self.assertEqual(verbose.json()["segments"][0]["text"], "Instytut na ulicy")
+
+    def test_injected_rate_limit(self):
+        client = make_client(rate_limit_probability=1.0, retry_after="2")
+        response = client.post("/v1/chat/completions", json={"model": "gpt-4o", "messages": []})
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response.headers["retry-after"], "2")
+        self.assertEqual(client.get("/_mock/stats").json(), {"chat": 1, "rate_limited": 1})
+
+
+if __name__ == '__main__':
+    unittest.main()